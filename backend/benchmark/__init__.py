@@ -0,0 +1 @@
+"""Offline benchmark harness: fake upstreams and an end-to-end driver."""
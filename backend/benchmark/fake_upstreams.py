@@ -0,0 +1,146 @@
+"""Local stand-ins for the Knowunity API and an OpenAI-compatible chat endpoint.
+
+One FastAPI app serves both, so a benchmark only needs one port:
+
+- Knowunity: ``/students``, ``/students/{id}/topics``, ``/interact/start``,
+  ``/interact``, ``/evaluate/mse``, ``/evaluate/tutoring``
+- LLM: ``/v1/chat/completions`` (plain and ``stream=True``, including batched
+  analysis prompts)
+
+Every route sleeps for ``latency ± jitter`` seconds and fails with a 503 at
+``error_rate``; Knowunity and LLM routes are configured separately. Each
+pair gets a fixed hidden level so ``/evaluate/mse`` returns a real MSE.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+
+@dataclass
+class UpstreamProfile:
+    latency: float = 0.05  # seconds
+    jitter: float = 0.0  # +/- seconds, uniform
+    error_rate: float = 0.0
+
+    async def wait(self):
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if random.random() < self.error_rate:
+            raise HTTPException(status_code=503, detail="Injected upstream error")
+
+
+@dataclass
+class FakeConfig:
+    students: int = 10
+    topics: int = 3
+    max_turns: int = 5
+    knowunity: UpstreamProfile = field(default_factory=UpstreamProfile)
+    llm: UpstreamProfile = field(default_factory=lambda: UpstreamProfile(latency=0.2))
+    llm_tokens_per_chunk: int = 8
+
+
+def _true_level(student_id: str, topic_id: str) -> int:
+    return 1 + zlib.crc32(f"{student_id}/{topic_id}".encode()) % 5
+
+
+def create_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI(title="Fake Knowunity + LLM upstream")
+    conversations: Dict[str, dict] = {}
+    counters = {"knowunity_requests": 0, "llm_requests": 0}
+
+    async def knowunity():
+        counters["knowunity_requests"] += 1
+        await config.knowunity.wait()
+
+    # --- Knowunity ---
+    @app.get("/students")
+    async def students(set_type: str = "mini_dev"):
+        await knowunity()
+        return {"students": [{"id": f"{set_type}-s{i}", "name": f"Student {i}", "grade_level": 8}
+                             for i in range(config.students)]}
+
+    @app.get("/students/{student_id}/topics")
+    async def topics(student_id: str):
+        await knowunity()
+        return {"topics": [{"id": f"t{j}", "name": f"Topic {j}"} for j in range(config.topics)]}
+
+    @app.post("/interact/start")
+    async def start(body: dict):
+        await knowunity()
+        conv_id = str(uuid.uuid4())
+        conversations[conv_id] = {"turn": 0, "level": _true_level(body["student_id"], body["topic_id"])}
+        return {"conversation_id": conv_id, "max_turns": config.max_turns}
+
+    @app.post("/interact")
+    async def interact(body: dict):
+        await knowunity()
+        conv = conversations.setdefault(body.get("conversation_id"), {"turn": 0, "level": 3})
+        conv["turn"] += 1
+        return {
+            "student_response": f"I think the answer is {conv['level'] + conv['turn']}, but I'm not sure why.",
+            "turn_number": conv["turn"],
+            "is_complete": conv["turn"] >= config.max_turns,
+        }
+
+    @app.post("/evaluate/mse")
+    async def evaluate_mse(body: dict):
+        await knowunity()
+        errors = [(p["predicted_level"] - _true_level(p["student_id"], p["topic_id"])) ** 2
+                  for p in body.get("predictions", [])]
+        return {"mse": sum(errors) / len(errors) if errors else None, "n": len(errors)}
+
+    @app.post("/evaluate/tutoring")
+    async def evaluate_tutoring(body: dict):
+        await knowunity()
+        return {"score": None, "set_type": body.get("set_type")}
+
+    # --- OpenAI-compatible chat completions ---
+    def completion_content(body: dict) -> str:
+        level = random.randint(1, 5)
+        analysis = {"understanding_level": level, "justification": "Benchmark stand-in.", "evidence": []}
+        # Batched analysis (tutor/reanalysis.py): one result per "### Conversation <id>"
+        ids = re.findall(r"^### Conversation (\S+)$", body["messages"][-1].get("content", ""), re.MULTILINE)
+        if ids:
+            return json.dumps({"results": [{"id": i, **analysis, "understanding_level": random.randint(1, 5)} for i in ids]})
+        suggestion = {"suggested_response": "Can you walk me through the next step?", "strategy_note": "probe"}
+        # Satisfies the analysis, suggestion, combined and compaction summary prompts alike
+        return json.dumps({**analysis, **suggestion, "analysis": analysis, "suggestion": suggestion,
+                           "summary": "Benchmark stand-in summary."})
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        counters["llm_requests"] += 1
+        body = await request.json()
+        await config.llm.wait()
+        content = completion_content(body)
+        usage = {"prompt_tokens": sum(len(m.get("content", "")) for m in body["messages"]) // 4,
+                 "completion_tokens": len(content) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()), "model": body["model"]}
+        if not body.get("stream"):
+            return {**base, "object": "chat.completion", "usage": usage, "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}]}
+
+        async def chunks():
+            step = config.llm_tokens_per_chunk * 4
+            for i in range(0, len(content), step):
+                delta = {"index": 0, "delta": {"content": content[i:i + step]}, "finish_reason": None}
+                yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [delta]})}\n\n"
+                await asyncio.sleep(0)
+            yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    @app.get("/_stats")
+    def stats():
+        return {**counters, "conversations": len(conversations)}
+
+    return app
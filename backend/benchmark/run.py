@@ -0,0 +1,187 @@
+"""Offline end-to-end benchmark for the simulation servers.
+
+Starts the fake Knowunity + LLM upstream (``benchmark/fake_upstreams.py``) on a
+local port, then for each concurrency setting imports the server in a fresh
+process and drives ``/generate_mse`` → ``run_simulation_task`` →
+``/submit_simulation`` through its ASGI app. No API quota is used.
+
+    cd backend
+    python -m benchmark.run --server phack-fast --concurrency 10,50,100 \\
+        --students 20 --topics 3 --llm-latency 0.5 --llm-jitter 0.3 --llm-error-rate 0.01
+
+Reports pairs/sec, p50/p99 turn latency, failed turns and pairs and peak RSS per
+setting. Other server settings (``LLM_PIPELINE_MODE``, ``ADAPTIVE_LIMITS`` and
+so on) are taken from the environment as usual; comparing the MSE of runs with
+``ESTIMATOR_MODE=off`` and ``ESTIMATOR_MODE=skip`` shows the estimator's drift,
+and runs with ``EARLY_STOP`` set report the turns it saved.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import List
+
+import uvicorn
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Servers with /generate_mse
+BENCHMARK_SERVERS = ("phack-fast", "phack-fast-2", "phack-gpt", "phack")
+
+
+def percentile(values: List[float], pct: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+# --- Fake upstream, in a thread of the parent process ---
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_upstream(config) -> str:
+    from benchmark.fake_upstreams import create_app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+# --- One measured run, in a fresh process ---
+async def _drive(server, set_type: str, timeout: float) -> dict:
+    import httpx
+
+    from tutor import convergence, discovery, estimator, http
+
+    turn_latencies, turn_errors = [], [0]
+    perform_interaction = server.perform_interaction
+
+    async def timed_interaction(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await perform_interaction(*args, **kwargs)
+        except Exception:
+            turn_errors[0] += 1
+            raise
+        finally:
+            turn_latencies.append(time.perf_counter() - start)
+
+    server.perform_interaction = timed_interaction  # looked up on the instance by run_pair
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        resp = await client.post("/generate_mse", params={"set_type": set_type, "resume": False})
+        discovered = time.perf_counter() - start
+        deadline = start + timeout
+        while resp.status_code == 200 and time.perf_counter() < deadline:
+            simulation = server.store.summary(set_type) or {}
+            # Stop when completed, or when the simulation task died without completing
+            if simulation.get("status") in ("completed", "failed") or not discovery._background:
+                break
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        submit = await client.post("/submit_simulation", params={"set_type": set_type})
+
+    simulation = server.store.get(set_type) or {}
+    pairs = len(simulation.get("data", []))
+    await http.aclose()
+    return {
+        "status": simulation.get("status") if resp.status_code == 200 else f"generate_mse failed ({resp.status_code})",
+        "pairs": pairs,
+        "seconds": round(elapsed, 3),
+        "discovery_seconds": round(discovered, 3),
+        "pairs_per_sec": round(pairs / elapsed, 3) if elapsed else None,
+        "turns": len(turn_latencies),
+        "failed_turns": turn_errors[0],
+        "failed_pairs": len(simulation.get("failed", [])),
+        "analyses_skipped": estimator.stats["skipped"],
+        "estimator_skip_mse": estimator.snapshot()["skip_mse"],
+        "turns_saved": convergence.stats["turns_saved"],
+        "early_stop_mse": convergence.snapshot()["stop_mse"],
+        "turn_p50_s": percentile(turn_latencies, 50),
+        "turn_p99_s": percentile(turn_latencies, 99),
+        "submit_status": submit.status_code,
+        "mse": submit.json().get("mse") if submit.status_code == 200 else None,
+    }
+
+
+def run_once(server_name: str, set_type: str, concurrency: int, upstream: str, timeout: float) -> dict:
+    """Process pool entry point; module state (limiters, caches, stores) starts fresh each time."""
+    store_dir = tempfile.mkdtemp(prefix="tutor-bench-")
+    os.environ.update({
+        "TUTOR_API_BASE_URL": upstream,
+        "OPENAI_BASE_URL": f"{upstream}/v1",
+        "DWANI_API_BASE_URL": f"{upstream}/v1",
+        "MAX_CONCURRENT_SESSIONS": str(concurrency),
+        "SIMULATION_STORE": "sqlite",
+        "SIMULATION_STORE_PATH": os.path.join(store_dir, "simulations.db"),
+    })
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.setdefault("TUTOR_API_KEY", "benchmark")
+    os.environ.setdefault("LLM_CACHE", "0")
+    sys.path.insert(0, BACKEND_DIR)
+    from shard_runner import load_server
+
+    result = asyncio.run(_drive(load_server(server_name), set_type, timeout))
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+    return {"concurrency": concurrency, **result, "peak_rss_mb": round(peak_kb / 1024, 1)}
+
+
+def main(argv=None):
+    from benchmark.fake_upstreams import FakeConfig, UpstreamProfile
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--server", default="phack-fast", choices=BENCHMARK_SERVERS)
+    parser.add_argument("--set-type", default="mini_dev")
+    parser.add_argument("--concurrency", default="10,50,100", help="comma-separated MAX_CONCURRENT_SESSIONS values")
+    parser.add_argument("--students", type=int, default=10)
+    parser.add_argument("--topics", type=int, default=3)
+    parser.add_argument("--max-turns", type=int, default=5)
+    for name, latency in (("ku", 0.05), ("llm", 0.2)):
+        parser.add_argument(f"--{name}-latency", type=float, default=latency, help="seconds")
+        parser.add_argument(f"--{name}-jitter", type=float, default=0.0, help="+/- seconds")
+        parser.add_argument(f"--{name}-error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=600, help="per run, seconds")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    upstream = start_upstream(FakeConfig(
+        students=args.students, topics=args.topics, max_turns=args.max_turns,
+        knowunity=UpstreamProfile(args.ku_latency, args.ku_jitter, args.ku_error_rate),
+        llm=UpstreamProfile(args.llm_latency, args.llm_jitter, args.llm_error_rate),
+    ))
+
+    results = []
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            results.append(pool.submit(run_once, args.server, args.set_type, concurrency, upstream, args.timeout).result())
+        r = results[-1]
+        print(f"concurrency={r['concurrency']:>4}  status={r['status']}  pairs={r['pairs']}  "
+              f"pairs/s={r['pairs_per_sec']}  turn p50={r['turn_p50_s'] or 0:.3f}s p99={r['turn_p99_s'] or 0:.3f}s  "
+              f"failed_turns={r['failed_turns']} failed_pairs={r['failed_pairs']}  "
+              f"skipped_analyses={r['analyses_skipped']} turns_saved={r['turns_saved']}  "
+              f"peak_rss={r['peak_rss_mb']}MB  submit={r['submit_status']}", flush=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Re-score a finished simulation with only the analysis stage.
+
+Reads the transcripts a server checkpointed in its simulation store
+(``SIMULATION_STORE`` = ``sqlite`` or ``jsonl``) and re-runs the analysis
+with another model or prompt set, many conversations per LLM request and a
+bounded number of requests in flight. No Knowunity turns are replayed.
+
+    python reanalyze.py --server phack-fast --set-type mini_dev --prompt-set high_accuracy --evaluate
+
+With dev labels on disk (``tutor/devset.py``), ``--evaluate-local`` scores
+without a remote call.
+
+Or through the provider's Batch API instead of live calls:
+
+    python reanalyze.py --server phack-fast --set-type dev --export-batch batch.jsonl
+    # ...submit batch.jsonl, download its output file, then:
+    python reanalyze.py --server phack-fast --set-type dev --import-batch batch_output.jsonl --evaluate
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+
+from shard_runner import load_server
+from tutor import devset, http, profiles, prompts, reanalysis
+from tutor.store import offload
+
+
+async def _run(args) -> dict:
+    server = load_server(args.server)
+    model = args.model or server.model
+    prompt = reanalysis.analysis_prompt(args.prompt_set, server.prompts)
+    transcripts = await offload(reanalysis.load_transcripts, server.store, args.set_type)
+    if not transcripts:
+        raise SystemExit(f"No finished transcripts for {args.set_type}.")
+
+    if args.export_batch:
+        lines = reanalysis.batch_requests(model, transcripts, prompt, args.batch_size)
+        with open(args.export_batch, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(line) + "\n" for line in lines)
+        return {"set_type": args.set_type, "transcripts": len(transcripts), "requests": len(lines),
+                "batch_file": args.export_batch}
+
+    try:
+        if args.import_batch:
+            with open(args.import_batch, encoding="utf-8") as f:
+                results = reanalysis.parse_batch_output(f, transcripts)
+        else:
+            results = await reanalysis.reanalyze(
+                server.client, model, transcripts, prompt, args.batch_size, args.concurrency,
+                **server.profile.analysis_params)
+        report = {"set_type": args.set_type, "model": model, "prompt": prompt.name,
+                  "summary": reanalysis.summarize(results)}
+        if args.evaluate:
+            report["evaluation"] = await reanalysis.evaluate(server.api_base, server.headers, args.set_type, results)
+        if args.evaluate_local:
+            report["local_evaluation"] = devset.score(args.set_type, reanalysis.predictions(results))
+    finally:
+        await http.aclose()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({**report, "results": results}, f, indent=2)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--server", default="phack-fast", choices=sorted(profiles.PROFILES))
+    parser.add_argument("--set-type", default="mini_dev")
+    parser.add_argument("--model", help="default: the server's model")
+    parser.add_argument("--prompt-set", choices=sorted(prompts.PROMPT_SETS), help="default: the server's prompt set")
+    parser.add_argument("--batch-size", type=int, default=reanalysis.BATCH_SIZE, help="conversations per LLM request")
+    parser.add_argument("--concurrency", type=int, default=reanalysis.CONCURRENCY, help="LLM requests in flight")
+    parser.add_argument("--evaluate", action="store_true", help="score the new levels with /evaluate/mse")
+    parser.add_argument("--evaluate-local", action="store_true", help="score the new levels against DEV_LABELS_PATH")
+    parser.add_argument("--output", help="write the per-conversation results to this JSON file")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--export-batch", help="write Batch API requests to this JSONL file instead of calling the LLM")
+    source.add_argument("--import-batch", help="read results from this Batch API output file instead of calling the LLM")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    report = asyncio.run(_run(args))
+    json.dump(report, sys.stdout, indent=2, default=str)
+    print()
+
+
+if __name__ == "__main__":
+    main()
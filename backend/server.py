@@ -0,0 +1,14 @@
+"""Runs any server profile: ``SERVER_PROFILE=phack-fast-2 python server.py``.
+
+Profiles are listed in ``tutor/profiles.py``; ``LLM_MODEL``, ``LLM_PROVIDER``,
+``SIMULATION_STRATEGY`` and ``PROMPT_SET`` adjust the chosen one.
+"""
+import os
+
+from tutor.server import create, serve
+
+server = create(os.getenv("SERVER_PROFILE", "main"))
+app = server.app
+
+if __name__ == "__main__":
+    serve(server)
@@ -0,0 +1,240 @@
+"""Sharded simulation runner for ``/generate_mse`` workloads.
+
+Splits a set's student/topic pairs into shards by a stable hash and runs each
+shard in its own process, so pair simulation (and the JSON parsing and prompt
+building around it) can use more than one core. All processes share the
+server's simulation store (``SIMULATION_STORE`` = ``sqlite`` or ``jsonl``),
+which is also how they coordinate: pairs are planned into the store once,
+every worker checkpoints turns and results into it, and ``merge`` marks the
+run completed so the server's ``/submit_simulation`` can use it.
+
+One machine, four processes:
+
+    python shard_runner.py run --server phack-fast --set-type mini_dev --shards 4
+
+Or as separate steps, e.g. from several containers on the same host:
+
+    python shard_runner.py plan  --server phack-fast --set-type dev
+    python shard_runner.py work  --server phack-fast --set-type dev --shards 8 --shard-ids 0-3   # worker A
+    python shard_runner.py work  --server phack-fast --set-type dev --shards 8 --shard-ids 4-7   # worker B
+    python shard_runner.py merge --server phack-fast --set-type dev --wait --submit
+
+Every worker must be on the host that holds ``SIMULATION_STORE_PATH``. Both
+stores are local files: SQLite's WAL mode needs shared memory between its
+processes, and JSONL appends are not atomic, so neither works over a network
+filesystem (NFS, SMB and most cloud volumes). Running on several machines
+would need a networked store backend, which this runner does not provide.
+
+Workers are resumable: finished pairs are skipped and unfinished ones continue
+from their last checkpointed turn. Adaptive limits and ``MAX_CONCURRENT_SESSIONS``
+apply per process. A pair that failed for good (``fail_pair``) counts as
+finished for ``merge``: it is reported and left out, and ``--submit`` then
+makes a partial submission of the rest (``SUBMIT_MIN_COVERAGE`` applies).
+Rerunning ``work`` retries failed pairs.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List
+
+from fastapi import HTTPException
+
+from tutor import discovery, http, metrics, profiles, scheduling
+from tutor.server import TutorServer
+from tutor.store import JSONLStore, MemoryStore, offload, pair_key
+
+logger = logging.getLogger("shard_runner")
+
+_servers = {}
+
+
+def load_server(name: str) -> TutorServer:
+    """The server for profile ``name`` (see tutor/profiles.py), built once per process."""
+    if name not in _servers:
+        server = TutorServer(profiles.get(name))
+        if isinstance(server.store, MemoryStore) and not isinstance(server.store, JSONLStore):
+            raise SystemExit("Sharded runs need a shared store: set SIMULATION_STORE=sqlite or jsonl.")
+        _servers[name] = server
+    return _servers[name]
+
+
+def shard_of(key: tuple, shards: int) -> int:
+    """Stable across processes and machines, unlike hash()."""
+    return zlib.crc32("/".join(key).encode("utf-8")) % shards
+
+
+def parse_shard_ids(spec: str, shards: int) -> List[int]:
+    if not spec:
+        return list(range(shards))
+    ids = set()
+    for part in spec.split(","):
+        lo, _, hi = part.partition("-")
+        ids.update(range(int(lo), int(hi or lo) + 1))
+    if not ids or min(ids) < 0 or max(ids) >= shards:
+        raise SystemExit(f"--shard-ids must be within 0-{shards - 1}")
+    return sorted(ids)
+
+
+# --- Plan: discover pairs once and record them in the shared store ---
+async def plan(server_name: str, set_type: str, fresh: bool = False) -> dict:
+    server = load_server(server_name)
+    if fresh:
+        await offload(server.store.reset, set_type)
+    await offload(server.store.update_run, set_type, status="in_progress")
+
+    queue = asyncio.Queue()
+    summary = await discovery.discover_pairs(
+        server.api_base, server.headers, set_type, queue,
+        known=await offload(server.store.known_pairs, set_type), catalog=server.catalog
+    )
+    async for pair in discovery.iter_pairs(queue):
+        await offload(server.store.save_pair, set_type, pair)
+    await offload(server.store.update_run, set_type, total_expected=summary["pair_count"] + summary["skipped"])
+    return summary
+
+
+# --- Work: simulate the unfinished pairs of some shards ---
+async def run_shards(server_name: str, set_type: str, shards: int, shard_ids: List[int]) -> List[dict]:
+    server = load_server(server_name)
+    known = await offload(server.store.known_pairs, set_type)
+
+    async def run_one(shard_id: int) -> dict:
+        pairs = [
+            {k: v for k, v in p.items() if k != "done"}
+            for key, p in known.items()
+            if not p["done"] and shard_of(key, shards) == shard_id
+        ]
+        start = time.monotonic()
+        results = await asyncio.gather(*[server.simulate_single_pair(p, set_type) for p in pairs], return_exceptions=True)
+        # simulate_single_pair records its own failures and returns False
+        failed = [(pair_key(p), r) for p, r in zip(pairs, results) if r is not True]
+        for key, e in failed:
+            if isinstance(e, BaseException):
+                logger.error(f"Shard {shard_id}: pair {key[0]}/{key[1]} failed: {e}")
+        return {"shard": shard_id, "pairs": len(pairs), "failed": len(failed), "seconds": round(time.monotonic() - start, 2)}
+
+    try:
+        with metrics.labels(set_type), scheduling.batch(set_type):
+            return list(await asyncio.gather(*[run_one(i) for i in shard_ids]))
+    finally:
+        await http.aclose()
+
+
+def _process_main(server_name: str, set_type: str, shards: int, shard_ids: List[int]) -> List[dict]:
+    """Process pool entry point: one event loop per process for its group of shards."""
+    logging.basicConfig(level=logging.INFO)
+    return asyncio.run(run_shards(server_name, set_type, shards, shard_ids))
+
+
+def work(server_name: str, set_type: str, shards: int, shard_ids: List[int], processes: int) -> List[dict]:
+    """Runs ``shard_ids`` spread over ``processes`` worker processes."""
+    groups = [shard_ids[i::processes] for i in range(min(processes, len(shard_ids)))]
+    # spawn: each worker builds its own HTTP pool, store connection and event loop
+    with ProcessPoolExecutor(max_workers=len(groups), mp_context=get_context("spawn")) as pool:
+        futures = [pool.submit(_process_main, server_name, set_type, shards, g) for g in groups]
+        return sorted((r for f in futures for r in f.result()), key=lambda r: r["shard"])
+
+
+# --- Merge: one prediction set for /submit_simulation ---
+def progress(server_name: str, set_type: str) -> Dict[str, int]:
+    """Planned pairs by state; a pair recorded by ``fail_pair`` is final until a later ``work`` retries it."""
+    store = load_server(server_name).store
+    known = store.known_pairs(set_type)
+    failed = {(f["student_id"], f["topic_id"]) for f in (store.get(set_type) or {}).get("failed", [])}
+    done = sum(1 for p in known.values() if p["done"])
+    failed_count = sum(1 for key, p in known.items() if not p["done"] and key in failed)
+    return {"done": done, "failed": failed_count, "pending": len(known) - done - failed_count}
+
+
+async def merge(server_name: str, set_type: str, wait: bool = False, poll: float = 10.0,
+                submit: bool = False, output: str = None) -> dict:
+    server = load_server(server_name)
+    while True:
+        state = await offload(progress, server_name, set_type)
+        if not state["pending"] or not wait:
+            break
+        logger.info(f"Waiting for {state['pending']} pending pairs ({state['done']} done, {state['failed']} failed)")
+        await asyncio.sleep(poll)
+    if not any(state.values()):
+        raise SystemExit(f"No pairs planned for {set_type}; run `plan` first.")
+    if state["pending"]:
+        raise SystemExit(f"{state['pending']} pairs are not finished yet; rerun `work` or pass --wait.")
+    if state["failed"]:
+        logger.warning(f"{state['failed']} pairs failed and are left out; rerun `work` to retry them")
+
+    await offload(server.store.update_run, set_type, status="completed", failed_pairs=state["failed"])
+    simulation = await offload(server.store.get, set_type)
+    predictions = [{"student_id": e["student_id"], "topic_id": e["topic_id"], "predicted_level": e["inferred_level"]}
+                   for e in simulation["data"]]
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump({"set_type": set_type, "predictions": predictions}, f, indent=2)
+
+    summary = {"set_type": set_type, "predictions": len(predictions), "failed": simulation["failed"]}
+    if submit:
+        # With failures this is a partial submit, refused below SUBMIT_MIN_COVERAGE (see tutor/devset.py)
+        try:
+            summary["submission"] = await server.submit_simulation(set_type, partial=bool(state["failed"]))
+        except HTTPException as e:
+            summary["submission"] = {"error": e.detail}
+    return summary
+
+
+async def _run(args) -> dict:
+    report = {}
+    try:
+        if args.command in ("plan", "run"):
+            report["plan"] = await plan(args.server, args.set_type, args.fresh)
+        if args.command in ("work", "run"):
+            shard_ids = parse_shard_ids(args.shard_ids, args.shards)
+            processes = args.processes or len(shard_ids)
+            if processes <= 1:
+                report["shards"] = await run_shards(args.server, args.set_type, args.shards, shard_ids)
+            else:
+                report["shards"] = await asyncio.get_running_loop().run_in_executor(
+                    None, work, args.server, args.set_type, args.shards, shard_ids, processes)
+        if args.command in ("merge", "run"):
+            report["merge"] = await merge(args.server, args.set_type, args.wait, args.poll, args.submit, args.output)
+    finally:
+        await http.aclose()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add(name, help_text):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--server", default="phack-fast", choices=sorted(profiles.PROFILES))
+        p.add_argument("--set-type", default="mini_dev")
+        return p
+
+    for p in (add("plan", "discover pairs into the shared store"), add("run", "plan, work and merge on this machine")):
+        p.add_argument("--fresh", action="store_true", help="discard earlier results for the set")
+    for p in (add("work", "simulate some shards"), sub.choices["run"]):
+        p.add_argument("--shards", type=int, default=os.cpu_count() or 1)
+        p.add_argument("--shard-ids", default="", help="e.g. 0-3 or 0,2,5 (default: all)")
+        p.add_argument("--processes", type=int, default=0, help="default: one per shard")
+    for p in (add("merge", "mark the run completed and export predictions"), sub.choices["run"]):
+        p.add_argument("--wait", action="store_true", help="poll until every planned pair is finished")
+        p.add_argument("--poll", type=float, default=10.0)
+        p.add_argument("--submit", action="store_true", help="call the server's /submit_simulation logic")
+        p.add_argument("--output", help="write the predictions to this JSON file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    report = asyncio.run(_run(args))
+    json.dump(report, sys.stdout, indent=2, default=str)
+    print()
+
+
+if __name__ == "__main__":
+    main()
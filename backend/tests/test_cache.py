@@ -0,0 +1,82 @@
+"""LLM response cache (tutor/cache.py)."""
+import os
+
+import pytest
+
+from tutor import cache
+
+
+@pytest.fixture(autouse=True)
+def cache_settings(monkeypatch):
+    monkeypatch.setattr(cache, "LLM_CACHE_ENABLED", True)
+    monkeypatch.setattr(cache, "LLM_CACHE_STAGES", {"analysis", "suggestion"})
+    monkeypatch.setattr(cache, "LLM_CACHE_SAMPLED_STAGES", set())
+
+
+def test_only_deterministic_calls_are_cached_by_default():
+    assert cache.enabled_for("analysis", {"temperature": 0})
+    assert not cache.enabled_for("suggestion", {"temperature": 0.7})
+    assert not cache.enabled_for("analysis", {})  # the model's default temperature samples too
+
+
+def test_sampled_stages_opt_in(monkeypatch):
+    monkeypatch.setattr(cache, "LLM_CACHE_SAMPLED_STAGES", {"suggestion"})
+    assert cache.enabled_for("suggestion", {"temperature": 0.7})
+    assert not cache.enabled_for("analysis", {})
+
+
+def test_stage_filter_and_bypass():
+    assert not cache.enabled_for("summary", {"temperature": 0})
+    with cache.bypass():
+        assert not cache.enabled_for("analysis", {"temperature": 0})
+    assert cache.enabled_for("analysis", {"temperature": 0})
+
+
+def test_key_ignores_dict_order_but_not_content():
+    messages = [{"role": "user", "content": "hi"}]
+    key = cache.make_key("m", messages, {"temperature": 0, "max_tokens": 10})
+    assert key == cache.make_key("m", messages, {"max_tokens": 10, "temperature": 0})
+    assert key != cache.make_key("m", messages, {"temperature": 0, "max_tokens": 11})
+
+
+@pytest.mark.anyio
+async def test_memory_tier_evicts_the_least_recently_used_entry():
+    responses = cache.ResponseCache(max_items=2, directory=None)
+    await responses.set("a", "1")
+    await responses.set("b", "2")
+    assert await responses.get("a") == "1"
+    await responses.set("c", "3")
+    assert await responses.get("b") is None and await responses.get("a") == "1"
+    assert responses.counters["evictions"] == 1
+
+
+@pytest.mark.anyio
+async def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    responses = cache.ResponseCache(ttl=60, directory=None)
+    await responses.set("a", "1")
+    now[0] += 61
+    assert await responses.get("a") is None and len(responses._memory) == 0
+
+
+@pytest.mark.anyio
+async def test_disk_tier_serves_a_new_process_and_counts_hits(tmp_path):
+    await cache.ResponseCache(directory=str(tmp_path)).set("ab12", "reply")
+    responses = cache.ResponseCache(directory=str(tmp_path))
+    assert await responses.get("ab12") == "reply"
+    assert await responses.get("ab12") == "reply"
+    assert await responses.get("cd34") is None
+    stats = responses.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.6667
+
+
+@pytest.mark.anyio
+async def test_disk_tier_stays_under_its_size_budget(tmp_path):
+    responses = cache.ResponseCache(directory=str(tmp_path), disk_max_mb=2500 / 1024 / 1024)
+    for i in range(5):
+        await responses.set(f"{i:02d}", "x" * 1000)
+    files = [os.path.join(root, name) for root, _, names in os.walk(tmp_path) for name in names]
+    assert responses.counters["evictions"] >= 3
+    assert sum(os.path.getsize(p) for p in files) == responses._disk_bytes <= 2500
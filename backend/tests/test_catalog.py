@@ -0,0 +1,68 @@
+"""Student/topic catalog cache (tutor/catalog.py)."""
+import asyncio
+
+import httpx
+import pytest
+
+from tutor import http, limits, resilience
+from tutor.catalog import Catalog
+
+pytestmark = pytest.mark.anyio
+
+API = "http://knowunity.test"
+
+
+@pytest.fixture(autouse=True)
+def fresh_upstreams(monkeypatch):
+    monkeypatch.setattr(limits, "_limiters", {})
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(resilience, "HEDGE_DELAY", 0)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Serves ``/students`` with an ETag; ``requests`` records each request's If-None-Match."""
+    fake = {"requests": [], "release": asyncio.Event()}
+    fake["release"].set()
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        fake["requests"].append(request.headers.get("if-none-match"))
+        await fake["release"].wait()
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json={"students": [{"id": "s0"}]}, headers={"ETag": '"v1"'})
+
+    monkeypatch.setattr(http, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handle)))
+    return fake
+
+
+async def test_concurrent_misses_share_one_request(upstream):
+    upstream["release"].clear()
+    catalog = Catalog(API, {}, prefetch=[])
+    readers = [asyncio.create_task(catalog.students("dev")) for _ in range(5)]
+    await asyncio.sleep(0.01)
+    upstream["release"].set()
+    assert all(r == {"students": [{"id": "s0"}]} for r in await asyncio.gather(*readers))
+    assert upstream["requests"] == [None] and catalog.counters["misses"] == 5
+
+
+async def test_cancelled_caller_does_not_cancel_the_shared_fetch(upstream):
+    upstream["release"].clear()
+    catalog = Catalog(API, {}, prefetch=[])
+    first = asyncio.create_task(catalog.students("dev"))
+    second = asyncio.create_task(catalog.students("dev"))
+    await asyncio.sleep(0.01)
+    first.cancel()  # e.g. a client disconnect or a hedge loser
+    await asyncio.sleep(0)
+    upstream["release"].set()
+    assert await second == {"students": [{"id": "s0"}]}
+    assert first.cancelled() and len(upstream["requests"]) == 1
+
+
+async def test_stale_entry_is_served_and_revalidated_with_its_etag(upstream):
+    catalog = Catalog(API, {}, ttl=0, prefetch=[])
+    await catalog.students("dev")
+    assert await catalog.students("dev") == {"students": [{"id": "s0"}]}  # stale, served at once
+    await asyncio.sleep(0.01)  # the background revalidation
+    assert upstream["requests"] == [None, '"v1"']
+    assert catalog.counters["stale_hits"] == 1 and catalog.counters["not_modified"] == 1
@@ -0,0 +1,80 @@
+"""Transcript compaction for long conversations (tutor/compaction.py)."""
+import pytest
+
+from tutor import compaction, llm
+from tutor.conversation import Conversation
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    monkeypatch.setattr(compaction, "COMPACTION_KEEP_TURNS", 2)
+    monkeypatch.setattr(compaction, "COMPACTION_MAX_EVIDENCE", 20)
+    monkeypatch.setattr(compaction, "stats", dict.fromkeys(compaction.stats, 0))
+
+
+def conversation(turns: int) -> Conversation:
+    conv = Conversation("c", "Maths")
+    for i in range(turns):
+        conv.add_turn(f"Question {i + 1}?", f"Answer {i + 1}, because reasons.")
+    return conv
+
+
+async def test_short_conversations_and_off_send_the_full_transcript():
+    conv = conversation(3)
+    assert await compaction.history_text(conv, mode="evidence") == conv.transcript
+    assert await compaction.history_text(conversation(6), mode="off") == conversation(6).transcript
+
+
+async def test_evidence_folds_k_turns_at_a_time():
+    conv = conversation(4)
+    text = await compaction.history_text(conv, mode="evidence")
+    assert conv.folded_turns == 2
+    assert text.startswith("Earlier turns (1-2), condensed:\n")
+    assert '- Turn 1: "Answer 1, because reasons." [reasoning]' in text
+    assert text.endswith("Latest turns:\n" + "\n".join(conv.turn_lines(2, 4)))
+
+    conv.add_turn("Question 5?", "Answer 5.")
+    folded = conv.folded
+    await compaction.history_text(conv, mode="evidence")
+    assert conv.folded == folded and conv.folded_turns == 2  # only 3 unfolded turns: no refold yet
+
+    conv.add_turn("Question 6?", "Answer 6.")
+    await compaction.history_text(conv, mode="evidence")
+    assert conv.folded_turns == 4 and conv.folded.count("\n") == 3
+    assert compaction.stats["folds"] == 2 and compaction.stats["folded_turns"] == 4
+
+
+async def test_oldest_evidence_is_dropped(monkeypatch):
+    monkeypatch.setattr(compaction, "COMPACTION_MAX_EVIDENCE", 3)
+    conv = conversation(0)
+    for i in range(8):
+        conv.add_turn(f"Question {i + 1}?", f"Answer {i + 1}.")
+        await compaction.history_text(conv, mode="evidence")
+    assert conv.folded.split("\n")[0].startswith("- Turn 4:")
+
+
+async def test_summary_mode_keeps_the_llm_summary(monkeypatch):
+    async def chat_json(client, model, prompt, **kwargs):
+        return {"summary": " Knows the basics. "}
+
+    monkeypatch.setattr(llm, "chat_json", chat_json)
+    conv = conversation(4)
+    text = await compaction.history_text(conv, client=object(), model="m", mode="summary")
+    assert conv.folded == "Knows the basics." and "condensed:\nKnows the basics.\n" in text
+
+
+async def test_failed_summary_falls_back_to_evidence(monkeypatch):
+    async def chat_json(client, model, prompt, **kwargs):
+        raise RuntimeError("rate limited")
+
+    monkeypatch.setattr(llm, "chat_json", chat_json)
+    conv = conversation(4)
+    await compaction.history_text(conv, client=object(), model="m", mode="summary")
+    assert conv.folded.startswith("- Turn 1:") and compaction.stats["summary_errors"] == 1
+
+
+async def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        await compaction.history_text(conversation(1), mode="zip")
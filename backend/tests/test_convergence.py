@@ -0,0 +1,74 @@
+"""Turn-level early stopping (tutor/convergence.py)."""
+import pytest
+
+from tutor import convergence, devset
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    monkeypatch.setattr(convergence, "EARLY_STOP_STABLE_TURNS", 2)
+    monkeypatch.setattr(convergence, "EARLY_STOP_CONFIDENCE", 0.8)
+    monkeypatch.setattr(convergence, "EARLY_STOP_MIN_TURNS", 2)
+    monkeypatch.setattr(convergence, "EARLY_STOP_AUDIT_RATE", 0)
+    monkeypatch.setattr(convergence, "stats", dict.fromkeys(convergence.stats, 0))
+
+
+def analysed(level, **extra):
+    return {"understanding_level": level, **extra}
+
+
+def run(tracker, analyses, max_turns=10):
+    """Feeds turns until the tracker says stop; returns the turn it stopped at, or None."""
+    for analysis in analyses:
+        if tracker.update(analysis, [], max_turns):
+            return tracker.turns
+    return None
+
+
+def test_stable_stops_after_repeated_levels_and_counts_the_saving():
+    tracker = convergence.Tracker(policy="stable")
+    assert run(tracker, [analysed(2), analysed(3), analysed(3)]) == 3
+    assert convergence.stats["stopped"] == 1 and convergence.stats["turns_saved"] == 7
+
+
+def test_local_estimates_and_fallbacks_never_stop_a_pair():
+    tracker = convergence.Tracker(policy="stable")
+    turns = [analysed(3), analysed(3, estimated=True), analysed(3, fallback=True)]
+    assert run(tracker, turns) is None
+
+
+def test_confidence_needs_min_turns_and_ensemble_agreement():
+    tracker = convergence.Tracker(policy="confidence")
+    agreed = analysed(4, ensemble={"levels": [4, 4, 4, 4, 3]})
+    split = analysed(4, ensemble={"levels": [4, 4, 3, 2, 1]})
+    assert not tracker.update(agreed, [], 10)  # below EARLY_STOP_MIN_TURNS
+    assert not tracker.update(split, [], 10)
+    assert tracker.update(agreed, [], 10)
+
+
+def test_off_and_the_last_turn_never_stop():
+    assert run(convergence.Tracker(policy="off"), [analysed(3)] * 4) is None
+    assert run(convergence.Tracker(policy="stable"), [analysed(3)] * 2, max_turns=2) is None
+
+
+def test_replayed_turns_resume_the_streak():
+    tracker = convergence.Tracker([analysed(3)], policy="stable")
+    assert tracker.update(analysed(3), [], 10)
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        convergence.Tracker(policy="sometimes")
+
+
+def test_audited_pair_runs_on_and_is_scored_against_the_end(monkeypatch):
+    monkeypatch.setattr(convergence, "EARLY_STOP_AUDIT_RATE", 1)
+    monkeypatch.setattr(devset, "labels", lambda set_type: {("s", "t"): 4})
+    tracker = convergence.Tracker(policy="stable")
+    assert run(tracker, [analysed(2), analysed(2), analysed(3), analysed(4)]) is None
+    assert tracker.stop_level == 2
+
+    tracker.finish("dev", {"student_id": "s", "topic_id": "t", "inferred_level": 4})
+    snapshot = convergence.snapshot()
+    assert snapshot["audited"] == 1 and snapshot["stop_mse"] == 4.0
+    assert snapshot["label_mse_at_stop"] == 4.0 and snapshot["label_mse_full"] == 0.0
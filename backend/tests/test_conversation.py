@@ -0,0 +1,45 @@
+"""Server-side transcripts and the conversation registry (tutor/conversation.py)."""
+from tutor import conversation
+from tutor.conversation import Conversation, ConversationRegistry
+
+HISTORY = [{"role": "user", "content": "What is 2+2?"}, {"role": "assistant", "content": "4"}]
+
+
+def test_transcript_is_joined_from_the_appended_turns():
+    conv = Conversation("c", "Maths", HISTORY)
+    assert conv.turns == 1 and conv.transcript == "Tutor: What is 2+2?\nStudent: 4"
+
+    conv.add_turn("And 3+3?", "I think 6")
+    assert conv.turns == 2
+    assert conv.transcript == "Tutor: What is 2+2?\nStudent: 4\nTutor: And 3+3?\nStudent: I think 6"
+    assert conv.chars == len(conv.transcript)
+    assert conv.turn_lines(1, 2) == ["Tutor: And 3+3?", "Student: I think 6"]
+    assert conv.student_replies() == ["4", "I think 6"]
+
+
+def test_registry_evicts_the_least_recently_used_conversation():
+    registry = ConversationRegistry(max_size=2)
+    registry.get_or_create("a")
+    registry.get_or_create("b")
+    registry.get("a")  # now the most recent
+    registry.get_or_create("c")
+    assert registry.get("b") is None
+    assert registry.get("a") is not None and len(registry) == 2
+
+
+def test_registry_expires_idle_conversations(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(conversation.time, "monotonic", lambda: now[0])
+    registry = ConversationRegistry(ttl=60)
+    registry.get_or_create("old")
+    now[0] += 61
+    registry.get_or_create("new")
+    assert registry.get("old") is None and registry.get("new") is not None
+
+
+def test_server_transcript_wins_over_a_resent_history():
+    registry = ConversationRegistry()
+    conv = registry.get_or_create("c", "Maths", HISTORY)
+    conv.add_turn("And 3+3?", "6")
+    assert registry.get_or_create("c", history=HISTORY) is conv
+    assert conv.turns == 2
@@ -0,0 +1,68 @@
+"""Partial submits and local scoring against dev labels (tutor/devset.py, /submit_simulation)."""
+import pytest
+from fastapi import HTTPException
+
+from tutor import devset
+from tutor.server import create
+from tutor.store import MemoryStore
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(devset, "DEV_LABELS_PATH", str(tmp_path / "dev_labels.json"))
+    server = create("phack-fast")
+    server._store = MemoryStore()
+    return server
+
+
+def finish(store, count: int, failed: int = 0, status: str = "completed"):
+    store.update_run("dev", status=status, total_expected=count + failed)
+    for i in range(count + failed):
+        pair = {"student_id": f"s{i}", "topic_id": "t"}
+        if i < count:
+            store.finish_pair("dev", pair, {**pair, "inferred_level": 3})
+        else:
+            store.fail_pair("dev", pair, "RuntimeError: boom")
+
+
+async def test_completed_run_with_failed_pairs_needs_a_partial_submit(server):
+    finish(server.store, 7, failed=1)
+    devset.save("dev", [{"student_id": f"s{i}", "topic_id": "t", "level": 3} for i in range(8)])
+    with pytest.raises(HTTPException) as e:
+        await server.submit_simulation("dev", local=True)
+    assert e.value.status_code == 400 and "1 pairs failed" in e.value.detail
+
+    result = await server.submit_simulation("dev", partial=True, local=True)
+    assert result["partial"] and result["coverage"] == 0.875 and result["local_mse"]["n"] == 7
+
+
+async def test_partial_submit_is_refused_below_min_coverage(server):
+    finish(server.store, 1, failed=3)
+    with pytest.raises(HTTPException) as e:
+        await server.submit_simulation("dev", partial=True, local=True)
+    assert "Only 25% of pairs are finished" in e.value.detail
+
+
+def test_score_counts_only_labelled_predictions(tmp_path, monkeypatch):
+    monkeypatch.setattr(devset, "DEV_LABELS_PATH", str(tmp_path / "dev_labels.json"))
+    devset.save("dev", [{"student_id": "a", "topic_id": "t", "level": 2},
+                        {"student_id": "b", "topic_id": "t", "true_level": 4},
+                        {"student_id": "c", "topic_id": "t", "level": 4},
+                        {"student_id": "d", "topic_id": "t"}])  # no level: not saved
+    predictions = [{"student_id": s, "topic_id": "t", "predicted_level": level}
+                   for s, level in (("a", 3), ("b", 4), ("c", 2), ("x", 1))]
+    score = devset.score("dev", predictions)
+    assert score["mse"] == 1.6667 and score["n"] == 3 and score["unlabelled"] == 1 and score["labelled_pairs"] == 3
+    assert score["by_true_level"] == {"2": {"n": 1, "mse": 1.0, "mean_predicted": 3.0},
+                                      "4": {"n": 2, "mse": 2.0, "mean_predicted": 3.0}}
+
+
+@pytest.mark.parametrize("summary, known_pairs, expected", [
+    ({"completed": 6, "total_expected": 8}, 7, 0.75),
+    ({"completed": 6}, 8, 0.75),  # discovery still running
+    ({}, 0, 0.0),
+])
+def test_coverage(summary, known_pairs, expected):
+    assert devset.coverage(summary, known_pairs) == expected
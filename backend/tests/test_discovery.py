@@ -0,0 +1,109 @@
+"""Pair discovery for /generate_mse (tutor/discovery.py), with and without the catalog."""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from tutor import discovery, http, limits, resilience
+from tutor.catalog import Catalog
+
+pytestmark = pytest.mark.anyio
+
+API = "http://knowunity.test"
+
+
+class Upstream:
+    """Fake Knowunity: ``topics`` maps a student id to its topic ids, or to an HTTP status to fail with."""
+
+    def __init__(self, topics: dict):
+        self.topics = topics
+        self.gates = {}  # student id -> asyncio.Event its topics request waits for
+        self.students_status = 200
+        self.refused = set()  # (student id, topic id) pairs /interact/start rejects
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path == "/students":
+            if self.students_status != 200:
+                return httpx.Response(self.students_status, text="nope")
+            return httpx.Response(200, json={"students": [{"id": s} for s in self.topics]})
+        if path == "/interact/start":
+            body = json.loads(request.content)
+            if (body["student_id"], body["topic_id"]) in self.refused:
+                return httpx.Response(422, text="unknown topic")
+            return httpx.Response(200, json={"conversation_id": f"{body['student_id']}-{body['topic_id']}", "max_turns": 3})
+        student = path.split("/")[2]
+        if student in self.gates:
+            await self.gates[student].wait()
+        topics = self.topics[student]
+        if isinstance(topics, int):
+            return httpx.Response(topics, text="nope")
+        return httpx.Response(200, json={"topics": [{"id": t, "name": t} for t in topics]})
+
+
+@pytest.fixture(autouse=True)
+def fresh_upstreams(monkeypatch):
+    monkeypatch.setattr(limits, "_limiters", {})
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(resilience, "RETRY_BACKOFF_BASE", 0)
+    monkeypatch.setattr(resilience, "HEDGE_DELAY", 0)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    fake = Upstream({})
+    monkeypatch.setattr(http, "_client", httpx.AsyncClient(transport=httpx.MockTransport(fake.handle)))
+    return fake
+
+
+def drain(queue: asyncio.Queue) -> list:
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+async def test_catalog_discovery_isolates_a_student_whose_topics_fail(upstream):
+    upstream.topics.update({"s0": ["t0", "t1"], "s1": 404, "s2": ["t0"]})
+    queue = asyncio.Queue()
+    summary = await discovery.discover_pairs(API, {}, "dev", queue, catalog=Catalog(API, {}, prefetch=[]))
+
+    assert summary == {"pair_count": 3, "skipped": 0, "failed": 1}
+    pairs = drain(queue)
+    assert pairs[-1] is None
+    assert sorted(p["conversation_id"] for p in pairs[:-1]) == ["s0-t0", "s0-t1", "s2-t0"]
+
+
+async def test_catalog_discovery_streams_pairs_before_every_student_is_listed(upstream):
+    upstream.topics.update({"s0": ["t0"], "s1": ["t0"]})
+    upstream.gates["s1"] = asyncio.Event()
+    queue = asyncio.Queue()
+    task = asyncio.create_task(discovery.discover_pairs(API, {}, "dev", queue, catalog=Catalog(API, {}, prefetch=[])))
+
+    first = await asyncio.wait_for(queue.get(), 1)
+    assert first["conversation_id"] == "s0-t0" and not task.done()
+    upstream.gates["s1"].set()
+    assert (await task)["pair_count"] == 2
+
+
+async def test_failed_topics_and_starts_are_counted_and_known_pairs_reused(upstream):
+    upstream.topics.update({"s0": ["t0", "t1", "t2"], "s1": 404})
+    upstream.refused.add(("s0", "t1"))
+    known = {("s0", "t2"): {"student_id": "s0", "topic_id": "t2", "conversation_id": "old", "done": True}}
+    queue = asyncio.Queue()
+    summary = await discovery.discover_pairs(API, {}, "dev", queue, known=known)
+
+    assert summary == {"pair_count": 1, "skipped": 1, "failed": 2}
+    assert [p["conversation_id"] for p in drain(queue)[:-1]] == ["s0-t0"]
+
+
+async def test_failed_student_listing_ends_the_stream_with_an_error(upstream):
+    upstream.students_status = 403
+    queue = asyncio.Queue()
+    with pytest.raises(httpx.HTTPStatusError):
+        await discovery.discover_pairs(API, {}, "dev", queue)
+
+    with pytest.raises(discovery.DiscoveryError):
+        async for _ in discovery.iter_pairs(queue):
+            pass
@@ -0,0 +1,76 @@
+"""Ensemble analysis: aggregation and the sampling deadline (tutor/ensemble.py)."""
+import asyncio
+
+import pytest
+
+from tutor import ensemble, llm
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("method, levels, expected", [
+    ("mean", [2, 3, 5], 3),
+    ("median", [1, 4, 5, 5], 4),  # 4.5 rounds to even
+    ("majority", [2, 2, 4], 2),
+    ("majority", [1, 1, 4, 4, 3], 4),  # a tie goes to the level nearest the median (3)...
+    ("majority", [2, 4], 2),  # ...and then to the lower level
+])
+def test_aggregate(method, levels, expected):
+    assert ensemble.aggregate(levels, method) == expected
+
+
+def test_unknown_aggregate_is_rejected():
+    with pytest.raises(ValueError):
+        ensemble.aggregate([3], "mode")
+
+
+@pytest.fixture
+def samples(monkeypatch):
+    """Fakes one analysis call per sample: ``(level, delay)``, or an exception to raise."""
+    script = []
+    monkeypatch.setattr(ensemble, "ENSEMBLE_MODELS", [])
+    monkeypatch.setattr(ensemble, "stats", dict.fromkeys(ensemble.stats, 0))
+
+    async def chat_json(client, model, prompt, **kwargs):
+        outcome = script.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        level, delay = outcome
+        await asyncio.sleep(delay)
+        return {"understanding_level": level, "justification": f"level {level}"}
+
+    monkeypatch.setattr(llm, "chat_json", chat_json)
+    return script
+
+
+async def test_analysis_carries_the_aggregate_and_the_ensemble_block(samples, monkeypatch):
+    monkeypatch.setattr(ensemble, "ENSEMBLE_SAMPLES", 3)
+    samples += [(2, 0), (4, 0), (4, 0)]
+    result = await ensemble.analyze(None, "m", "prompt", None)
+    assert result["understanding_level"] == 4 and result["justification"] == "level 4"
+    assert result["ensemble"]["levels"] == [2, 4, 4] and result["ensemble"]["spread"] == 2
+
+
+async def test_deadline_cancels_slow_samples_and_failures_are_skipped(samples, monkeypatch):
+    monkeypatch.setattr(ensemble, "ENSEMBLE_SAMPLES", 3)
+    monkeypatch.setattr(ensemble, "ENSEMBLE_DEADLINE", 0.05)
+    samples += [(3, 0), RuntimeError("rate limited"), (5, 1)]
+    result = await ensemble.analyze(None, "m", "prompt", None)
+    assert result["understanding_level"] == 3
+    assert result["ensemble"]["requested"] == 3 and result["ensemble"]["finished"] == 1
+    assert ensemble.stats["failed"] == 1 and ensemble.stats["cancelled"] == 1
+
+
+async def test_waits_past_the_deadline_for_a_first_sample(samples, monkeypatch):
+    monkeypatch.setattr(ensemble, "ENSEMBLE_SAMPLES", 2)
+    monkeypatch.setattr(ensemble, "ENSEMBLE_DEADLINE", 0.01)
+    samples += [(2, 0.05), (4, 1)]
+    result = await ensemble.analyze(None, "m", "prompt", None)
+    assert result["understanding_level"] == 2 and result["ensemble"]["finished"] == 1
+
+
+async def test_raises_when_every_sample_failed(samples, monkeypatch):
+    monkeypatch.setattr(ensemble, "ENSEMBLE_SAMPLES", 2)
+    samples += [RuntimeError("down"), RuntimeError("down")]
+    with pytest.raises(RuntimeError):
+        await ensemble.analyze(None, "m", "prompt", None)
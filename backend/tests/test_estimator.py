@@ -0,0 +1,74 @@
+"""Early-exit level estimator and its skip decisions (tutor/estimator.py)."""
+import pytest
+
+from tutor import estimator
+from tutor.conversation import Conversation
+
+
+@pytest.fixture(autouse=True)
+def fixed_estimate(monkeypatch):
+    """An estimator that always says level 3 with the confidence in ``estimate["confidence"]``."""
+    estimate = {"confidence": 0.9}
+    monkeypatch.setitem(estimator.ESTIMATORS, "fixed", lambda replies: (3.0, estimate["confidence"]))
+    monkeypatch.setattr(estimator, "ESTIMATOR", "fixed")
+    monkeypatch.setattr(estimator, "ESTIMATOR_SKIP_CONFIDENCE", 0.7)
+    monkeypatch.setattr(estimator, "ESTIMATOR_MAX_CONSECUTIVE_SKIPS", 2)
+    monkeypatch.setattr(estimator, "ESTIMATOR_AUDIT_RATE", 0)
+    monkeypatch.setattr(estimator, "stats", dict.fromkeys(estimator.stats, 0))
+    return estimate
+
+
+def conversation(last_level=3) -> Conversation:
+    conv = Conversation("c", "Maths")
+    conv.add_turn("What is 2+2?", "It is 4 because 2 and 2 make 4.")
+    conv.last_level = last_level
+    return conv
+
+
+def test_confident_agreeing_intermediate_turn_is_skipped():
+    decision = estimator.decide(conversation(), final=False, mode="skip")
+    assert decision.skip and decision.analysis["understanding_level"] == 3
+    assert decision.analysis["estimated"]
+
+
+@pytest.mark.parametrize("final, mode, last_level, confidence", [
+    (True, "skip", 3, 0.9),  # the final turn feeds the prediction
+    (False, "shadow", 3, 0.9),
+    (False, "skip", 4, 0.9),  # disagrees with the last LLM level
+    (False, "skip", None, 0.9),  # no LLM level yet
+    (False, "skip", 3, 0.5),  # not confident
+])
+def test_turn_is_analysed(fixed_estimate, final, mode, last_level, confidence):
+    fixed_estimate["confidence"] = confidence
+    decision = estimator.decide(conversation(last_level), final=final, mode=mode)
+    assert not decision.skip and decision.analysis is None
+
+
+def test_off_does_not_estimate():
+    decision = estimator.decide(conversation(), final=False, mode="off")
+    assert decision.level is None and estimator.stats["turns"] == 0
+
+
+def test_consecutive_skips_are_capped():
+    conv = conversation()
+    skips = []
+    for _ in range(4):
+        decision = estimator.decide(conv, final=False, mode="skip")
+        estimator.record(conv, decision, decision.analysis or {"understanding_level": 3})
+        skips.append(decision.skip)
+    assert skips == [True, True, False, True]
+
+
+def test_audited_skip_runs_the_call_and_measures_the_skip_error(monkeypatch):
+    monkeypatch.setattr(estimator, "ESTIMATOR_AUDIT_RATE", 1)
+    conv = conversation()
+    decision = estimator.decide(conv, final=False, mode="skip")
+    assert decision.audit and not decision.skip
+    estimator.record(conv, decision, {"understanding_level": 5})
+    assert estimator.snapshot()["skip_mse"] == 4.0
+
+
+def test_heuristic_ranks_confusion_below_reasoning():
+    confused, _ = estimator.heuristic(["I don't know, maybe? I'm confused."])
+    reasoned, _ = estimator.heuristic(["It doubles because each step multiplies by 2, for example 4 becomes 8."])
+    assert confused < 3 < reasoned
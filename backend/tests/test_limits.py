@@ -0,0 +1,182 @@
+"""Adaptive limiters and their priority / fair-share queue (tutor/limits.py, tutor/scheduling.py)."""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from tutor import http, limits, scheduling
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def fresh_limiters(monkeypatch):
+    monkeypatch.setattr(limits, "_limiters", {})
+    monkeypatch.setattr(scheduling, "SCHEDULER_ENABLED", True)
+    monkeypatch.setattr(scheduling, "SCHEDULER_INTERACTIVE_RESERVE", 1)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def waiter(limiter, order: list, label: str, tenant: str = None):
+    """Takes a slot as batch work of ``tenant`` (interactive if None), records the grant and keeps the slot."""
+    if tenant is None:
+        await limiter.acquire()
+    else:
+        with scheduling.batch(tenant):
+            await limiter.acquire()
+    order.append(label)
+
+
+async def test_interactive_waiter_goes_before_earlier_batch_waiters():
+    limiter = limits.PriorityLimiter("test", 2)
+    await limiter.acquire()
+    await limiter.acquire()
+    order = []
+    tasks = [asyncio.create_task(waiter(limiter, order, f"batch{i}", "dev")) for i in range(3)]
+    await settle()
+    tasks.append(asyncio.create_task(waiter(limiter, order, "live")))
+    await settle()
+
+    limiter.release()
+    await settle()
+    assert order == ["live"]
+    for task in tasks:
+        task.cancel()
+
+
+async def test_batch_leaves_the_reserved_slot_to_interactive():
+    limiter = limits.PriorityLimiter("test", 3)
+    order = []
+    tasks = [asyncio.create_task(waiter(limiter, order, f"batch{i}", "dev")) for i in range(3)]
+    await settle()
+    assert order == ["batch0", "batch1"]
+    assert limiter.stats()["queue_depth"] == 1
+
+    await waiter(limiter, order, "live")  # granted at once from the reserve
+    assert order[-1] == "live" and limiter.in_flight == 3
+    for task in tasks:
+        task.cancel()
+
+
+async def test_batch_tenants_take_turns():
+    limiter = limits.PriorityLimiter("test", 2)
+    await limiter.acquire()
+    await limiter.acquire()
+    order = []
+    tasks = [asyncio.create_task(waiter(limiter, order, f"dev{i}", "dev")) for i in range(3)]
+    await settle()
+    tasks.append(asyncio.create_task(waiter(limiter, order, "eval0", "eval")))
+    await settle()
+
+    for _ in range(2):
+        limiter.release()
+        limiter.release()  # the slot granted by the previous round
+        await settle()
+    assert order[:2] == ["dev0", "eval0"]
+    for task in tasks:
+        task.cancel()
+
+
+async def test_batch_goes_next_after_an_interactive_burst(monkeypatch):
+    monkeypatch.setattr(scheduling, "SCHEDULER_INTERACTIVE_BURST", 2)
+    monkeypatch.setattr(scheduling, "SCHEDULER_INTERACTIVE_RESERVE", 0)
+    limiter = limits.PriorityLimiter("test", 1)
+    await limiter.acquire()
+    order = []
+    tasks = [asyncio.create_task(waiter(limiter, order, "batch", "dev"))]
+    tasks += [asyncio.create_task(waiter(limiter, order, f"live{i}")) for i in range(4)]
+    await settle()
+
+    for _ in range(4):
+        limiter.release()
+        await settle()
+    assert order == ["live0", "live1", "batch", "live2"]
+    for task in tasks:
+        task.cancel()
+
+
+async def test_cancelled_waiter_leaves_the_queue_without_a_slot():
+    limiter = limits.PriorityLimiter("test", 1)
+    await limiter.acquire()
+    order = []
+    cancelled = asyncio.create_task(waiter(limiter, order, "gone"))
+    await settle()
+    cancelled.cancel()
+    await settle()
+    assert limiter.stats()["queue_depth"] == 0
+
+    limiter.release()
+    assert limiter.in_flight == 0
+    await waiter(limiter, order, "next")
+    assert order == ["next"]
+
+
+async def test_waiter_cancelled_in_the_same_tick_as_a_release_stays_cancelled():
+    limiter = limits.PriorityLimiter("test", 1)
+    await limiter.acquire()
+    task = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    task.cancel()  # cancels the queued future...
+    limiter.release()  # ...which the release then pops and skips
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert limiter.in_flight == 0 and limiter.stats()["queue_depth"] == 0
+
+
+async def test_slot_handed_to_a_cancelled_waiter_is_released():
+    limiter = limits.PriorityLimiter("test", 1)
+    await limiter.acquire()
+    task = asyncio.create_task(waiter(limiter, [], "late"))
+    await settle()
+    limiter.release()  # hands the slot over
+    task.cancel()  # before the waiter ran
+    await settle()
+    assert task.cancelled()
+    assert limiter.in_flight == 0
+
+
+async def test_aimd_grows_on_fast_successes_and_halves_on_throttling():
+    limiter = limits.AdaptiveLimiter("test", initial=4, max=10, cooldown=0)
+    for _ in range(8):
+        async with limiter.slot() as slot:
+            slot.observe(200)
+    assert 5 <= limiter.limit < 7
+
+    grown = limiter.limit
+    async with limiter.slot() as slot:
+        slot.observe(429)
+    assert limiter.limit == pytest.approx(grown * 0.5)
+    assert limiter.counters["throttled"] == 1
+
+
+async def test_host_cap_does_not_queue_interactive_behind_batch(monkeypatch):
+    """A grown limiter above HTTP_MAX_PER_HOST must not strand a live call behind batch calls at the host cap."""
+    monkeypatch.setattr(http, "HTTP_MAX_PER_HOST", 4)
+    monkeypatch.setattr(limits, "ADAPTIVE_LIMITS", {"test_upstream": {"initial": 50, "max": 50}})
+
+    async def handler(request):
+        await asyncio.sleep(0.1)
+        return httpx.Response(200)
+
+    monkeypatch.setattr(http, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    async def call():
+        return await http.post("http://upstream.test/interact", limit="test_upstream", retries=0)
+
+    async def batch_call():
+        with scheduling.batch("dev"):
+            await call()
+
+    batch = [asyncio.create_task(batch_call()) for _ in range(20)]
+    await asyncio.sleep(0.01)
+    start = time.monotonic()
+    await call()
+    waited = time.monotonic() - start
+    await asyncio.gather(*batch)
+    await http.aclose()
+    assert waited < 0.3  # queued behind the 20 batch calls, 4 at a time, it took ~0.6 s
@@ -0,0 +1,54 @@
+"""Parsing, local repair and streaming field extraction of LLM replies (tutor/parsing.py)."""
+import json
+
+import pytest
+
+from tutor import parsing, schemas
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats(monkeypatch):
+    monkeypatch.setattr(parsing, "stats", {})
+
+
+ANALYSIS = {"understanding_level": 4, "justification": "Explains the steps.", "evidence": ["because"]}
+
+
+def test_valid_reply_takes_the_fast_path():
+    assert parsing.parse(json.dumps(ANALYSIS), schemas.Analysis, "m") == ANALYSIS
+    assert parsing.stats["m"]["ok"] == 1
+
+
+@pytest.mark.parametrize("reply", [
+    "```json\n" + json.dumps(ANALYSIS) + "\n```",
+    "Here is my analysis: " + json.dumps(ANALYSIS) + " Hope it helps {",
+    json.dumps(ANALYSIS)[:-1] + ",}",
+    '{"understanding_level": 4, "justification": "uses {braces} and \\"quotes\\"", "evidence": ["because",],}',
+])
+def test_common_defects_are_repaired_locally(reply):
+    parsed = parsing.parse(reply, schemas.Analysis, "m")
+    assert parsed["understanding_level"] == 4
+    assert parsing.stats["m"]["repaired"] == 1
+
+
+def test_schema_failure_and_garbage_are_counted_apart():
+    with pytest.raises(parsing.ParseError):
+        parsing.parse('{"justification": "no level"}', schemas.Analysis, "m")
+    with pytest.raises(parsing.ParseError):
+        parsing.parse("I cannot answer that.", schemas.Analysis, "m")
+    assert parsing.stats["m"]["invalid"] == 1 and parsing.stats["m"]["unparseable"] == 1
+
+
+def test_field_stream_yields_only_new_unescaped_text():
+    reply = json.dumps({"understanding_level": 3, "justification": 'Says "maybe" é😀\nthen stops.'})
+    stream = parsing.FieldStream("justification")
+    pieces = [text for i in range(0, len(reply), 3) for _, text in stream.feed(reply[i:i + 3])]
+    assert "".join(pieces) == 'Says "maybe" é😀\nthen stops.'
+    assert all(pieces)
+
+
+def test_field_stream_waits_for_the_field():
+    stream = parsing.FieldStream("justification", "thinking_process")
+    assert stream.feed('{"understanding_level": 2, "justif') == []
+    assert stream.feed('ication": "Par') == [("justification", "Par")]
+    assert stream.feed('tial"}') == [("justification", "tial")]
@@ -0,0 +1,63 @@
+"""Offline re-analysis and Batch API files (tutor/reanalysis.py)."""
+import json
+
+import pytest
+
+from tutor import llm, reanalysis
+from tutor.prompts import PromptTemplate
+
+pytestmark = pytest.mark.anyio
+
+PROMPT = PromptTemplate("test", "Rate the student.", "{topic_name}\n{history_text}")
+
+
+def transcript(student: str, stored_level=3) -> dict:
+    return {"id": f"{student}/t", "student_id": student, "topic_id": "t", "topic_name": "Maths",
+            "history_text": "Tutor: Hi\nStudent: Hello", "stored_level": stored_level}
+
+
+def test_by_id_keeps_only_requested_ids():
+    batch = [{"id": "a/t"}, {"id": "b/t"}]
+    reply = {"results": [{"id": "a/t", "understanding_level": 2}, {"id": "x/t", "understanding_level": 5}, "junk"]}
+    assert reanalysis._by_id(reply, batch) == {"a/t": {"id": "a/t", "understanding_level": 2}}
+
+
+def test_by_id_accepts_a_bare_reply_for_a_single_conversation():
+    reply = {"understanding_level": 4}
+    assert reanalysis._by_id(reply, [{"id": "a/t"}]) == {"a/t": reply}
+
+
+def test_parse_batch_output_maps_replies_and_errors_back_to_transcripts():
+    transcripts = [transcript("a"), transcript("b"), transcript("c")]
+    content = json.dumps({"results": [{"id": "a/t", "understanding_level": 7, "justification": "ok"}]})
+    lines = [
+        json.dumps({"custom_id": "a/t,b/t", "response": {"body": {"choices": [{"message": {"content": content}}]}}}),
+        "",
+        json.dumps({"custom_id": "c/t", "response": None, "error": {"message": "expired"}}),
+    ]
+    a, b, c = reanalysis.parse_batch_output(lines, transcripts)
+    assert a["level"] == 5 and a["justification"] == "ok"  # clamped to 1-5
+    assert b["level"] is None and b["error"] == "no result"
+    assert c["level"] is None and c["error"] == "expired"
+
+
+def test_batch_requests_pack_transcripts_per_request():
+    requests = reanalysis.batch_requests("m", [transcript("a"), transcript("b"), transcript("c")], PROMPT, batch_size=2)
+    assert [r["custom_id"] for r in requests] == ["a/t,b/t", "c/t"]
+    assert "### Conversation a/t" in requests[0]["body"]["messages"][1]["content"]
+
+
+async def test_conversations_missing_from_a_batch_reply_are_retried_alone(monkeypatch):
+    calls = []
+
+    async def chat_json(client, model, messages, **kwargs):
+        calls.append(messages[-1]["content"])
+        if len(calls) == 1:
+            return {"results": [{"id": "a/t", "understanding_level": 2}]}
+        return {"understanding_level": 4}
+
+    monkeypatch.setattr(llm, "chat_json", chat_json)
+    results = await reanalysis.reanalyze(None, "m", [transcript("a"), transcript("b")], PROMPT, batch_size=2)
+    assert [r["level"] for r in results] == [2, 4] and len(calls) == 2
+    assert reanalysis.summarize(results) == {"transcripts": 2, "failed": 0, "changed": 2,
+                                             "mean_abs_diff": 1.0, "mean_squared_diff": 1.0}
@@ -0,0 +1,162 @@
+"""Retries, hedging and circuit breakers (tutor/resilience.py)."""
+import asyncio
+
+import httpx
+import pytest
+
+from tutor import resilience
+
+pytestmark = pytest.mark.anyio
+
+REQUEST = httpx.Request("GET", "http://upstream.test/")
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(resilience, "RETRY_BACKOFF_BASE", 0)
+    monkeypatch.setattr(resilience, "RETRY_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(resilience, "stats", dict.fromkeys(resilience.stats, 0))
+
+
+def scripted(*outcomes):
+    """A ``send`` that returns (status codes) or raises (exceptions) the outcomes in order."""
+    calls = []
+
+    async def send():
+        outcome = outcomes[len(calls)]
+        calls.append(outcome)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return httpx.Response(outcome, request=REQUEST)
+
+    return send, calls
+
+
+# --- Circuit breaker ---
+def test_breaker_opens_after_consecutive_failures_and_probes_after_the_timeout(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    cb = resilience.CircuitBreaker("test", failure_threshold=2, reset_timeout=10)
+    cb.record(False)
+    assert cb.state == "closed"
+    cb.record(False)
+    assert cb.state == "open"
+    with pytest.raises(resilience.CircuitOpenError):
+        cb.check()
+
+    now[0] += 10
+    cb.check()  # the single half-open probe
+    assert cb.state == "half_open"
+    with pytest.raises(resilience.CircuitOpenError):
+        cb.check()  # a second call while the probe runs
+    cb.record(True)
+    assert cb.state == "closed" and cb.failures == 0
+
+
+def test_failed_probe_reopens_the_breaker(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    cb = resilience.CircuitBreaker("test", failure_threshold=1, reset_timeout=5)
+    cb.record(False)
+    now[0] += 5
+    cb.check()
+    cb.record(False)
+    assert cb.state == "open" and cb.counters["opened"] == 2
+
+
+def test_cancelled_probe_lets_the_next_call_probe(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    cb = resilience.CircuitBreaker("test", failure_threshold=1, reset_timeout=5)
+    cb.record(False)
+    now[0] += 5
+    with pytest.raises(asyncio.CancelledError):
+        with cb.track():
+            raise asyncio.CancelledError()
+    cb.check()  # not rejected: the abandoned probe freed the slot
+    assert cb.state == "half_open"
+
+
+async def test_open_breaker_fails_fast_without_sending():
+    cb = resilience.breaker("test")
+    for _ in range(cb.failure_threshold):
+        cb.record(False)
+    send, calls = scripted(200)
+    with pytest.raises(resilience.CircuitOpenError):
+        await resilience.call("test", "GET", send, hedge_delay=0)
+    assert calls == []
+
+
+# --- Retries ---
+async def test_idempotent_request_is_retried_on_5xx():
+    send, calls = scripted(502, 500, 200)
+    resp = await resilience.call("test", "GET", send, hedge_delay=0)
+    assert resp.status_code == 200 and len(calls) == 3
+
+
+async def test_last_retryable_response_is_returned():
+    send, calls = scripted(503, 503, 503)
+    resp = await resilience.call("test", "GET", send, hedge_delay=0)
+    assert resp.status_code == 503 and len(calls) == 3
+
+
+async def test_post_is_retried_only_when_refused_or_never_sent():
+    send, calls = scripted(503, httpx.ConnectError("refused"), 200)
+    assert (await resilience.call("test", "POST", send)).status_code == 200
+    assert len(calls) == 3
+
+    send, calls = scripted(500, 200)
+    assert (await resilience.call("test", "POST", send)).status_code == 500
+    assert len(calls) == 1
+
+    send, calls = scripted(httpx.ReadTimeout("slow"), 200)
+    with pytest.raises(httpx.ReadTimeout):
+        await resilience.call("test", "POST", send)
+    assert len(calls) == 1
+
+
+# --- Hedging ---
+async def test_slow_get_is_hedged_and_the_first_good_response_wins():
+    started = []
+
+    async def send():
+        started.append(len(started))
+        if len(started) == 1:
+            await asyncio.sleep(1)
+            return httpx.Response(200, request=REQUEST, text="first")
+        return httpx.Response(200, request=REQUEST, text="hedge")
+
+    resp = await resilience.call("test", "GET", send, hedge_delay=0.01)
+    assert resp.text == "hedge"
+    assert resilience.stats["hedges"] == 1 and resilience.stats["hedge_wins"] == 1
+
+
+async def test_fast_get_is_not_hedged():
+    send, calls = scripted(200)
+    await resilience.call("test", "GET", send, hedge_delay=1)
+    assert len(calls) == 1 and resilience.stats["hedges"] == 0
+
+
+async def test_post_is_never_hedged():
+    async def send():
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, request=REQUEST)
+
+    await resilience.call("test", "POST", send, hedge_delay=0.01)
+    assert resilience.stats["hedges"] == 0
+
+
+# --- Pair isolation ---
+async def test_failed_pair_is_recorded_not_raised():
+    from tutor.store import MemoryStore
+
+    store = MemoryStore()
+    store.update_run("dev", status="in_progress")
+    pair = {"student_id": "s", "topic_id": "t"}
+
+    async def boom():
+        raise RuntimeError("upstream down")
+
+    assert await resilience.isolate_pair(store, "dev", pair, boom()) is False
+    assert store.get("dev")["failed"] == [{"student_id": "s", "topic_id": "t", "error": "RuntimeError: upstream down"}]
@@ -0,0 +1,41 @@
+"""Server wiring that does not need an upstream (tutor/server.py)."""
+import pytest
+from fastapi.testclient import TestClient
+
+from tutor import metrics
+from tutor import server as tutor_server
+from tutor.store import MemoryStore
+
+
+def test_unset_api_key_sends_no_header(monkeypatch):
+    monkeypatch.setattr(tutor_server, "TUTOR_API_KEY", None)
+    assert "X-Api-Key" not in tutor_server.create("phack-fast").headers
+
+    monkeypatch.setattr(tutor_server, "TUTOR_API_KEY", "team-key")
+    assert tutor_server.create("phack-fast").headers["X-Api-Key"] == "team-key"
+
+
+@pytest.mark.parametrize("finished, pages", [(4, [2, 2]), (5, [2, 2, 1]), (0, [0])])
+def test_result_pages_report_has_more_only_when_results_remain(finished, pages):
+    server = tutor_server.create("phack-fast")
+    server._store = MemoryStore()
+    server.store.update_run("dev", status="completed")
+    for i in [*range(finished), 0] if finished else []:  # s0 finishes twice; its first entry is superseded
+        pair = {"student_id": f"s{i}", "topic_id": "t"}
+        server.store.finish_pair("dev", pair, {**pair, "inferred_level": 3})
+
+    client, cursor, seen = TestClient(server.app), 0, []
+    for i, size in enumerate(pages):
+        body = client.get("/simulation_results", params={"set_type": "dev", "cursor": cursor, "limit": 2}).json()
+        assert len(body["data"]) == size and body["has_more"] == (i < len(pages) - 1)
+        cursor = body["next_cursor"]
+        seen += [r["student_id"] for r in body["data"]]
+    assert sorted(seen) == [f"s{i}" for i in range(finished)]
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_server_timing_middleware_only_when_enabled(monkeypatch, enabled):
+    monkeypatch.setattr(metrics, "SERVER_TIMING", enabled)
+    app = tutor_server.create("phack-fast").app
+    assert any(m.kwargs.get("dispatch") is metrics.server_timing for m in app.user_middleware) == enabled
+    assert ("server-timing" in TestClient(app).get("/metrics").headers) == enabled
@@ -0,0 +1,95 @@
+"""Simulation stores: checkpoints, resume and result cursors (tutor/store.py)."""
+import pytest
+
+from tutor.store import JSONLStore, MemoryStore, SQLiteStore, offload, replay
+
+
+@pytest.fixture(params=["memory", "jsonl", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "jsonl":
+        return JSONLStore(str(tmp_path / "simulations.jsonl"))
+    if request.param == "sqlite":
+        return SQLiteStore(str(tmp_path / "simulations.db"))
+    return MemoryStore()
+
+
+def pair(i: int) -> dict:
+    return {"student_id": f"s{i}", "topic_id": "t", "topic_name": "Topic", "conversation_id": f"c{i}", "max_turns": 5}
+
+
+def turn(i: int, level: int = 3, complete: bool = False) -> dict:
+    return {"tutor_message": f"tutor {i}", "student_response": f"student {i}", "is_complete": complete,
+            "analysis": {"understanding_level": level}, "suggestion": {"suggested_response": f"next {i}"}}
+
+
+def test_resume_rebuilds_the_conversation_from_checkpointed_turns(store):
+    store.update_run("dev", status="in_progress")
+    store.save_pair("dev", pair(0))
+    for i in (1, 0):  # out of order on purpose
+        store.save_turn("dev", pair(0), i, turn(i, level=2 + i))
+
+    history, next_msg, final_state, complete = replay(store.load_turns("dev", pair(0)))
+    assert [m["content"] for m in history] == ["tutor 0", "student 0", "tutor 1", "student 1"]
+    assert next_msg == "next 1" and final_state == {"understanding_level": 3} and not complete
+    assert store.known_pairs("dev") == {("s0", "t"): {**pair(0), "done": False}}
+
+
+def test_finished_pairs_are_done_and_failures_are_cleared_by_a_result(store):
+    store.update_run("dev", status="in_progress")
+    for i in range(2):
+        store.save_pair("dev", pair(i))
+    store.fail_pair("dev", pair(0), "RuntimeError: boom")
+    assert store.summary("dev")["failed"] == 1
+    assert not store.known_pairs("dev")[("s0", "t")]["done"]  # a resumed run retries it
+
+    store.finish_pair("dev", pair(0), {"student_id": "s0", "topic_id": "t", "inferred_level": 4})
+    summary = store.summary("dev")
+    assert (summary["completed"], summary["failed"], summary["status"]) == (1, 0, "in_progress")
+    assert store.known_pairs("dev")[("s0", "t")]["done"]
+    assert store.get("dev")["failed"] == []
+
+
+def test_results_page_follows_finish_order_by_cursor(store):
+    store.update_run("dev", status="in_progress")
+    for i in range(5):
+        store.finish_pair("dev", pair(i), {"student_id": f"s{i}", "inferred_level": i})
+
+    page, cursor = store.results_page("dev", 0, 2)
+    assert [r["student_id"] for _, r in page] == ["s0", "s1"]
+    page, cursor = store.results_page("dev", cursor, 2)
+    assert [r["student_id"] for _, r in page] == ["s2", "s3"]
+
+    # A pair finished again moves to the end, and its old entry is not returned twice
+    store.finish_pair("dev", pair(1), {"student_id": "s1", "inferred_level": 9})
+    page, cursor = store.results_page("dev", cursor, 10)
+    assert [(r["student_id"], r["inferred_level"]) for _, r in page] == [("s4", 4), ("s1", 9)]
+    assert store.results_page("dev", cursor, 10) == ([], cursor)
+
+
+def test_reset_forgets_only_its_set(store):
+    for set_type in ("dev", "eval"):
+        store.update_run(set_type, status="completed")
+        store.finish_pair(set_type, pair(0), {"student_id": "s0"})
+    store.reset("dev")
+    assert store.get("dev") is None
+    assert store.summary("eval")["completed"] == 1
+
+
+def test_jsonl_store_sees_another_writer(tmp_path):
+    path = str(tmp_path / "simulations.jsonl")
+    worker, reader = JSONLStore(path), JSONLStore(path)
+    worker.update_run("dev", status="in_progress")
+    worker.save_turn("dev", pair(0), 0, turn(0))
+    worker.finish_pair("dev", pair(0), {"student_id": "s0"})
+    assert reader.summary("dev")["completed"] == 1
+    assert len(reader.load_turns("dev", pair(0))) == 1
+
+
+@pytest.mark.anyio
+async def test_offload_runs_writes_in_order(store):
+    await offload(store.update_run, "dev", status="in_progress")
+    for i in range(3):
+        await offload(store.save_turn, "dev", pair(0), i, turn(i))
+    cursor = await offload(store.finish_pair, "dev", pair(0), {"student_id": "s0"})
+    assert cursor > 0
+    assert len(store.load_turns("dev", pair(0))) == 3
@@ -0,0 +1 @@
+"""Shared building blocks for the AI Tutor backend servers."""
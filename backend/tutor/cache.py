@@ -0,0 +1,195 @@
+"""Content-addressed cache for LLM responses.
+
+Keys are a SHA-256 of the model, messages and request parameters, so replaying
+a conversation or re-running ``/generate_mse`` on the same set reuses earlier
+completions instead of paying for them again. Two tiers:
+
+- an in-memory LRU with a per-entry TTL, and
+- an on-disk tier (one JSON file per key) bounded by total size, oldest
+  entries evicted first.
+
+Only deterministic calls (``temperature`` 0) are cached by default: a sampled
+suggestion or analysis replayed from the cache would freeze one sample for
+every later run and live user. ``LLM_CACHE_SAMPLED_STAGES`` opts stages into
+caching their sampled calls too. Caching can be limited to some stages
+(``LLM_CACHE_STAGES``) and bypassed per request with ``bypass()``: the
+servers do so for ``Cache-Control: no-cache`` on ``/conversations/interact``
+and ``use_cache=false`` on ``/generate_mse``.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") == "1"
+LLM_CACHE_STAGES = set(filter(None, os.getenv("LLM_CACHE_STAGES", "analysis,suggestion,combined,summary").split(",")))
+LLM_CACHE_SAMPLED_STAGES = set(filter(None, os.getenv("LLM_CACHE_SAMPLED_STAGES", "").split(",")))
+LLM_CACHE_MAX_ITEMS = int(os.getenv("LLM_CACHE_MAX_ITEMS", "2048"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", ".llm_cache")
+LLM_CACHE_DISK_MAX_MB = float(os.getenv("LLM_CACHE_DISK_MAX_MB", "256"))
+
+_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+
+def make_key(model: str, messages: list, params: dict) -> str:
+    blob = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def bypass(active: bool = True):
+    """Disables the cache for calls made inside the block (and tasks spawned from it)."""
+    token = _bypass.set(active)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def enabled_for(stage: str, params: Optional[dict] = None) -> bool:
+    """Whether a ``stage`` call with these request ``params`` may be served from and stored in the cache."""
+    if not LLM_CACHE_ENABLED or stage not in LLM_CACHE_STAGES or _bypass.get():
+        return False
+    return (params or {}).get("temperature") == 0 or stage in LLM_CACHE_SAMPLED_STAGES
+
+
+class ResponseCache:
+    def __init__(self, max_items: int = LLM_CACHE_MAX_ITEMS, ttl: float = LLM_CACHE_TTL,
+                 directory: Optional[str] = LLM_CACHE_DIR, disk_max_mb: float = LLM_CACHE_DISK_MAX_MB):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.directory = directory or None
+        self.disk_max_bytes = int(disk_max_mb * 1024 * 1024)
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._disk_bytes: Optional[int] = None
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    # --- Memory tier ---
+    def _memory_get(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.time():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_set(self, key: str, value: str, expires: float):
+        self._memory[key] = (expires, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    # --- Disk tier (blocking; run via asyncio.to_thread) ---
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _disk_files(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    yield os.path.join(root, name)
+
+    def _disk_get(self, key: str) -> Optional[tuple]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry["expires"] < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        os.utime(path)  # refresh recency for size-based eviction
+        return entry["expires"], entry["value"]
+
+    def _disk_set(self, key: str, value: str, expires: float):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps({"expires": expires, "value": value}).encode("utf-8")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(os.path.getsize(p) for p in self._disk_files())
+        else:
+            self._disk_bytes += len(data)
+        if self._disk_bytes > self.disk_max_bytes:
+            self._disk_evict()
+
+    def _disk_evict(self):
+        """Deletes least recently used files until the tier is back under 90% of its budget."""
+        files = []
+        for p in self._disk_files():
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        target = int(self.disk_max_bytes * 0.9)
+        for _, size, p in files:
+            if total <= target:
+                break
+            try:
+                os.remove(p)
+            except OSError:
+                continue
+            total -= size
+            self.counters["evictions"] += 1
+        self._disk_bytes = total
+
+    # --- Public API ---
+    async def get(self, key: str) -> Optional[str]:
+        value = self._memory_get(key)
+        if value is not None:
+            self.counters["memory_hits"] += 1
+            return value
+        if self.directory:
+            entry = await asyncio.to_thread(self._disk_get, key)
+            if entry is not None:
+                self.counters["disk_hits"] += 1
+                self._memory_set(key, entry[1], entry[0])
+                return entry[1]
+        self.counters["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        expires = time.time() + self.ttl
+        self._memory_set(key, value, expires)
+        self.counters["stores"] += 1
+        if self.directory:
+            try:
+                await asyncio.to_thread(self._disk_set, key, value, expires)
+            except OSError:
+                pass  # the disk tier is best-effort
+
+    def stats(self) -> dict:
+        lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+        hits = lookups - self.counters["misses"]
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            "stages": sorted(LLM_CACHE_STAGES),
+            "sampled_stages": sorted(LLM_CACHE_SAMPLED_STAGES),
+            **self.counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "memory_items": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+        }
+
+
+llm_cache = ResponseCache()
@@ -0,0 +1,152 @@
+"""In-process cache of the Knowunity student and topic catalog.
+
+``/students`` and ``/students/{id}/topics`` responses are cached with a TTL.
+Stale entries are served immediately while a background refresh revalidates
+them with ``If-None-Match``, so a 304 from upstream only bumps the timestamp.
+Concurrent misses for the same URL share one upstream request.
+
+``full(set_type)`` assembles every student of a set with their topics for
+the bulk ``/catalog`` endpoint, fetching at most ``CATALOG_CONCURRENCY``
+topic lists at once. ``/generate_mse`` discovery reads ``students()`` and
+``topics()`` per student instead, so pairs start as each student's topics
+arrive; it passes its rate limiter as ``pace`` so upstream fetches count
+against ``DISCOVERY_RATE``.
+``CATALOG_PREFETCH`` lists set types to warm at startup and keep refreshed.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException, Response
+
+from tutor import http
+
+logger = logging.getLogger(__name__)
+
+Pace = Callable[[], Awaitable]
+
+CATALOG_TTL = float(os.getenv("CATALOG_TTL", "300"))
+CATALOG_PREFETCH = [s for s in os.getenv("CATALOG_PREFETCH", "").split(",") if s]
+CATALOG_CONCURRENCY = int(os.getenv("CATALOG_CONCURRENCY", "10"))
+
+
+class _Entry:
+    __slots__ = ("body", "etag", "fetched_at")
+
+    def __init__(self, body: dict, etag: Optional[str]):
+        self.body = body
+        self.etag = etag
+        self.fetched_at = time.monotonic()
+
+
+class Catalog:
+    def __init__(self, api_base: str, headers: dict, ttl: float = CATALOG_TTL, prefetch=CATALOG_PREFETCH,
+                 concurrency: int = CATALOG_CONCURRENCY):
+        self.api_base = api_base
+        self.headers = headers
+        self.ttl = ttl
+        self.concurrency = concurrency
+        self._entries: Dict[str, _Entry] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.counters = {"hits": 0, "stale_hits": 0, "misses": 0, "not_modified": 0, "refresh_errors": 0}
+        if prefetch:
+            http.on_startup(lambda: self._prefetch_loop(prefetch))
+
+    async def _fetch(self, path: str, params: Optional[dict], pace: Optional[Pace] = None) -> dict:
+        key = self._key(path, params)
+        entry = self._entries.get(key)
+        headers = dict(self.headers)
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        resp = await http.get(f"{self.api_base}{path}", params=params, headers=headers, pace=pace)
+        if resp.status_code == 304 and entry is not None:
+            self.counters["not_modified"] += 1
+            entry.fetched_at = time.monotonic()
+            return entry.body
+        if resp.status_code != 200:
+            raise HTTPException(status_code=resp.status_code, detail=resp.text)
+        body = resp.json()
+        self._entries[key] = _Entry(body, resp.headers.get("ETag"))
+        return body
+
+    @staticmethod
+    def _key(path: str, params: Optional[dict]) -> str:
+        return path + ("?" + "&".join(f"{k}={v}" for k, v in sorted(params.items())) if params else "")
+
+    def _refresh(self, path: str, params: Optional[dict], pace: Optional[Pace] = None) -> asyncio.Task:
+        """Single-flight upstream fetch for one URL."""
+        key = self._key(path, params)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(path, params, pace))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_refreshed(key, t))
+        return task
+
+    def _on_refreshed(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            self.counters["refresh_errors"] += 1
+            logger.warning(f"Catalog refresh failed for {key}: {task.exception()}")
+
+    async def _get(self, path: str, params: Optional[dict] = None, pace: Optional[Pace] = None) -> dict:
+        entry = self._entries.get(self._key(path, params))
+        if entry is None:
+            self.counters["misses"] += 1
+            # Shielded: a cancelled caller must not cancel the fetch the other waiters share
+            return await asyncio.shield(self._refresh(path, params, pace))
+        if time.monotonic() - entry.fetched_at > self.ttl:
+            # Serve stale, revalidate in the background
+            self.counters["stale_hits"] += 1
+            self._refresh(path, params, pace)
+        else:
+            self.counters["hits"] += 1
+        return entry.body
+
+    async def students(self, set_type: str, pace: Optional[Pace] = None) -> dict:
+        return await self._get("/students", {"set_type": set_type}, pace)
+
+    async def topics(self, student_id: str, pace: Optional[Pace] = None) -> dict:
+        return await self._get(f"/students/{student_id}/topics", pace=pace)
+
+    async def full(self, set_type: str, pace: Optional[Pace] = None) -> dict:
+        """Every student of ``set_type`` with its ``topics`` list inlined.
+
+        ``pace`` is awaited before each upstream attempt (see ``http.request``).
+        """
+        students = (await self.students(set_type, pace)).get("students", [])
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_topics(student_id: str) -> dict:
+            async with limit:
+                return await self.topics(student_id, pace)
+
+        topics = await asyncio.gather(*[fetch_topics(s["id"]) for s in students])
+        return {
+            "set_type": set_type,
+            "students": [{**s, "topics": t.get("topics", [])} for s, t in zip(students, topics)],
+        }
+
+    async def respond(self, set_type: str, if_none_match: Optional[str] = None) -> Response:
+        """Bulk catalog as a JSON response with an ETag; honours ``If-None-Match``."""
+        body = json.dumps(await self.full(set_type), separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        if if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+    async def _prefetch_loop(self, set_types):
+        while True:
+            for set_type in set_types:
+                try:
+                    await self.full(set_type)
+                except Exception as e:
+                    logger.warning(f"Catalog prefetch failed for {set_type}: {e}")
+            await asyncio.sleep(max(self.ttl / 2, 1))
+
+    def stats(self) -> dict:
+        return {**self.counters, "entries": len(self._entries), "ttl": self.ttl}
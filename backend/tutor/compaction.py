@@ -0,0 +1,91 @@
+"""Bounded analysis transcripts for long conversations.
+
+Without compaction the analysis prompt carries the whole transcript, so its
+tokens and latency grow every turn. ``history_text()`` keeps the most recent
+turns verbatim and folds older ones into a compact block that is cached on the
+conversation (so per ``conversation_id``) and extended incrementally.
+
+``TRANSCRIPT_COMPACTION``:
+
+- ``off`` (default): the full transcript, as before.
+- ``evidence``: each folded turn becomes one line of local evidence (the
+  student's reply, shortened, plus hedge/confusion/reasoning cues); no LLM call.
+- ``summary``: folded turns are merged into a rolling LLM summary (stage
+  ``summary``); a failed summary call falls back to evidence lines.
+
+Turns are folded ``COMPACTION_KEEP_TURNS`` at a time once twice that many are
+unfolded, so the folded block (and the provider's cached prompt prefix) only
+changes every K turns, and at most 2K - 1 turns are ever sent verbatim.
+"""
+import os
+from typing import List, Optional
+
+from tutor import estimator, llm, prompts, schemas
+
+COMPACTION_MODES = ("off", "evidence", "summary")
+TRANSCRIPT_COMPACTION = os.getenv("TRANSCRIPT_COMPACTION", "off")
+COMPACTION_KEEP_TURNS = int(os.getenv("COMPACTION_KEEP_TURNS", "3"))
+COMPACTION_MAX_EVIDENCE = int(os.getenv("COMPACTION_MAX_EVIDENCE", "20"))  # oldest evidence lines are dropped
+COMPACTION_SUMMARY_WORDS = int(os.getenv("COMPACTION_SUMMARY_WORDS", "150"))
+EVIDENCE_REPLY_CHARS = 160
+
+stats = {"folds": 0, "folded_turns": 0, "summary_calls": 0, "summary_errors": 0,
+         "transcript_chars": 0, "compacted_chars": 0}
+
+
+def evidence_line(turn: int, reply: str) -> str:
+    f = estimator.features(reply)
+    cues = [name for name in ("reasoning", "hedge", "confusion") if f[name]]
+    text = reply if len(reply) <= EVIDENCE_REPLY_CHARS else reply[:EVIDENCE_REPLY_CHARS].rstrip() + "…"
+    return f'- Turn {turn + 1}: "{text}"' + (f" [{', '.join(cues)}]" if cues else "")
+
+
+async def _fold(conv, lines: List[str], first_turn: int, mode: str, client, model: Optional[str]):
+    if mode == "summary" and client is not None and model:
+        stats["summary_calls"] += 1
+        try:
+            reply = await llm.chat_json(client, model, prompts.COMPACTION_SUMMARY.render(
+                topic_name=conv.topic_name, max_words=COMPACTION_SUMMARY_WORDS,
+                summary=conv.folded or "(none yet)", turns="\n".join(lines),
+            ), stage="summary", schema=schemas.Summary)
+            conv.folded = reply["summary"].strip()
+            return
+        except Exception:
+            pass
+        stats["summary_errors"] += 1
+    replies = [line[len("Student: "):] for line in lines if line.startswith("Student: ")]
+    evidence = (conv.folded.split("\n") if conv.folded else []) + [
+        evidence_line(first_turn + i, reply) for i, reply in enumerate(replies)
+    ]
+    conv.folded = "\n".join(evidence[-COMPACTION_MAX_EVIDENCE:])
+
+
+async def history_text(conv, client=None, model: Optional[str] = None, mode: Optional[str] = None) -> str:
+    """The transcript to send to the analysis prompt for ``conv``'s latest turn."""
+    mode = mode or TRANSCRIPT_COMPACTION
+    if mode not in COMPACTION_MODES:
+        raise ValueError(f"Unknown TRANSCRIPT_COMPACTION: {mode}")
+    if mode == "off" or COMPACTION_KEEP_TURNS <= 0:
+        return conv.transcript
+
+    keep = COMPACTION_KEEP_TURNS
+    if conv.turns - conv.folded_turns >= 2 * keep:
+        upto = conv.turns - keep
+        await _fold(conv, conv.turn_lines(conv.folded_turns, upto), conv.folded_turns, mode, client, model)
+        stats["folds"] += 1
+        stats["folded_turns"] += upto - conv.folded_turns
+        conv.folded_turns = upto
+    if not conv.folded_turns:
+        return conv.transcript
+
+    text = f"Earlier turns (1-{conv.folded_turns}), condensed:\n{conv.folded}\n\nLatest turns:\n" + "\n".join(
+        conv.turn_lines(conv.folded_turns, conv.turns))
+    stats["transcript_chars"] += conv.chars
+    stats["compacted_chars"] += len(text)
+    return text
+
+
+def snapshot() -> dict:
+    ratio = stats["compacted_chars"] / stats["transcript_chars"] if stats["transcript_chars"] else None
+    return {"mode": TRANSCRIPT_COMPACTION, "keep_turns": COMPACTION_KEEP_TURNS, **stats,
+            "compaction_ratio": round(ratio, 4) if ratio is not None else None}
@@ -0,0 +1,132 @@
+"""Turn-level early stopping once a pair's level estimate has converged.
+
+A simulated pair normally runs until ``max_turns`` or until Knowunity reports
+``is_complete``. ``EARLY_STOP`` ends it sooner, which saves that pair's
+remaining Knowunity and LLM calls:
+
+- ``off`` (default): run every turn.
+- ``stable``: stop once ``EARLY_STOP_STABLE_TURNS`` consecutive analysed turns
+  gave the same level.
+- ``confidence``: stop once an analysed turn is confident. Confidence comes
+  from ensemble agreement, else a numeric ``confidence`` in the reply, else
+  the local estimator agreeing with the LLM level. The threshold is
+  ``EARLY_STOP_CONFIDENCE``.
+- ``any``: whichever of the two fires first.
+
+Only LLM-analysed turns count. Local estimates (``tutor/estimator.py``) and
+fallbacks never stop a pair, and no pair stops before
+``EARLY_STOP_MIN_TURNS``.
+
+A fraction ``EARLY_STOP_AUDIT_RATE`` of the pairs that would stop run to the
+end anyway. This measures what stopping costs: ``stop_mse`` is the squared
+difference between the level at the stop and the final level. With dev labels
+(``tutor/devset.py``), the audited pairs' MSE is reported at the stop and at
+the end. Savings and effect are under ``convergence`` in ``/pipeline_stats``,
+and each pair result records ``turns`` and ``stopped_early``. Shorter
+conversations also change what ``/evaluate/tutoring`` sees.
+"""
+import os
+import random
+from typing import List, Optional
+
+from tutor import devset, estimator
+
+EARLY_STOP_POLICIES = ("off", "stable", "confidence", "any")
+EARLY_STOP = os.getenv("EARLY_STOP", "off")
+EARLY_STOP_STABLE_TURNS = int(os.getenv("EARLY_STOP_STABLE_TURNS", "2"))
+EARLY_STOP_CONFIDENCE = float(os.getenv("EARLY_STOP_CONFIDENCE", "0.8"))
+EARLY_STOP_MIN_TURNS = int(os.getenv("EARLY_STOP_MIN_TURNS", "2"))
+EARLY_STOP_AUDIT_RATE = float(os.getenv("EARLY_STOP_AUDIT_RATE", "0.1"))
+
+stats = {"pairs": 0, "turns": 0, "stopped": 0, "turns_saved": 0, "audited": 0, "compared": 0, "stop_squared_error": 0,
+         "labelled": 0, "label_squared_error_at_stop": 0, "label_squared_error_full": 0}
+
+
+def confidence(analysis: dict, replies: List[str]) -> float:
+    samples = (analysis.get("ensemble") or {}).get("levels")
+    if samples and len(samples) > 1:
+        return samples.count(analysis.get("understanding_level")) / len(samples)
+    if isinstance(analysis.get("confidence"), (int, float)):
+        return float(analysis["confidence"])
+    level, local_confidence = estimator.ESTIMATORS[estimator.ESTIMATOR](replies)
+    return local_confidence if round(level) == analysis.get("understanding_level") else 0.0
+
+
+class Tracker:
+    """Per-pair convergence state; ``update()`` after each turn says whether to stop."""
+
+    def __init__(self, analyses: List[dict] = (), policy: Optional[str] = None):
+        self.policy = policy or EARLY_STOP
+        if self.policy not in EARLY_STOP_POLICIES:
+            raise ValueError(f"Unknown EARLY_STOP: {self.policy}")
+        self.turns, self.streak, self.last_level = 0, 0, None
+        self.stop_level: Optional[int] = None  # set when an audited pair would have stopped
+        self.stopped_at: Optional[int] = None
+        for analysis in analyses:  # turns replayed on resume
+            self._observe(analysis)
+
+    def _observe(self, analysis: dict) -> bool:
+        """Counts the turn; True if it was LLM-analysed."""
+        self.turns += 1
+        if analysis.get("estimated") or analysis.get("fallback"):
+            return False
+        level = analysis.get("understanding_level")
+        self.streak = self.streak + 1 if level == self.last_level else 1
+        self.last_level = level
+        return True
+
+    def converged(self, analysis: dict, replies: List[str]) -> bool:
+        if self.turns < EARLY_STOP_MIN_TURNS:
+            return False
+        stable = self.streak >= EARLY_STOP_STABLE_TURNS
+        if self.policy == "stable":
+            return stable
+        confident = confidence(analysis, replies) >= EARLY_STOP_CONFIDENCE
+        return confident if self.policy == "confidence" else stable or confident
+
+    def update(self, analysis: dict, replies: List[str], max_turns: int) -> bool:
+        """True when the pair should end after this turn."""
+        analysed = self._observe(analysis)
+        stats["turns"] += 1
+        if self.policy == "off" or not analysed or self.stop_level is not None or self.turns >= max_turns:
+            return False
+        if not self.converged(analysis, replies):
+            return False
+        if random.random() < EARLY_STOP_AUDIT_RATE:
+            self.stop_level = analysis.get("understanding_level")
+            stats["audited"] += 1
+            return False
+        self.stopped_at = self.turns
+        stats["stopped"] += 1
+        stats["turns_saved"] += max_turns - self.turns
+        return True
+
+    def finish(self, set_type: str, result: dict):
+        """Scores an audited pair's stop level against where it ended up."""
+        stats["pairs"] += 1
+        final = result.get("inferred_level")
+        if self.stop_level is None or final is None:
+            return
+        stats["compared"] += 1
+        stats["stop_squared_error"] += (self.stop_level - final) ** 2
+        true_level = devset.labels(set_type).get((result["student_id"], result["topic_id"]))
+        if true_level is not None:
+            stats["labelled"] += 1
+            stats["label_squared_error_at_stop"] += (self.stop_level - true_level) ** 2
+            stats["label_squared_error_full"] += (final - true_level) ** 2
+
+
+def snapshot() -> dict:
+    def mean(total, n):
+        return round(total / n, 4) if n else None
+
+    return {
+        "policy": EARLY_STOP, "pairs": stats["pairs"], "turns": stats["turns"], "stopped": stats["stopped"],
+        "turns_saved": stats["turns_saved"],
+        "turns_saved_share": mean(stats["turns_saved"], stats["turns"] + stats["turns_saved"]),
+        "audited": stats["audited"],
+        # Audited pairs only: stop level vs final level, and vs dev labels at the stop and at the end
+        "stop_mse": mean(stats["stop_squared_error"], stats["compared"]),
+        "label_mse_at_stop": mean(stats["label_squared_error_at_stop"], stats["labelled"]),
+        "label_mse_full": mean(stats["label_squared_error_full"], stats["labelled"]),
+    }
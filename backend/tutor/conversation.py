@@ -0,0 +1,122 @@
+"""Server-side conversation state keyed by ``conversation_id``.
+
+Each conversation keeps its transcript as a list of formatted lines, so a turn
+only formats and appends its own two lines; the lines are joined once, when a
+prompt needs the whole transcript. Clients only need to send the new tutor
+message to ``/conversations/interact``.
+
+Live conversations (``conversations``) and simulated pairs (``simulations``)
+live in separate registries, so a large simulation run cannot evict a live
+user's transcript. A simulated pair is dropped once it finishes. Live ones are
+evicted after ``CONVERSATION_TTL`` idle seconds or beyond
+``CONVERSATION_CACHE_SIZE`` entries.
+
+A turn for a conversation the server does not know (evicted, expired or
+started on another worker) that comes without ``history`` gets a 409
+``unknown_conversation`` before anything is sent upstream. The client resends
+it with its full ``history``, which seeds the transcript.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+CONVERSATION_CACHE_SIZE = int(os.getenv("CONVERSATION_CACHE_SIZE", "1000"))
+CONVERSATION_TTL = float(os.getenv("CONVERSATION_TTL", "3600"))
+
+
+def format_message(m: dict) -> str:
+    return f"{'Tutor' if m.get('role') == 'user' else 'Student'}: {m.get('content')}"
+
+
+class Conversation:
+    def __init__(self, conversation_id: str, topic_name: str = "Topic", history: Optional[List[dict]] = None):
+        self.conversation_id = conversation_id
+        self.topic_name = topic_name
+        self.turns = 0
+        self.last_level: Optional[int] = None
+        self.analysis_skips = 0  # consecutive turns whose analysis call was skipped (tutor/estimator.py)
+        self.folded = ""  # compacted form of the first folded_turns turns (tutor/compaction.py)
+        self.folded_turns = 0
+        self.touched = time.monotonic()
+        self._lines: List[str] = []
+        self._joined: Optional[str] = ""
+        self.chars = 0  # length of the joined transcript
+        for m in history or []:
+            self._append(format_message(m))
+        self.turns = len(self._lines) // 2
+
+    def _append(self, line: str):
+        self.chars += len(line) + (1 if self._lines else 0)
+        self._lines.append(line)
+        self._joined = None
+
+    @property
+    def transcript(self) -> str:
+        """The whole transcript, joined on first use after a turn."""
+        if self._joined is None:
+            self._joined = "\n".join(self._lines)
+        return self._joined
+
+    def add_turn(self, tutor_msg: str, student_reply: str):
+        """Appends one tutor/student exchange."""
+        self._append(f"Tutor: {tutor_msg}")
+        self._append(f"Student: {student_reply}")
+        self.turns += 1
+        self.touched = time.monotonic()
+
+    def turn_lines(self, start: int, end: int) -> List[str]:
+        return self._lines[2 * start:2 * end]
+
+    def student_replies(self) -> List[str]:
+        return [line[len("Student: "):] for line in self._lines if line.startswith("Student: ")]
+
+
+class ConversationRegistry:
+    """Bounded LRU of live conversations with idle expiry."""
+
+    def __init__(self, max_size: int = CONVERSATION_CACHE_SIZE, ttl: float = CONVERSATION_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: "OrderedDict[str, Conversation]" = OrderedDict()
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._items:
+            oldest = next(iter(self._items.values()))
+            if len(self._items) <= self.max_size and now - oldest.touched < self.ttl:
+                break
+            self._items.popitem(last=False)
+
+    def get(self, conversation_id: str) -> Optional[Conversation]:
+        conv = self._items.get(conversation_id)
+        if conv is not None:
+            self._items.move_to_end(conversation_id)
+        return conv
+
+    def get_or_create(self, conversation_id: str, topic_name: Optional[str] = None,
+                      history: Optional[List[dict]] = None) -> Conversation:
+        """Returns the live conversation, seeding a new one from ``history`` if it is unknown.
+
+        Once a conversation exists, the server-side transcript is authoritative
+        and any ``history`` sent by the client is ignored.
+        """
+        conv = self.get(conversation_id)
+        if conv is None:
+            conv = Conversation(conversation_id, topic_name or "Topic", history)
+            self._items[conversation_id] = conv
+            self._evict()
+        elif topic_name:
+            conv.topic_name = topic_name
+        conv.touched = time.monotonic()
+        return conv
+
+    def drop(self, conversation_id: str):
+        self._items.pop(conversation_id, None)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+conversations = ConversationRegistry()
+simulations = ConversationRegistry()
@@ -0,0 +1,109 @@
+"""Local MSE against a labelled dev set, and coverage rules for partial submits.
+
+Labels live in one JSON file on disk (``DEV_LABELS_PATH``, default
+``dev_labels.json``), keyed by set type:
+
+    {"mini_dev": [{"student_id": "...", "topic_id": "...", "level": 3}, ...]}
+
+``POST /dev_labels`` merges labels into it. With labels for a set:
+
+- ``/submit_simulation?local=true`` scores predictions on the box, with no
+  call to ``/evaluate/mse``.
+- ``reanalyze.py --evaluate-local`` and ``/reanalyze?evaluate_local=true``
+  score a new prompt or model the same way.
+- ``/simulation_events`` adds a running ``local_mse``.
+
+``score`` only counts labelled pairs and reports how many predictions it
+could not score.
+
+``SUBMIT_MIN_COVERAGE`` is the share of a run's expected pairs that must be
+finished before ``/submit_simulation?partial=true`` will score a snapshot.
+"""
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from tutor.store import PairKey
+
+DEV_LABELS_PATH = os.getenv("DEV_LABELS_PATH", "dev_labels.json")
+SUBMIT_MIN_COVERAGE = float(os.getenv("SUBMIT_MIN_COVERAGE", "0.8"))
+LABEL_FIELDS = ("level", "true_level", "understanding_level")
+
+_lock = threading.Lock()
+_cache: Dict[str, object] = {"mtime": None, "labels": {}}
+
+
+def _level(entry: dict) -> Optional[float]:
+    return next((entry[f] for f in LABEL_FIELDS if entry.get(f) is not None), None)
+
+
+def _read(path: str) -> Dict[str, Dict[PairKey, float]]:
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    return {set_type: {(e["student_id"], e["topic_id"]): _level(e) for e in entries if _level(e) is not None}
+            for set_type, entries in raw.items()}
+
+
+def labels(set_type: str, path: Optional[str] = None) -> Dict[PairKey, float]:
+    """The set's labels, re-read only when the file changes."""
+    path = path or DEV_LABELS_PATH
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return {}
+    with _lock:
+        if _cache["mtime"] != (path, mtime):
+            _cache["labels"], _cache["mtime"] = _read(path), (path, mtime)
+        return _cache["labels"].get(set_type, {})
+
+
+def save(set_type: str, entries: Iterable[dict], path: Optional[str] = None) -> int:
+    """Merges ``entries`` into the set's labels on disk; returns the set's label count."""
+    path = path or DEV_LABELS_PATH
+    with _lock:
+        raw = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                raw = json.load(f)
+        merged = {(e["student_id"], e["topic_id"]): e for e in raw.get(set_type, [])}
+        merged.update({(e["student_id"], e["topic_id"]): {"student_id": e["student_id"], "topic_id": e["topic_id"],
+                                                          "level": _level(e)}
+                       for e in entries if _level(e) is not None})
+        raw[set_type] = list(merged.values())
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(raw, f, indent=1)
+        os.replace(tmp, path)
+        return len(merged)
+
+
+def score(set_type: str, predictions: List[dict]) -> dict:
+    """MSE of ``predictions`` (``/evaluate/mse`` shape) over the labelled pairs."""
+    truth = labels(set_type)
+    errors, by_level = [], {}
+    for p in predictions:
+        true_level = truth.get((p["student_id"], p["topic_id"]))
+        if true_level is None or p.get("predicted_level") is None:
+            continue
+        error = (p["predicted_level"] - true_level) ** 2
+        errors.append(error)
+        bucket = by_level.setdefault(str(true_level), {"n": 0, "squared_error": 0.0, "predicted": 0.0})
+        bucket["n"] += 1
+        bucket["squared_error"] += error
+        bucket["predicted"] += p["predicted_level"]
+    return {
+        "mse": round(sum(errors) / len(errors), 4) if errors else None,
+        "n": len(errors),
+        "unlabelled": len(predictions) - len(errors),
+        "labelled_pairs": len(truth),
+        "by_true_level": {level: {"n": b["n"], "mse": round(b["squared_error"] / b["n"], 4),
+                                  "mean_predicted": round(b["predicted"] / b["n"], 4)}
+                          for level, b in sorted(by_level.items())},
+    }
+
+
+def coverage(summary: dict, known_pairs: int) -> float:
+    """Finished share of the run's pairs (``total_expected`` once discovery has finished)."""
+    total = summary.get("total_expected") or known_pairs
+    return summary.get("completed", 0) / total if total else 0.0
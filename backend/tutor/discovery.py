@@ -0,0 +1,160 @@
+"""Concurrent, rate-limited student/topic pair discovery for ``/generate_mse``.
+
+Students are listed once, then every student's topics and every
+``/interact/start`` call fan out concurrently under a shared token-bucket
+limiter. Each started pair is pushed onto an ``asyncio.Queue`` as soon as it
+exists, so the simulation can begin tutoring while discovery is still running.
+A ``None`` sentinel marks the end of the stream, and a ``DiscoveryError`` in
+its place means discovery failed, so the consumer cannot mistake a partial
+stream for a complete one.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import AsyncIterator, Dict, Iterable, Optional, Union
+
+from tutor import http, metrics
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+DISCOVERY_RATE = float(os.getenv("DISCOVERY_RATE", "10"))  # requests per second
+DISCOVERY_BURST = int(os.getenv("DISCOVERY_BURST", "10"))
+
+# Strong references to fire-and-forget tasks so they are not garbage collected
+_background = set()
+
+
+class DiscoveryError(Exception):
+    """Put on the pair queue, and raised by ``iter_pairs``, when discovery failed midway."""
+
+
+class RateLimiter:
+    """Token bucket: ``rate`` tokens per second, bursting up to ``burst``."""
+
+    def __init__(self, rate: float = DISCOVERY_RATE, burst: int = DISCOVERY_BURST):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+async def fetch_json(method: str, url: str, limiter: RateLimiter, **kwargs) -> dict:
+    """Request whose every attempt, retry or hedge takes a token from ``limiter``.
+
+    Which failures are retried is up to ``tutor/resilience.py``: a POST such
+    as ``/interact/start`` is only resent when it provably never started a
+    conversation, so no duplicates are opened upstream.
+    """
+    resp = await http.request(method, url, pace=limiter.acquire, **kwargs)
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def discover_pairs(api_base: str, headers: dict, set_type: str, queue: asyncio.Queue,
+                         limiter: Optional[RateLimiter] = None, known: Optional[Dict[tuple, dict]] = None,
+                         catalog=None) -> dict:
+    """Starts a conversation for every student/topic pair, streaming pairs into ``queue``.
+
+    With a ``tutor.catalog.Catalog``, students and topics come from its cache,
+    still one student at a time; the upstream fetches of a cache miss take
+    tokens from ``limiter`` too. A student whose topics cannot be listed is
+    logged and counted in ``failed``, like a pair that cannot be started.
+
+    ``known`` maps ``(student_id, topic_id)`` to pairs checkpointed by an earlier
+    run: finished ones are skipped and unfinished ones reuse their conversation.
+    Always terminates the stream: with ``None``, or with a ``DiscoveryError``
+    if discovery fails midway (the error is raised here too).
+    """
+    limiter = limiter or RateLimiter()
+    known = known or {}
+    summary = {"pair_count": 0, "skipped": 0, "failed": 0}
+
+    async def start_pair(student: dict, topic: dict):
+        saved = known.get((student["id"], topic["id"]))
+        if saved is not None:
+            if saved.get("done"):
+                summary["skipped"] += 1
+            else:
+                summary["pair_count"] += 1
+                await queue.put({k: v for k, v in saved.items() if k != "done"})
+            return
+        try:
+            conv_data = await fetch_json(
+                "POST", f"{api_base}/interact/start", limiter,
+                json={"student_id": student["id"], "topic_id": topic["id"]}, headers=headers
+            )
+        except Exception as e:
+            summary["failed"] += 1
+            logger.error(f"Could not start {student['id']}/{topic['id']}: {e}")
+            return
+        summary["pair_count"] += 1
+        await queue.put({
+            "student_id": student["id"], "topic_id": topic["id"], "topic_name": topic["name"],
+            "conversation_id": conv_data.get("conversation_id"), "max_turns": conv_data.get("max_turns")
+        })
+
+    async def discover_student(student: dict):
+        try:
+            if catalog is not None:
+                t_data = await catalog.topics(student["id"], pace=limiter.acquire)
+            else:
+                t_data = await fetch_json("GET", f"{api_base}/students/{student['id']}/topics", limiter, headers=headers)
+        except Exception as e:
+            summary["failed"] += 1
+            logger.error(f"Could not list topics for {student['id']}: {e}")
+            return
+        await asyncio.gather(*[start_pair(student, t) for t in t_data.get("topics", [])])
+
+    try:
+        if catalog is not None:
+            s_data = await catalog.students(set_type, pace=limiter.acquire)
+        else:
+            s_data = await fetch_json("GET", f"{api_base}/students", limiter, params={"set_type": set_type}, headers=headers)
+        await asyncio.gather(*[discover_student(s) for s in s_data.get("students", [])])
+    except BaseException as e:
+        queue.put_nowait(DiscoveryError(f"Discovery for {set_type} failed: {getattr(e, 'detail', None) or repr(e)}"))
+        raise
+    queue.put_nowait(None)
+    return summary
+
+
+async def iter_pairs(pairs: Union[asyncio.Queue, Iterable[dict]]) -> AsyncIterator[dict]:
+    """Yields pairs from a discovery queue (until its sentinel) or from a plain list.
+
+    Raises the ``DiscoveryError`` that ends the stream of a failed discovery.
+    """
+    if isinstance(pairs, asyncio.Queue):
+        while (pair := await pairs.get()) is not None:
+            if isinstance(pair, DiscoveryError):
+                raise pair
+            yield pair
+    else:
+        for pair in pairs:
+            yield pair
+
+
+async def _detached(coro):
+    metrics.detach()  # runs in the task's own context copy
+    return await coro
+
+
+def spawn(coro) -> asyncio.Task:
+    """Schedules ``coro`` on the running loop and keeps it alive until done."""
+    task = asyncio.create_task(_detached(coro))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
@@ -0,0 +1,125 @@
+"""Self-consistency / multi-model ensembles for the analysis stage.
+
+One analysis sample is a noisy level estimate. With an ensemble configured,
+the analysis call of a turn is replaced by several calls in parallel:
+``ENSEMBLE_SAMPLES`` samples from each member in ``ENSEMBLE_MODELS``. Their
+levels are aggregated by ``ENSEMBLE_AGGREGATE`` (``mean``, ``median`` or
+``majority``). After ``ENSEMBLE_DEADLINE`` seconds the samples still running
+are cancelled and the aggregate uses whatever has finished (at least one).
+
+``ENSEMBLE_MODELS`` is a JSON list of members, e.g.
+``[{"model": "gemma3", "base_url": "https://.../v1", "api_key_env": "DWANI_API_KEY"},
+{"model": "gpt-5-nano", "params": {"temperature": 0.7}}]``. A member without
+``base_url`` uses the server's client, and an empty list means the server's
+own model only. Extra samples of one member bypass the response cache so they
+are actually drawn.
+
+The returned analysis carries an ``ensemble`` block (levels, models, spread)
+that is checkpointed with each turn and stored with each pair's result.
+Ensembles apply to the non-streaming analysis call; ``combined`` mode falls
+back to separate calls while an ensemble is on.
+"""
+import asyncio
+import json
+import os
+import statistics
+from collections import Counter
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+from tutor import cache, llm
+
+ENSEMBLE_AGGREGATES = ("mean", "median", "majority")
+ENSEMBLE_SAMPLES = int(os.getenv("ENSEMBLE_SAMPLES", "1"))
+ENSEMBLE_MODELS: List[dict] = json.loads(os.getenv("ENSEMBLE_MODELS", "[]"))
+ENSEMBLE_AGGREGATE = os.getenv("ENSEMBLE_AGGREGATE", "median")
+ENSEMBLE_DEADLINE = float(os.getenv("ENSEMBLE_DEADLINE", "0"))  # seconds; 0 waits for every sample
+
+stats = {"calls": 0, "samples": 0, "finished": 0, "failed": 0, "cancelled": 0, "spread_sum": 0.0}
+_clients: Dict[str, object] = {}
+
+
+def enabled() -> bool:
+    return ENSEMBLE_SAMPLES * max(1, len(ENSEMBLE_MODELS)) > 1
+
+
+def _client(member: dict, default):
+    """Member clients are created on first use and reused."""
+    base_url = member.get("base_url")
+    if not base_url:
+        return default
+    if base_url not in _clients:
+        from openai import AsyncOpenAI
+
+        api_key = os.getenv(member.get("api_key_env", "OPENAI_API_KEY")) or "none"
+        _clients[base_url] = AsyncOpenAI(api_key=api_key, base_url=base_url)
+    return _clients[base_url]
+
+
+def aggregate(levels: List[int], method: str = ENSEMBLE_AGGREGATE) -> int:
+    if method not in ENSEMBLE_AGGREGATES:
+        raise ValueError(f"Unknown ENSEMBLE_AGGREGATE: {method}")
+    if method == "mean":
+        return round(statistics.mean(levels))
+    if method == "median":
+        return round(statistics.median(levels))
+    counts = Counter(levels).most_common()
+    tied = [level for level, n in counts if n == counts[0][1]]
+    median = statistics.median(levels)
+    return min(tied, key=lambda level: (abs(level - median), level))  # ties go to the level nearest the median
+
+
+async def analyze(client, model: str, prompt, schema, params: Optional[dict] = None) -> dict:
+    """Runs the ensemble and returns one analysis whose level is the aggregate."""
+    members = ENSEMBLE_MODELS or [{}]
+    draws = [(m, i) for m in members for i in range(ENSEMBLE_SAMPLES)]
+
+    async def sample(member: dict, index: int):
+        with cache.bypass() if index else nullcontext():
+            return await llm.chat_json(
+                _client(member, client), member.get("model") or model, prompt, stage="analysis", schema=schema,
+                **{**(params or {}), **member.get("params", {})}
+            )
+
+    tasks = [asyncio.create_task(sample(m, i)) for m, i in draws]
+    stats["calls"] += 1
+    stats["samples"] += len(tasks)
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=ENSEMBLE_DEADLINE or None)
+        if not done:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+    stats["cancelled"] += len(pending)
+
+    results, models, error = [], [], None
+    for (member, _), task in zip(draws, tasks):
+        if task in done:
+            if task.exception() is None:
+                results.append(task.result())
+                models.append(member.get("model") or model)
+            else:
+                error = task.exception()
+    stats["finished"] += len(results)
+    stats["failed"] += len(done) - len(results)
+    if not results:
+        raise error or asyncio.TimeoutError("No ensemble sample finished")
+
+    levels = [r["understanding_level"] for r in results]
+    level = aggregate(levels)
+    spread = max(levels) - min(levels)
+    stats["spread_sum"] += spread
+    chosen = next((r for r in results if r["understanding_level"] == level), results[0])
+    return {**chosen, "understanding_level": level, "ensemble": {
+        "aggregate": ENSEMBLE_AGGREGATE, "levels": levels, "models": models,
+        "requested": len(tasks), "finished": len(results), "spread": spread,
+        "stdev": round(statistics.pstdev(levels), 4),
+    }}
+
+
+def snapshot() -> dict:
+    return {"enabled": enabled(), "aggregate": ENSEMBLE_AGGREGATE, "samples_per_member": ENSEMBLE_SAMPLES,
+            "members": [m.get("model") or "default" for m in ENSEMBLE_MODELS] or ["default"], **stats,
+            "mean_spread": round(stats["spread_sum"] / stats["calls"], 4) if stats["calls"] else None}
@@ -0,0 +1,176 @@
+"""Cheap local level estimate that can stand in for the analysis LLM call.
+
+Only the last turn's analysis feeds the MSE prediction; intermediate turns
+need a level just to steer the next tutoring suggestion. Before each analysis
+call, ``decide()`` scores the student's replies with a local estimator
+(answer length, hedge words, confusion and reasoning cues). On an
+intermediate turn it skips the call when the estimate is confident and agrees
+with the last LLM level. The final turn is always analysed.
+
+``ESTIMATOR_MODE``:
+
+- ``off`` (default): every turn is analysed.
+- ``shadow``: every turn is analysed; the estimator only scores itself.
+- ``skip``: confident intermediate turns skip the analysis call. A fraction
+  ``ESTIMATOR_AUDIT_RATE`` of those still runs it, so the error skipping
+  introduces against the always-analyse baseline stays measured.
+
+``snapshot()`` reports skipped calls and that drift (``skip_mse``) under
+``estimator`` in ``/pipeline_stats``. ``ESTIMATOR`` picks a registered
+estimator; ``ESTIMATOR_WEIGHTS`` overrides the heuristic's weights as JSON.
+"""
+import json
+import math
+import os
+import random
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+ESTIMATOR_MODES = ("off", "shadow", "skip")
+ESTIMATOR_MODE = os.getenv("ESTIMATOR_MODE", "off")
+ESTIMATOR = os.getenv("ESTIMATOR", "heuristic")
+ESTIMATOR_SKIP_CONFIDENCE = float(os.getenv("ESTIMATOR_SKIP_CONFIDENCE", "0.7"))
+ESTIMATOR_MAX_CONSECUTIVE_SKIPS = int(os.getenv("ESTIMATOR_MAX_CONSECUTIVE_SKIPS", "2"))
+ESTIMATOR_AUDIT_RATE = float(os.getenv("ESTIMATOR_AUDIT_RATE", "0.1"))
+ESTIMATOR_WEIGHTS: Dict[str, float] = json.loads(os.getenv("ESTIMATOR_WEIGHTS", "{}"))
+
+# (level estimate in 1..5, confidence in 0..1) from the student's replies so far
+Estimator = Callable[[List[str]], Tuple[float, float]]
+
+HEDGES = ("i think", "maybe", "not sure", "i guess", "probably", "kind of", "sort of", "perhaps", "might")
+CONFUSION = ("don't know", "dont know", "don't understand", "dont understand", "confused", "no idea", "lost",
+             "what do you mean")
+REASONING = ("because", "therefore", "which means", "so that", "since", "for example", "in other words", "that's why")
+_WORD = re.compile(r"[\w']+")
+_NUMBER = re.compile(r"\d")
+
+DEFAULT_WEIGHTS = {
+    "bias": 2.3,
+    "length": 0.45,  # per log2(words)
+    "reasoning": 0.5,
+    "hedge": -0.35,
+    "confusion": -0.9,
+    "question": -0.25,
+    "numbers": 0.15,
+    "recency": 0.6,  # weight of each reply relative to the next one
+}
+
+
+def features(reply: str) -> Dict[str, float]:
+    text = reply.lower()
+    words = len(_WORD.findall(text))
+    return {
+        "length": math.log2(1 + words),
+        "reasoning": sum(text.count(c) for c in REASONING),
+        "hedge": sum(text.count(c) for c in HEDGES),
+        "confusion": sum(text.count(c) for c in CONFUSION),
+        "question": text.count("?"),
+        "numbers": min(3, len(_NUMBER.findall(text))),
+    }
+
+
+def heuristic(replies: List[str], weights: Optional[Dict[str, float]] = None) -> Tuple[float, float]:
+    """Linear score over recency-weighted reply features.
+
+    Confidence is high when the score sits near a level rather than between
+    two, and grows with the number of replies and cues it is based on.
+    """
+    w = {**DEFAULT_WEIGHTS, **ESTIMATOR_WEIGHTS, **(weights or {})}
+    if not replies:
+        return 3.0, 0.0
+    scores, total, cues = 0.0, 0.0, 0.0
+    for age, reply in enumerate(reversed(replies)):
+        f = features(reply)
+        weight = w["recency"] ** age
+        scores += weight * (w["bias"] + sum(w[k] * v for k, v in f.items()))
+        total += weight
+        cues += f["reasoning"] + f["hedge"] + f["confusion"]
+    level = min(5.0, max(1.0, scores / total))
+    sharpness = 1 - 2 * abs(level - round(level))
+    support = min(1.0, (len(replies) + cues) / 4)
+    return level, sharpness * support
+
+
+ESTIMATORS: Dict[str, Estimator] = {"heuristic": heuristic}
+
+
+def register(name: str, estimator: Estimator):
+    ESTIMATORS[name] = estimator
+
+
+class Decision:
+    def __init__(self, level: Optional[int] = None, confidence: float = 0.0, skip: bool = False, audit: bool = False):
+        self.level = level
+        self.confidence = confidence
+        self.skip = skip
+        self.audit = audit
+
+    @property
+    def analysis(self) -> Optional[dict]:
+        """Stand-in analysis for a skipped call."""
+        if not self.skip:
+            return None
+        return {"understanding_level": self.level, "justification": "Local estimate; analysis call skipped.",
+                "evidence": [], "estimated": True, "confidence": round(self.confidence, 3)}
+
+
+stats = {"turns": 0, "skipped": 0, "audited": 0, "compared": 0, "squared_error": 0.0,
+         "skip_compared": 0, "skip_squared_error": 0.0}
+
+
+def decide(conv, final: bool, mode: Optional[str] = None) -> Decision:
+    """Whether the analysis call of ``conv``'s latest turn can be skipped."""
+    mode = mode or ESTIMATOR_MODE
+    if mode not in ESTIMATOR_MODES:
+        raise ValueError(f"Unknown ESTIMATOR_MODE: {mode}")
+    if mode == "off":
+        return Decision()
+    stats["turns"] += 1
+    value, confidence = ESTIMATORS[ESTIMATOR](conv.student_replies())
+    decision = Decision(round(value), confidence)
+    confident = (
+        mode == "skip" and not final
+        and conv.last_level is not None and decision.level == conv.last_level
+        and confidence >= ESTIMATOR_SKIP_CONFIDENCE
+        and conv.analysis_skips < ESTIMATOR_MAX_CONSECUTIVE_SKIPS
+    )
+    if confident and random.random() < ESTIMATOR_AUDIT_RATE:
+        decision.audit = True
+        stats["audited"] += 1
+    elif confident:
+        decision.skip = True
+        stats["skipped"] += 1
+    return decision
+
+
+def record(conv, decision: Decision, analysis: dict):
+    """Scores the estimate against the LLM's level when the call did run."""
+    if decision.level is None:
+        return
+    if decision.skip:
+        conv.analysis_skips += 1
+        return
+    conv.analysis_skips = 0
+    try:
+        error = (decision.level - int(analysis.get("understanding_level"))) ** 2
+    except (TypeError, ValueError):
+        return
+    stats["compared"] += 1
+    stats["squared_error"] += error
+    if decision.audit:
+        stats["skip_compared"] += 1
+        stats["skip_squared_error"] += error
+
+
+def snapshot() -> dict:
+    def mean(total, n):
+        return round(total / n, 4) if n else None
+
+    return {
+        "mode": ESTIMATOR_MODE, "estimator": ESTIMATOR,
+        "turns": stats["turns"], "skipped": stats["skipped"], "audited": stats["audited"],
+        "skip_rate": mean(stats["skipped"], stats["turns"]),
+        # Estimate vs LLM level over every analysed turn, and over audited would-skip turns only
+        "estimator_mse": mean(stats["squared_error"], stats["compared"]),
+        "skip_mse": mean(stats["skip_squared_error"], stats["skip_compared"]),
+    }
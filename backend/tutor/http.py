@@ -0,0 +1,129 @@
+"""Shared async HTTP client for upstream (Knowunity) API calls.
+
+One pooled ``httpx.AsyncClient`` is reused by every server so that keep-alive
+connections survive across requests and concurrent tutoring sessions overlap
+their network waits instead of blocking the event loop.
+
+The pool is tuned with ``HTTP_TIMEOUT``, ``HTTP_CONNECT_TIMEOUT``,
+``HTTP_MAX_CONNECTIONS``, ``HTTP_MAX_KEEPALIVE`` and ``HTTP2_ENABLED`` (HTTP/2
+needs ``h2``). ``HTTP_MAX_PER_HOST`` caps the connections to one host; its
+waiters are queued like the adaptive limiters' (``tutor/scheduling.py``), so
+calls without a limiter of their own, such as ``/interact/start``, are
+scheduled too.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager, nullcontext
+from typing import Awaitable, Callable, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from tutor import limits, metrics, resilience
+
+# --- Configuration ---
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "20"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1"
+
+_client: Optional[httpx.AsyncClient] = None
+_startup_hooks: List[Callable[[], Awaitable]] = []
+_startup_tasks: set = set()
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional ``h2`` package (``pip install httpx[http2]``)."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_client() -> httpx.AsyncClient:
+    """Returns the process-wide pooled client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=HTTP2_ENABLED and _http2_available(),
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _client
+
+
+def _host_limiter(url: str) -> limits.PriorityLimiter:
+    """``HTTP_MAX_PER_HOST`` slots per host, queued by priority like the adaptive limiters."""
+    return limits.fixed(f"host:{urlsplit(url).netloc}", HTTP_MAX_PER_HOST)
+
+
+async def _send(method: str, url: str, limit: Optional[str], **kwargs) -> httpx.Response:
+    async with limits.guard(limit) as slot, _host_limiter(url).hold():
+        with metrics.timer(limit) if limit else nullcontext():
+            resp = await get_client().request(method, url, **kwargs)
+        slot.observe(resp.status_code)
+        return resp
+
+
+async def request(method: str, url: str, limit: Optional[str] = None, retries: Optional[int] = None,
+                  hedge_delay: Optional[float] = None, pace: Optional[Callable[[], Awaitable]] = None,
+                  **kwargs) -> httpx.Response:
+    """Sends a request through the shared pool, capped per upstream host.
+
+    ``limit`` names an adaptive limiter (see ``tutor/limits.py``) that paces
+    this call and learns from its latency and status code; the call's latency
+    is also recorded under that name as a ``tutor/metrics.py`` stage.
+
+    Retries, hedging of idempotent requests and the circuit breaker come from
+    ``tutor/resilience.py``, keyed by ``limit`` or else the host. The last
+    response is returned whatever its status, so callers keep their checks.
+    ``pace`` is awaited before every attempt, e.g. a rate limiter's ``acquire``.
+    """
+    upstream = limit or urlsplit(url).netloc
+
+    async def send() -> httpx.Response:
+        if pace is not None:
+            await pace()
+        return await _send(method, url, limit, **kwargs)
+
+    return await resilience.call(upstream, method, send, retries=retries, hedge_delay=hedge_delay)
+
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    return await request("GET", url, **kwargs)
+
+
+async def post(url: str, **kwargs) -> httpx.Response:
+    return await request("POST", url, **kwargs)
+
+
+async def aclose():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def on_startup(hook: Callable[[], Awaitable]):
+    """Registers a coroutine function to run in the background once the app starts."""
+    _startup_hooks.append(hook)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """FastAPI lifespan hook: starts registered background hooks, closes the pool on shutdown."""
+    for hook in _startup_hooks:
+        _startup_tasks.add(asyncio.create_task(hook()))
+    yield
+    for task in _startup_tasks:
+        task.cancel()
+    _startup_tasks.clear()
+    await aclose()
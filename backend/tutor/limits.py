@@ -0,0 +1,242 @@
+"""AIMD adaptive concurrency limits per upstream.
+
+Each upstream (Knowunity ``/interact``, the analysis LLM call, the suggestion
+LLM call) gets its own limiter. The limit grows by one slot per "round" of
+successful calls while latency stays under target, and is multiplied down on
+throttling (429/503), on slow calls, or when the recent error rate is too high.
+``snapshot()`` exposes the current limit, in-flight calls and queue depth.
+Waiters are queued by priority class and tenant (``tutor/scheduling.py``), so
+interactive turns go ahead of simulation and reanalysis traffic. The same
+queue backs the fixed per-host cap of ``tutor/http.py`` (``fixed()``), so a
+live turn is not stuck behind batch calls once it holds its upstream slot.
+
+Defaults can be overridden per limiter with ``ADAPTIVE_LIMITS``, e.g.
+``{"llm_analysis": {"initial": 20, "max": 200, "latency_target": 15}}``.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from tutor import metrics, scheduling
+
+ADAPTIVE_LIMITS_ENABLED = os.getenv("ADAPTIVE_LIMITS_ENABLED", "1") == "1"
+ADAPTIVE_LIMITS: Dict[str, dict] = json.loads(os.getenv("ADAPTIVE_LIMITS", "{}"))
+
+DEFAULTS = {
+    "initial": 10,
+    "min": 1,
+    "max": 100,
+    "latency_target": 20.0,  # seconds
+    "backoff": 0.5,
+    "cooldown": 1.0,  # seconds between two decreases
+    "window": 50,
+    "max_error_rate": 0.2,
+}
+
+THROTTLE_STATUS = {429, 503}
+
+# Which limiter guards each LLM stage
+STAGE_LIMITERS = {"analysis": "llm_analysis", "combined": "llm_analysis", "batch_analysis": "llm_analysis",
+                  "summary": "llm_analysis", "suggestion": "llm_suggestion"}
+
+
+class _Slot:
+    __slots__ = ("status",)
+
+    def __init__(self):
+        self.status: Optional[int] = None
+
+    def observe(self, status: int):
+        self.status = status
+
+
+def _status_of(e: BaseException) -> Optional[int]:
+    status = getattr(e, "status_code", None)
+    if status is None and getattr(e, "response", None) is not None:
+        status = getattr(e.response, "status_code", None)
+    return status
+
+
+class PriorityLimiter:
+    """A fixed number of slots; waiters are queued by priority class and tenant (``tutor/scheduling.py``)."""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = float(limit)
+        self.in_flight = 0
+        self._waiters = scheduling.FairQueue()
+        self.waits = {p: {"granted": 0, "queued": 0, "wait_seconds": 0.0, "max_wait": 0.0} for p in scheduling.PRIORITIES}
+
+    # --- Slot accounting ---
+    def _capacity(self, priority: str) -> int:
+        limit = int(self.limit)
+        return limit if priority == scheduling.INTERACTIVE else limit - scheduling.reserve(limit)
+
+    async def acquire(self):
+        traffic = scheduling.current()
+        priority = traffic[0]
+        ahead = len(self._waiters) if priority == scheduling.BATCH else self._waiters.waiting(priority)
+        if not ahead and self.in_flight < self._capacity(priority):
+            self.in_flight += 1
+            self.waits[priority]["granted"] += 1
+            return
+        start = time.monotonic()
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.push(traffic, fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # the slot was handed over just before cancellation
+            else:
+                self._waiters.remove(traffic, fut)
+            raise
+        waited = time.monotonic() - start
+        waits = self.waits[priority]
+        waits["granted"] += 1
+        waits["queued"] += 1
+        waits["wait_seconds"] += waited
+        waits["max_wait"] = max(waits["max_wait"], waited)
+        metrics.observe(f"{self.name}_queue_wait", waited)
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while True:
+            allowed = [p for p in scheduling.PRIORITIES if self.in_flight < self._capacity(p)]
+            entry = self._waiters.pop(allowed) if allowed else None
+            if entry is None:
+                return
+            fut = entry[1]
+            if not fut.done():
+                self.in_flight += 1
+                fut.set_result(None)
+
+    @asynccontextmanager
+    async def hold(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "queues": self._waiters.depths(),
+            "waits": {p: {"granted": w["granted"], "queued": w["queued"], "max_wait": round(w["max_wait"], 4),
+                          "mean_wait": round(w["wait_seconds"] / w["queued"], 4) if w["queued"] else None}
+                      for p, w in self.waits.items()},
+        }
+
+
+class AdaptiveLimiter(PriorityLimiter):
+    def __init__(self, name: str, **config):
+        cfg = {**DEFAULTS, **config}
+        self.min_limit = cfg["min"]
+        self.max_limit = cfg["max"]
+        super().__init__(name, min(max(cfg["initial"], self.min_limit), self.max_limit))
+        self.latency_target = cfg["latency_target"]
+        self.backoff = cfg["backoff"]
+        self.cooldown = cfg["cooldown"]
+        self.max_error_rate = cfg["max_error_rate"]
+        self._outcomes: deque = deque(maxlen=cfg["window"])
+        self._last_decrease = 0.0
+        self.counters = {"successes": 0, "throttled": 0, "errors": 0, "slow": 0, "increases": 0, "decreases": 0}
+
+    # --- AIMD ---
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        self.counters["decreases"] += 1
+
+    def _update(self, status: Optional[int], failed: bool, latency: float):
+        self._outcomes.append(not failed)
+        if status in THROTTLE_STATUS:
+            self.counters["throttled"] += 1
+            self._decrease()
+            return
+        if failed:
+            self.counters["errors"] += 1
+            error_rate = self._outcomes.count(False) / len(self._outcomes)
+            if error_rate > self.max_error_rate:
+                self._decrease()
+            return
+        if latency > self.latency_target:
+            self.counters["slow"] += 1
+            self._decrease()
+            return
+        self.counters["successes"] += 1
+        if self.limit < self.max_limit:
+            # +1 slot per `limit` successes, i.e. roughly one per round trip of the window
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.counters["increases"] += 1
+            self._wake()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Holds one concurrency slot; call ``observe(status)`` on the yielded slot for HTTP responses."""
+        await self.acquire()
+        start = time.monotonic()
+        slot = _Slot()
+        failed = cancelled = False
+        try:
+            yield slot
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except Exception as e:
+            failed = True
+            slot.status = slot.status or _status_of(e)
+            raise
+        finally:
+            if not cancelled:
+                failed = failed or (slot.status is not None and slot.status >= 500)
+                self._update(slot.status, failed, time.monotonic() - start)
+            self.release()
+
+    def stats(self) -> dict:
+        return {**super().stats(), **self.counters}
+
+
+_limiters: Dict[str, PriorityLimiter] = {}
+
+
+def get(name: str) -> AdaptiveLimiter:
+    limiter = _limiters.get(name)
+    if limiter is None:
+        limiter = _limiters[name] = AdaptiveLimiter(name, **ADAPTIVE_LIMITS.get(name, {}))
+    return limiter
+
+
+def fixed(name: str, limit: int) -> PriorityLimiter:
+    """A non-adaptive limiter, e.g. the per-host connection cap in ``tutor/http.py``."""
+    limiter = _limiters.get(name)
+    if limiter is None:
+        limiter = _limiters[name] = PriorityLimiter(name, limit)
+    return limiter
+
+
+@asynccontextmanager
+async def guard(name: Optional[str]):
+    """``slot()`` of the named limiter, or a no-op when limits are disabled or ``name`` is None."""
+    if not name or not ADAPTIVE_LIMITS_ENABLED:
+        yield _Slot()
+        return
+    async with get(name).slot() as slot:
+        yield slot
+
+
+def snapshot() -> dict:
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
@@ -0,0 +1,271 @@
+"""Analysis + suggestion LLM stage shared by the backend servers.
+
+``LLM_PIPELINE_MODE`` picks how the two calls of a turn are scheduled:
+
+- ``sequential``: analysis first, then the suggestion for the inferred level.
+- ``speculative``: the suggestion for the previous turn's level runs
+  concurrently with the analysis and is only regenerated when the analysis
+  moves the level.
+- ``combined``: one structured call returns both objects.
+
+With an ``on_delta`` callback the calls stream their tokens, and the new text
+of the ``justification`` and ``suggested_response`` fields is passed on as it
+arrives (``/conversations/interact/stream``). The schedule is the same.
+Calls whose reply may be discarded, such as a speculative suggestion or an
+ensemble's samples, send no deltas.
+"""
+import asyncio
+import json
+import os
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel
+
+from tutor import (cache, compaction, convergence, ensemble, estimator, limits,
+                   metrics, parsing, resilience, schemas, usage)
+
+PIPELINE_MODES = ("sequential", "speculative", "combined")
+PIPELINE_MODE = os.getenv("LLM_PIPELINE_MODE", "sequential")
+DEFAULT_LEVEL = 3
+
+COMBINED_PROMPT_SUFFIX = """
+
+Then, as an expert K12 pedagogical advisor, suggest the next tutoring step for the level you inferred, \
+replying to the student's last message.
+
+Return ONLY JSON with both objects:
+{
+  "analysis": {"understanding_level": int, "justification": "str", "evidence": []},
+  "suggestion": {"suggested_response": "str", "strategy_note": "str"}
+}
+"""
+
+stats = {"speculative_hits": 0, "speculative_misses": 0, "combined_calls": 0, "combined_errors": 0,
+         "analysis_fallbacks": 0, "suggestion_fallbacks": 0}
+
+
+def default_analysis_fallback(e: Exception) -> dict:
+    return {"understanding_level": DEFAULT_LEVEL, "justification": f"Analysis error: {str(e)}"}
+
+
+DEFAULT_SUGGESTION_FALLBACK = {"suggested_response": "What are your thoughts on this?"}
+
+
+Prompt = Union[str, List[dict]]
+
+
+def _messages(prompt: Prompt) -> List[dict]:
+    return [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt
+
+
+def _with_suffix(prompt: Prompt, suffix: str) -> Prompt:
+    """Appends to the static (first) message so the cached prefix stays stable."""
+    if isinstance(prompt, str):
+        return prompt + suffix
+    first, *rest = prompt
+    return [{**first, "content": first["content"] + suffix}, *rest]
+
+
+async def chat_json(client, model: str, prompt: Prompt, stage: str = "llm",
+                    schema: Optional[Type[BaseModel]] = None, on_delta: Optional[Callable[[str], None]] = None,
+                    **params) -> dict:
+    """Chat completion parsed as a JSON object; token usage is recorded per stage.
+
+    The reply is repaired and validated against ``schema`` by ``tutor/parsing.py``.
+    Identical deterministic requests are served from the response cache (see
+    ``cache.enabled_for``); only the validated object of a reply that parsed is cached.
+    With ``on_delta`` the completion is streamed and each chunk of raw text is
+    passed to it; a cache hit is passed on as one chunk.
+    """
+    messages = _messages(prompt)
+    response_format = {"type": "json_object"}
+    key = None
+    if cache.enabled_for(stage, params):
+        key = cache.make_key(model, messages, {"response_format": response_format, **params})
+    if key:
+        cached = await cache.llm_cache.get(key)
+        if cached is not None:
+            if on_delta is not None:
+                on_delta(cached)
+            return json.loads(cached)
+
+    upstream = limits.STAGE_LIMITERS.get(stage)
+    with resilience.breaker(upstream).track() if upstream else nullcontext():
+        async with limits.guard(upstream):
+            with metrics.timer(stage, model):
+                if on_delta is None:
+                    res = await client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        response_format=response_format,
+                        **params
+                    )
+                    if getattr(res, "usage", None) is not None:
+                        usage.record(stage, model, res.usage)
+                    content = res.choices[0].message.content
+                else:
+                    content = await _stream_content(client, model, messages, response_format, stage, on_delta, params)
+    with metrics.timer("json_parse", model):
+        parsed = parsing.parse(content, schema, model)
+    if key:
+        await cache.llm_cache.set(key, json.dumps(parsed))
+    return parsed
+
+
+async def _stream_content(client, model: str, messages: List[dict], response_format: dict, stage: str,
+                          on_delta: Callable[[str], None], params: dict) -> str:
+    parts = []
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=messages,
+        response_format=response_format,
+        stream=True,
+        stream_options={"include_usage": True},
+        **params
+    )
+    async for chunk in stream:
+        if getattr(chunk, "usage", None) is not None:
+            usage.record(stage, model, chunk.usage)
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            on_delta(parts[-1])
+    return "".join(parts)
+
+
+def _field_deltas(emit: Optional[Callable[[str, str], None]], fields: Dict[str, str]) -> Optional[Callable[[str], None]]:
+    """A ``chat_json`` ``on_delta`` that calls ``emit(event, text)`` with the new text of ``fields`` (field -> event)."""
+    if emit is None:
+        return None
+    stream = parsing.FieldStream(*fields)
+
+    def on_delta(chunk: str):
+        for field, text in stream.feed(chunk):
+            emit(fields[field], text)
+
+    return on_delta
+
+
+def _as_level(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_LEVEL
+
+
+async def analyze(
+    client,
+    model: str,
+    analysis_prompt: Prompt,
+    analysis_params: Optional[dict] = None,
+    analysis_fallback: Callable[[Exception], dict] = default_analysis_fallback,
+    analysis_schema: Type[schemas.Analysis] = schemas.Analysis,
+    on_delta: Optional[Callable[[str, str], None]] = None,
+) -> dict:
+    """The analysis call alone (or its ensemble); an error degrades to the fallback, marked ``fallback``.
+
+    ``on_delta`` gets ``("analysis_delta", text)`` as the justification streams in; an ensemble does not stream.
+    """
+    try:
+        if ensemble.enabled():
+            return await ensemble.analyze(client, model, analysis_prompt, analysis_schema, analysis_params or {})
+        return await chat_json(client, model, analysis_prompt, stage="analysis", schema=analysis_schema,
+                               on_delta=_field_deltas(on_delta, {"justification": "analysis_delta"}),
+                               **(analysis_params or {}))
+    except Exception as e:
+        stats["analysis_fallbacks"] += 1
+        return {**analysis_fallback(e), "fallback": True}
+
+
+async def analyze_and_suggest(
+    client,
+    model: str,
+    analysis_prompt: Prompt,
+    tutoring_prompt: Callable[[int], Prompt],
+    prev_level: Optional[int] = None,
+    mode: Optional[str] = None,
+    analysis_params: Optional[dict] = None,
+    suggestion_params: Optional[dict] = None,
+    analysis_fallback: Callable[[Exception], dict] = default_analysis_fallback,
+    suggestion_fallback: dict = DEFAULT_SUGGESTION_FALLBACK,
+    analysis: Optional[dict] = None,
+    analysis_schema: Type[schemas.Analysis] = schemas.Analysis,
+    on_delta: Optional[Callable[[str, str], None]] = None,
+) -> Tuple[dict, dict]:
+    """Runs the analysis and suggestion calls for one turn.
+
+    ``tutoring_prompt`` builds the suggestion prompt for a given level. A
+    precomputed ``analysis`` (see ``tutor/estimator.py``) skips the analysis call.
+    Replies are validated against ``analysis_schema`` and ``schemas.Suggestion``.
+    With an ensemble configured (``tutor/ensemble.py``) the analysis is the
+    aggregate of several samples and ``combined`` mode makes separate calls.
+    Errors never propagate: each stage degrades to its fallback instead.
+    ``on_delta(event, text)`` receives ``analysis_delta``/``suggestion_delta``
+    text as it streams; only calls whose reply is kept are streamed.
+    """
+    mode = mode or PIPELINE_MODE
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown LLM_PIPELINE_MODE: {mode}")
+    analysis_params = analysis_params or {}
+    suggestion_params = suggestion_params or {}
+
+    async def analyze_turn() -> dict:
+        return await analyze(client, model, analysis_prompt, analysis_params, analysis_fallback, analysis_schema,
+                             on_delta)
+
+    async def suggest(level, stream: bool = True) -> dict:
+        try:
+            return await chat_json(client, model, tutoring_prompt(level), stage="suggestion", schema=schemas.Suggestion,
+                                   on_delta=_field_deltas(on_delta if stream else None,
+                                                          {"suggested_response": "suggestion_delta"}),
+                                   **suggestion_params)
+        except Exception:
+            stats["suggestion_fallbacks"] += 1
+            return dict(suggestion_fallback)
+
+    if analysis is not None:
+        return analysis, await suggest(analysis.get("understanding_level", DEFAULT_LEVEL))
+
+    if mode == "combined" and ensemble.enabled():
+        mode = "sequential"
+    if mode == "combined":
+        stats["combined_calls"] += 1
+        try:
+            combined = await chat_json(
+                client, model, _with_suffix(analysis_prompt, COMBINED_PROMPT_SUFFIX), stage="combined",
+                schema=schemas.Combined,
+                on_delta=_field_deltas(on_delta, {"justification": "analysis_delta",
+                                                  "suggested_response": "suggestion_delta"}),
+                **analysis_params
+            )
+            return analysis_schema.model_validate(combined["analysis"]).model_dump(), combined["suggestion"]
+        except Exception:
+            # Fall back to the two-call path rather than defaulting the level
+            stats["combined_errors"] += 1
+            mode = "sequential"
+            on_delta = None  # text already streamed would be repeated; the final objects replace it
+
+    if mode == "speculative":
+        guess = _as_level(prev_level)
+        # The guess may be thrown away, so only a regenerated suggestion streams
+        analysis, suggestion = await asyncio.gather(analyze_turn(), suggest(guess, stream=False))
+        level = _as_level(analysis.get("understanding_level", DEFAULT_LEVEL))
+        if level == guess:
+            stats["speculative_hits"] += 1
+        else:
+            stats["speculative_misses"] += 1
+            suggestion = await suggest(level)
+        return analysis, suggestion
+
+    analysis = await analyze_turn()
+    return analysis, await suggest(analysis.get("understanding_level", DEFAULT_LEVEL))
+
+
+def get_stats() -> dict:
+    speculated = stats["speculative_hits"] + stats["speculative_misses"]
+    hit_rate = round(stats["speculative_hits"] / speculated, 4) if speculated else None
+    return {"mode": PIPELINE_MODE, **stats, "speculative_hit_rate": hit_rate,
+            "usage": usage.snapshot(), "cache": cache.llm_cache.stats(), "limits": limits.snapshot(),
+            "resilience": resilience.snapshot(), "estimator": estimator.snapshot(), "compaction": compaction.snapshot(),
+            "parsing": parsing.snapshot(), "ensemble": ensemble.snapshot(),
+            "convergence": convergence.snapshot()}
@@ -0,0 +1,133 @@
+"""Per-stage latency histograms in Prometheus text format.
+
+Hot paths wrap their stages in ``timer(stage, model=...)``: the Knowunity
+``/interact`` call, each LLM call, JSON parsing, whole turns, whole pairs and
+pair discovery. Observations are labelled with ``stage``, ``model`` and
+``set_type``; ``labels(set_type=...)`` sets the latter for everything run
+inside it (including tasks spawned from it), and requests outside a simulation
+are labelled ``interactive``. ``METRICS_BUCKETS`` overrides the bucket
+bounds (seconds).
+
+``render()`` backs the ``/metrics`` endpoint. With ``SERVER_TIMING=1`` the
+``server_timing`` middleware also reports the stages of each request in a
+``Server-Timing`` response header.
+"""
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request, Response
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+BUCKETS = tuple(float(b) for b in os.getenv(
+    "METRICS_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,20,30,60,120"
+).split(","))
+
+MAX_SERVER_TIMINGS = 32
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_set_type: ContextVar[str] = ContextVar("metrics_set_type", default="interactive")
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("metrics_request_timings", default=None)
+
+LabelKey = Tuple[str, str, str]  # (stage, model, set_type)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, key: LabelKey, value: float):
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+        i = bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for (stage, model, set_type), series in sorted(self._series.items()):
+            labels = f'stage="{_escape(stage)}",model="{_escape(model)}",set_type="{_escape(set_type)}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {series[-1]}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+stage_latency = Histogram("tutor_stage_latency_seconds", "Latency of one pipeline stage in seconds.")
+
+
+def observe(stage: str, seconds: float, model: Optional[str] = None):
+    stage_latency.observe((stage, model or "", _set_type.get()), seconds)
+    timings = _request_timings.get()
+    if timings is not None and len(timings) < MAX_SERVER_TIMINGS:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timer(stage: str, model: Optional[str] = None):
+    """Records the wall time of the enclosed block, including when it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start, model)
+
+
+@contextmanager
+def labels(set_type: str):
+    """Labels stages run inside the block, and tasks spawned from it, with ``set_type``."""
+    token = _set_type.set(set_type)
+    try:
+        yield
+    finally:
+        _set_type.reset(token)
+
+
+def detach():
+    """Stops the current task's stages from being reported in the request's Server-Timing."""
+    _request_timings.set(None)
+
+
+def render() -> str:
+    return "\n".join(stage_latency.render()) + "\n"
+
+
+def response() -> Response:
+    return Response(content=render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+async def server_timing(request: Request, call_next):
+    """HTTP middleware adding ``Server-Timing`` for the stages timed while handling a request.
+
+    Only stages finished before the response starts are included (for
+    streaming responses that is the part before the first byte). Registered
+    only with ``SERVER_TIMING=1``, so requests pay nothing for it otherwise.
+    """
+    timings: List[Tuple[str, float]] = []
+    token = _request_timings.set(timings)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _request_timings.reset(token)
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings]
+    entries.append(f"total;dur={(time.perf_counter() - start) * 1000:.1f}")
+    response.headers["Server-Timing"] = ", ".join(entries)
+    return response
@@ -0,0 +1,147 @@
+"""Parsing of JSON-mode LLM replies, with local repair and schema validation.
+
+``parse(content, schema, model)`` tries the schema's compiled validator on
+the raw text first (one pass, no intermediate ``json.loads``). If that fails,
+it repairs common defects locally instead of paying for another LLM round
+trip:
+
+- Markdown code fences around the JSON.
+- Prose before or after the object. The first balanced ``{...}`` is kept.
+- Trailing commas before ``}`` or ``]``.
+
+It then validates again. Outcomes are counted per model (``ok``,
+``repaired``, ``invalid`` for JSON that fails the schema, ``unparseable``)
+and reported under ``parsing`` in ``/pipeline_stats``.
+
+``FieldStream`` pulls the text of string fields out of a reply while it is
+still streaming, so clients can show the ``justification`` as it is written
+instead of raw JSON.
+"""
+import json
+import re
+from typing import Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+# An escape cut off by the end of a chunk, or a high surrogate still waiting for its pair
+_PARTIAL_ESCAPE = re.compile(r"\\u(?:[dD][89abAB][0-9a-fA-F]{2}(?:\\u?[0-9a-fA-F]{0,3})?|[0-9a-fA-F]{0,3})$")
+
+OUTCOMES = ("ok", "repaired", "invalid", "unparseable")
+stats: Dict[str, Dict[str, int]] = {}
+
+
+class ParseError(ValueError):
+    pass
+
+
+def _count(model: Optional[str], outcome: str):
+    counts = stats.setdefault(model or "", dict.fromkeys(OUTCOMES, 0))
+    counts[outcome] += 1
+
+
+def _first_object(text: str) -> Optional[str]:
+    """The first balanced ``{...}`` in ``text``, ignoring braces inside strings."""
+    start = text.find("{")
+    if start < 0:
+        return None
+    depth, in_string, escaped = 0, False, False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+
+def repair(content: str) -> Optional[str]:
+    """Best-effort JSON object text from a reply with fences, prose or trailing commas."""
+    fenced = _FENCE.search(content)
+    text = fenced.group(1) if fenced else content
+    candidate = _first_object(text)
+    if candidate is None:
+        return None
+    return _TRAILING_COMMA.sub(r"\1", candidate)
+
+
+def _validate(data, schema: Optional[Type[BaseModel]]) -> dict:
+    if schema is not None:
+        return schema.model_validate(data).model_dump()
+    if not isinstance(data, dict):
+        raise ParseError("Expected a JSON object")
+    return data
+
+
+def _malformed(e: Exception) -> bool:
+    """True when the text was not JSON at all (as opposed to JSON failing the schema)."""
+    if isinstance(e, ValidationError):
+        return any(err["type"] == "json_invalid" for err in e.errors())
+    return isinstance(e, json.JSONDecodeError)
+
+
+def parse(content: Optional[str], schema: Optional[Type[BaseModel]] = None, model: Optional[str] = None) -> dict:
+    """The reply as a dict validated against ``schema`` (any JSON object if None); raises ``ParseError``."""
+    content = content or ""
+    try:
+        if schema is not None:
+            result = schema.model_validate_json(content).model_dump()
+        else:
+            result = _validate(json.loads(content), None)
+        _count(model, "ok")
+        return result
+    except ValueError as e:  # includes pydantic's ValidationError
+        error = e
+
+    repaired = repair(content)
+    if repaired is not None and repaired != content:
+        try:
+            result = _validate(json.loads(repaired), schema)
+            _count(model, "repaired")
+            return result
+        except ValueError as e:
+            error = e
+    _count(model, "unparseable" if _malformed(error) else "invalid")
+    raise ParseError(f"LLM reply does not parse as {getattr(schema, '__name__', 'a JSON object')}: {error}") from error
+
+
+class FieldStream:
+    """Incremental text of some string fields of a JSON object that arrives in chunks."""
+
+    def __init__(self, *fields: str):
+        self._text = ""
+        self._sent = dict.fromkeys(fields, 0)
+        self._patterns = {f: re.compile(r'"%s"\s*:\s*"((?:[^"\\]|\\.)*)' % re.escape(f)) for f in fields}
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """``(field, new_text)`` for each field that grew with ``chunk``, unescaped."""
+        self._text += chunk
+        grown = []
+        for field, pattern in self._patterns.items():
+            match = pattern.search(self._text)
+            if match is None:
+                continue
+            try:
+                value = json.loads(f'"{_PARTIAL_ESCAPE.sub("", match.group(1))}"')
+            except ValueError:
+                continue
+            if len(value) > self._sent[field]:
+                grown.append((field, value[self._sent[field]:]))
+                self._sent[field] = len(value)
+        return grown
+
+
+def snapshot() -> dict:
+    return {model or "unknown": dict(counts) for model, counts in stats.items()}
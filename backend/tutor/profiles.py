@@ -0,0 +1,107 @@
+"""Server profiles: which model, provider, prompt set and simulation strategy a server runs.
+
+The backend entry points (``main.py``, ``phack*.py``) are one server
+(``tutor/server.py``) started with different profiles. A profile can be
+adjusted without editing code:
+
+- ``LLM_MODEL`` replaces the model.
+- ``LLM_PROVIDER`` (``openai`` | ``dwani``) replaces the provider.
+- ``SIMULATION_STRATEGY`` (``sequential`` | ``gather``) replaces how
+  ``/generate_mse`` runs pairs. ``sequential`` runs one pair at a time.
+  ``gather`` runs every pair concurrently, up to ``MAX_CONCURRENT_SESSIONS``.
+- ``PROMPT_SET`` replaces the prompt set (see ``tutor/prompts.py``).
+
+LLM clients are created on first use, not at import, so a missing key only
+fails the first LLM call and importing a server stays cheap.
+"""
+import os
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, Optional, Type
+
+from tutor import schemas
+
+SIMULATION_STRATEGIES = ("sequential", "gather")
+
+
+def _openai_client():
+    from openai import AsyncOpenAI
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY environment variable is required.")
+    return AsyncOpenAI(api_key=api_key)
+
+
+def _dwani_client():
+    from openai import AsyncOpenAI
+
+    base_url = os.getenv("DWANI_API_BASE_URL")
+    if not base_url:
+        raise RuntimeError("DWANI_API_BASE_URL environment variable is required.")
+    return AsyncOpenAI(api_key="http", base_url=base_url)
+
+
+PROVIDERS: Dict[str, Callable] = {"openai": _openai_client, "dwani": _dwani_client}
+
+
+class HighAccuracyAnalysis(schemas.Analysis):
+    """Reply shape of the high_accuracy analysis prompt."""
+    thinking_process: str = ""
+
+
+@dataclass
+class Profile:
+    name: str
+    title: str
+    provider: str
+    model: str
+    prompt_set: str = "default"
+    strategy: str = "gather"
+    port: int = 8000
+    opening: str = "Hi! Let's explore {topic_name}. What do you know about it?"
+    analysis_params: dict = field(default_factory=dict)
+    suggestion_params: dict = field(default_factory=dict)
+    analysis_schema: Type[schemas.Analysis] = schemas.Analysis
+    analysis_fallback: Optional[dict] = None  # replaces llm.default_analysis_fallback
+    suggestion_fallback: Optional[dict] = None
+
+    def create_client(self):
+        if self.provider not in PROVIDERS:
+            raise ValueError(f"Unknown LLM_PROVIDER: {self.provider}")
+        return PROVIDERS[self.provider]()
+
+
+PROFILES: Dict[str, Profile] = {p.name: p for p in (
+    Profile("main", "AI Tutor Challenge", "dwani", "gemma3", strategy="sequential",
+            opening="Hello! Today we are going to learn about {topic_name}. What do you already know about it?"),
+    Profile("phack", "AI Tutor Challenge - MSE Simulator", "dwani", "gemma3", strategy="sequential",
+            opening="Hello! Today we are going to learn about {topic_name}. What do you already know about it?"),
+    Profile("phack-gpt", "AI Tutor Challenge - GPT-5 Nano MSE Simulator", "openai", "gpt-4.1-nano-2025-04-14",
+            strategy="sequential",
+            opening="Hello! Today we are going to learn about {topic_name}. What do you already know about it?"),
+    Profile("phack-fast", "AI Tutor Challenge - GPT-5 Nano Async Simulator", "openai", "gpt-5.2-2025-12-11",
+            port=9000),
+    Profile("phack-fast-2", "AI Tutor Challenge - High Accuracy GPT-5 Nano", "openai", "gpt-5-nano",
+            prompt_set="high_accuracy",
+            opening="Hi! Let's talk about {topic_name}. What do you know about it?",
+            # Deterministic analysis, varied tutoring
+            analysis_params={"temperature": 0}, suggestion_params={"temperature": 0.7},
+            analysis_schema=HighAccuracyAnalysis,
+            analysis_fallback={"understanding_level": 3, "justification": "Defaulting due to LLM error"},
+            suggestion_fallback={"suggested_response": "Can you explain your thinking further?"}),
+)}
+
+
+def get(name: str) -> Profile:
+    """The named profile with the ``LLM_MODEL``/``LLM_PROVIDER``/``SIMULATION_STRATEGY`` overrides applied."""
+    if name not in PROFILES:
+        raise ValueError(f"Unknown server profile: {name}")
+    profile = replace(
+        PROFILES[name],
+        model=os.getenv("LLM_MODEL") or PROFILES[name].model,
+        provider=os.getenv("LLM_PROVIDER") or PROFILES[name].provider,
+        strategy=os.getenv("SIMULATION_STRATEGY") or PROFILES[name].strategy,
+    )
+    if profile.strategy not in SIMULATION_STRATEGIES:
+        raise ValueError(f"Unknown SIMULATION_STRATEGY: {profile.strategy}")
+    return profile
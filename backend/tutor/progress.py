@@ -0,0 +1,169 @@
+"""Push channel for running simulations.
+
+``GET /simulation_events`` streams a run as SSE (``Accept: text/event-stream``)
+or NDJSON (see ``tutor/streaming.py``) instead of re-polling the growing
+``/simulation_results``:
+
+- ``snapshot``: the current aggregates, sent on connect.
+- ``pair``: results that finished after the client's ``cursor``, then each
+  new one as it finishes, with its ``cursor`` and the updated aggregates.
+- ``turn``: one per simulated turn, with the turn's level.
+- ``failed``: a pair that gave up.
+- ``status``: the run completed or failed. The stream ends after it.
+- ``ping``: sent every ``PROGRESS_KEEPALIVE`` seconds while idle.
+
+Aggregates cover the finished pairs: count, failures, progress against
+``total_expected``, mean level, level variance (the MSE of predicting the mean
+for every pair), level counts and, with dev labels (``tutor/devset.py``),
+the running ``local_mse`` over the labelled pairs. ``cursor`` is the value from ``pair`` events
+or ``/simulation_results?cursor=``, so a client that reconnects only catches
+up on what it missed. Events are published in-process. Sharded workers
+(``shard_runner.py``) only reach clients through the store, via the catch-up.
+A subscriber that falls ``PROGRESS_QUEUE_SIZE`` events behind loses the oldest
+ones and should resume from its last cursor.
+"""
+import asyncio
+import os
+from collections import Counter
+from typing import AsyncIterator, Dict, List, Optional
+
+from tutor import devset
+from tutor.store import offload
+
+PROGRESS_QUEUE_SIZE = int(os.getenv("PROGRESS_QUEUE_SIZE", "1000"))
+PROGRESS_KEEPALIVE = float(os.getenv("PROGRESS_KEEPALIVE", "15"))  # seconds
+CATCH_UP_PAGE = 500
+
+stats = {"subscribers": 0, "published": 0, "dropped": 0}
+
+
+class Aggregate:
+    """Running level statistics over finished pairs (Welford's algorithm)."""
+
+    def __init__(self, results: List[dict] = (), labels: Optional[dict] = None):
+        self.count, self.mean, self._m2 = 0, 0.0, 0.0
+        self.levels: Counter = Counter()
+        self.labels = labels or {}
+        self.labelled, self._squared_error = 0, 0.0
+        for result in results:
+            self.add(result)
+
+    def add(self, result: dict):
+        level = result.get("inferred_level")
+        if level is None:
+            return
+        self.count += 1
+        delta = level - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (level - self.mean)
+        self.levels[level] += 1
+        true_level = self.labels.get((result["student_id"], result["topic_id"]))
+        if true_level is not None:
+            self.labelled += 1
+            self._squared_error += (level - true_level) ** 2
+
+    def snapshot(self) -> dict:
+        local = {"local_mse": round(self._squared_error / self.labelled, 4) if self.labelled else None,
+                 "labelled": self.labelled} if self.labels else {}
+        return {"mean_level": round(self.mean, 4) if self.count else None,
+                "level_variance": round(self._m2 / self.count, 4) if self.count else None,
+                "level_counts": {str(k): v for k, v in sorted(self.levels.items())}, **local}
+
+
+class Progress:
+    """Per-server hub: the simulation loop publishes, ``events()`` subscribers consume."""
+
+    def __init__(self, store):
+        self.store = store
+        self._aggregates: Dict[str, Aggregate] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+    def _load(self, set_type: str) -> Aggregate:
+        simulation = self.store.get(set_type) or {}
+        return Aggregate(simulation.get("data", []), devset.labels(set_type))
+
+    async def _aggregate(self, set_type: str) -> Aggregate:
+        if set_type not in self._aggregates:
+            # Store calls run in order on one thread, so no result finishes between this read and the setdefault
+            self._aggregates.setdefault(set_type, await offload(self._load, set_type))
+        return self._aggregates[set_type]
+
+    async def aggregates(self, set_type: str) -> dict:
+        summary = await offload(self.store.summary, set_type) or {}
+        total = summary.get("total_expected")
+        completed = summary.get("completed", 0)
+        return {"status": summary.get("status", "not_started"), "completed": completed,
+                "failed": summary.get("failed", 0), "total_expected": total,
+                "progress_pct": round(completed / total * 100, 2) if total else None,
+                **(await self._aggregate(set_type)).snapshot()}
+
+    def _publish(self, set_type: str, event: str, data):
+        for queue in self._subscribers.get(set_type, []):
+            if queue.full():
+                queue.get_nowait()  # the oldest event goes; the client resumes from its cursor
+                stats["dropped"] += 1
+            queue.put_nowait({"event": event, "data": data})
+        stats["published"] += 1
+
+    # --- Publishing (called by the simulation loop) ---
+    def reset(self, set_type: str):
+        self._aggregates.pop(set_type, None)
+
+    def turn(self, set_type: str, pair: dict, turn: int, result: dict):
+        if self._subscribers.get(set_type):
+            self._publish(set_type, "turn", {
+                "student_id": pair["student_id"], "topic_id": pair["topic_id"], "turn": turn,
+                "level": result["analysis"].get("understanding_level"), "is_complete": result.get("is_complete"),
+            })
+
+    async def pair_finished(self, set_type: str, result: dict, cursor: int):
+        """Called after the store has the result, so a first ``_aggregate`` read already counts it."""
+        if set_type in self._aggregates:
+            self._aggregates[set_type].add(result)
+        if self._subscribers.get(set_type):
+            aggregates = await self.aggregates(set_type)
+            self._publish(set_type, "pair", {"cursor": cursor, "result": result, "aggregates": aggregates})
+
+    def pair_failed(self, set_type: str, pair: dict):
+        self._publish(set_type, "failed", {"student_id": pair["student_id"], "topic_id": pair["topic_id"]})
+
+    async def status(self, set_type: str, status: str):
+        self._publish(set_type, "status", {"status": status, "aggregates": await self.aggregates(set_type)})
+
+    # --- Subscribing ---
+    async def events(self, set_type: str, cursor: Optional[int] = None) -> AsyncIterator[dict]:
+        queue = asyncio.Queue(maxsize=PROGRESS_QUEUE_SIZE)
+        self._subscribers.setdefault(set_type, []).append(queue)  # before the catch-up, so nothing is missed
+        stats["subscribers"] += 1
+        try:
+            yield {"event": "snapshot", "data": await self.aggregates(set_type)}
+            seen = cursor
+            if cursor is not None:
+                while True:
+                    page, next_cursor = await offload(self.store.results_page, set_type, seen, CATCH_UP_PAGE)
+                    if next_cursor == seen:
+                        break
+                    for result_cursor, result in page:
+                        yield {"event": "pair", "data": {"cursor": result_cursor, "result": result}}
+                    seen = next_cursor
+            if (await offload(self.store.summary, set_type) or {}).get("status") in ("completed", "failed"):
+                return
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), PROGRESS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield {"event": "ping", "data": None}
+                    continue
+                if event["event"] == "pair" and seen is not None and event["data"]["cursor"] <= seen:
+                    continue  # already sent by the catch-up
+                yield event
+                if event["event"] == "status":
+                    return
+        finally:
+            self._subscribers[set_type].remove(queue)
+            stats["subscribers"] -= 1
+
+
+def snapshot() -> dict:
+    return dict(stats)
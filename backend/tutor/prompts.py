@@ -0,0 +1,133 @@
+"""Prompt registry shared by every backend server.
+
+Each prompt is split into a static system message (persona, rubric, output
+format) and a short user message holding the per-call variables. The system
+text never changes between turns, and the growing transcript is the last thing
+in the user message, so each turn's prompt is a byte-identical extension of the
+previous one. That keeps provider-side prefix caching effective.
+
+``PROMPT_SET`` selects the set; servers pass their historical default.
+"""
+import os
+from typing import Dict, List
+
+PROMPT_SET = os.getenv("PROMPT_SET")
+
+
+class PromptTemplate:
+    def __init__(self, name: str, system: str, user: str):
+        self.name = name
+        self.system = system
+        self.user = user
+
+    def render(self, **fields) -> List[dict]:
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.user.format(**fields)},
+        ]
+
+
+_ANALYSIS_JSON = """Return ONLY JSON:
+{
+  "understanding_level": int,
+  "justification": "str",
+  "evidence": []
+}"""
+
+_TUTORING_JSON = """Return ONLY JSON:
+{
+  "suggested_response": "str",
+  "strategy_note": "str"
+}"""
+
+DEFAULT = {
+    "analysis": PromptTemplate(
+        "default.analysis",
+        system="""You are an expert K12 tutor coach. \
+Your task is to analyze a full tutoring conversation and infer the student's understanding level (1-5).
+1 - Struggling: needs fundamentals; major misconceptions.
+2 - Below grade: frequent mistakes; partial understanding.
+3 - At grade: core concepts mostly correct.
+4 - Above grade: generally solid; occasional mistakes.
+5 - Advanced: deep, robust understanding; explains reasoning clearly.
+
+""" + _ANALYSIS_JSON,
+        user="Topic: {topic_name}\n\nHistory:\n{history_text}",
+    ),
+    "tutoring": PromptTemplate(
+        "default.tutoring",
+        system="You are an expert K12 pedagogical advisor. Suggest the next tutoring step.\n\n" + _TUTORING_JSON,
+        user='Topic: {topic_name}\nLevel: {level}\nLast Student Response: "{last_response}"',
+    ),
+}
+
+HIGH_ACCURACY = {
+    "analysis": PromptTemplate(
+        "high_accuracy.analysis",
+        system="""You are a Master Pedagogical Evaluator. Analyze the transcript to determine the student's mastery level.
+
+RUBRIC:
+1 - Struggling: Major misconceptions; cannot perform basic steps.
+2 - Below Grade: Some conceptual knowledge but frequent execution errors.
+3 - At Grade: Understands core concepts; consistent performance on standard tasks.
+4 - Above Grade: Solid grasp; identifies edge cases; minimal guidance needed.
+5 - Advanced: Deep conceptual mastery; can teach/explain the 'why' behind the logic.
+
+TASK:
+1. Analyze student errors, vocabulary, and speed of grasp.
+2. Select the level (1-5) based on the RUBRIC.
+
+Return ONLY JSON:
+{
+  "thinking_process": "detailed analysis",
+  "understanding_level": int,
+  "justification": "short summary",
+  "evidence": ["quote 1", "quote 2"]
+}""",
+        user="Topic: {topic_name}\n\nHistory:\n{history_text}",
+    ),
+    "tutoring": PromptTemplate(
+        "high_accuracy.tutoring",
+        system="""You are an expert K12 pedagogical advisor.
+
+STRATEGY:
+- If level < 3: Scaffolding, simpler examples, check fundamentals.
+- If level >= 3: Socratic questioning, challenge assumptions.
+
+Return ONLY JSON:
+{
+  "suggested_response": "natural tutor message",
+  "strategy_note": "pedagogical reasoning"
+}""",
+        user='Topic: {topic_name}\nStudent Level: {level}/5\nLast Response: "{last_response}"',
+    ),
+}
+
+# Rolling summary of the turns folded out of the analysis transcript (tutor/compaction.py)
+COMPACTION_SUMMARY = PromptTemplate(
+    "compaction.summary",
+    system="""You keep a running summary of a K12 tutoring conversation \
+for someone who will later assess the student's understanding level (1-5).
+Merge the new turns into the current summary. \
+Keep concrete evidence: answers the student got right or wrong, misconceptions, hedging or confusion, \
+and how well they explain their reasoning. Quote short phrases where useful. Drop small talk.
+
+Return ONLY JSON:
+{
+  "summary": "str"
+}""",
+    user="Topic: {topic_name}\nMaximum length: {max_words} words\n\nCurrent summary:\n{summary}\n\nNew turns:\n{turns}",
+)
+
+PROMPT_SETS: Dict[str, Dict[str, PromptTemplate]] = {
+    "default": DEFAULT,
+    "high_accuracy": HIGH_ACCURACY,
+}
+
+
+def get_prompt_set(default: str = "default") -> Dict[str, PromptTemplate]:
+    """Returns the prompt set named by ``PROMPT_SET``, else the server's ``default``."""
+    name = PROMPT_SET or default
+    if name not in PROMPT_SETS:
+        raise ValueError(f"Unknown PROMPT_SET: {name}")
+    return PROMPT_SETS[name]
@@ -0,0 +1,207 @@
+"""Offline re-analysis of finished simulations.
+
+Re-runs only the analysis stage over the transcripts checkpointed in the
+simulation store, so a new prompt set or model can be compared on the same
+conversations without replaying any Knowunity turns. Conversations are packed
+``batch_size`` to an LLM request and at most ``concurrency`` requests run at
+once. A conversation missing from a batch reply is re-analysed on its own.
+
+``batch_requests()`` writes the same batches in the provider's Batch API
+format (one ``/v1/chat/completions`` request per JSONL line) for off-line
+submission, and ``parse_batch_output()`` reads its output file back.
+"""
+import asyncio
+import json
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+
+from tutor import devset, http, llm, prompts, schemas
+from tutor.conversation import format_message
+from tutor.prompts import PromptTemplate
+from tutor.store import offload, pair_key, replay
+
+BATCH_SIZE = 8
+CONCURRENCY = 4
+
+BATCH_PROMPT_SUFFIX = """
+
+You may be given several conversations, each under a "### Conversation <id>" heading. Analyze each one independently.
+In that case return ONLY JSON with one entry per conversation, using the ids as given:
+{
+  "results": [{"id": "str", "understanding_level": int, "justification": "str", "evidence": []}]
+}"""
+
+
+def transcript_id(pair: dict) -> str:
+    return "/".join(pair_key(pair))
+
+
+def load_transcripts(store, set_type: str) -> List[dict]:
+    """Finished pairs with their rebuilt transcript and the level stored for them; run it through ``offload``."""
+    simulation = store.get(set_type) or {}
+    stored = {(e["student_id"], e["topic_id"]): e.get("inferred_level") for e in simulation.get("data", [])}
+    transcripts = []
+    for key, pair in store.known_pairs(set_type).items():
+        if not pair["done"]:
+            continue
+        history, _, _, _ = replay(store.load_turns(set_type, pair))
+        if not history:
+            continue
+        transcripts.append({
+            "id": transcript_id(pair), "student_id": key[0], "topic_id": key[1],
+            "topic_name": pair.get("topic_name", "Topic"),
+            "history_text": "\n".join(format_message(m) for m in history),
+            "stored_level": stored.get(key),
+        })
+    return transcripts
+
+
+def _batches(transcripts: List[dict], batch_size: int) -> List[List[dict]]:
+    return [transcripts[i:i + batch_size] for i in range(0, len(transcripts), max(1, batch_size))]
+
+
+def batch_prompt(prompt: PromptTemplate, batch: List[dict]) -> List[dict]:
+    if len(batch) == 1:
+        return prompt.render(topic_name=batch[0]["topic_name"], history_text=batch[0]["history_text"])
+    user = "\n\n".join(
+        f"### Conversation {t['id']}\n" + prompt.user.format(topic_name=t["topic_name"], history_text=t["history_text"])
+        for t in batch
+    )
+    return [{"role": "system", "content": prompt.system + BATCH_PROMPT_SUFFIX}, {"role": "user", "content": user}]
+
+
+def _by_id(reply: dict, batch: List[dict]) -> Dict[str, dict]:
+    if len(batch) == 1 and "understanding_level" in reply:
+        return {batch[0]["id"]: reply}
+    ids = {t["id"] for t in batch}
+    return {str(r.get("id")): r for r in reply.get("results", []) if isinstance(r, dict) and str(r.get("id")) in ids}
+
+
+def _level(value) -> Optional[int]:
+    try:
+        return min(5, max(1, int(value)))
+    except (TypeError, ValueError):
+        return None
+
+
+def _result(transcript: dict, reply: Optional[dict]) -> dict:
+    reply = reply or {"error": "no result"}
+    return {
+        "id": transcript["id"], "student_id": transcript["student_id"], "topic_id": transcript["topic_id"],
+        "stored_level": transcript["stored_level"], "level": _level(reply.get("understanding_level")),
+        "justification": reply.get("justification"), "error": reply.get("error"),
+    }
+
+
+async def reanalyze(client, model: str, transcripts: List[dict], prompt: PromptTemplate,
+                    batch_size: int = BATCH_SIZE, concurrency: int = CONCURRENCY, **params) -> List[dict]:
+    """One ``{"id", "student_id", "topic_id", "stored_level", "level", ...}`` per transcript, in order."""
+    semaphore = asyncio.Semaphore(concurrency)
+    results: Dict[str, dict] = {}
+
+    async def analyze(batch: List[dict]):
+        async with semaphore:
+            try:
+                reply = await llm.chat_json(client, model, batch_prompt(prompt, batch), stage="batch_analysis",
+                                            schema=schemas.Analysis if len(batch) == 1 else None, **params)
+                answered = _by_id(reply, batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    results[batch[0]["id"]] = {"understanding_level": None, "error": str(e)}
+                    return
+                answered = {}
+        results.update(answered)
+        missing = [t for t in batch if t["id"] not in answered]
+        if missing and len(batch) > 1:
+            await asyncio.gather(*[analyze([t]) for t in missing])
+
+    await asyncio.gather(*[analyze(b) for b in _batches(transcripts, batch_size)])
+    return [_result(t, results.get(t["id"])) for t in transcripts]
+
+
+def summarize(results: List[dict]) -> dict:
+    """How far the new levels moved from the stored ones."""
+    scored = [r for r in results if r["level"] is not None and r["stored_level"] is not None]
+    diffs = [r["level"] - r["stored_level"] for r in scored]
+    return {
+        "transcripts": len(results),
+        "failed": sum(1 for r in results if r["level"] is None),
+        "changed": sum(1 for d in diffs if d),
+        "mean_abs_diff": round(sum(abs(d) for d in diffs) / len(diffs), 4) if diffs else None,
+        "mean_squared_diff": round(sum(d * d for d in diffs) / len(diffs), 4) if diffs else None,
+    }
+
+
+def predictions(results: List[dict]) -> List[dict]:
+    return [{"student_id": r["student_id"], "topic_id": r["topic_id"], "predicted_level": r["level"]}
+            for r in results if r["level"] is not None]
+
+
+async def evaluate(api_base: str, headers: dict, set_type: str, results: List[dict]) -> dict:
+    """Scores the new levels with Knowunity's ``/evaluate/mse``."""
+    resp = await http.post(f"{api_base}/evaluate/mse", json={"predictions": predictions(results), "set_type": set_type},
+                           headers=headers)
+    if resp.status_code != 200:
+        return {"error": "Knowunity evaluation failed", "details": resp.text, "status_code": resp.status_code}
+    return resp.json()
+
+
+def analysis_prompt(prompt_set: Optional[str], default: Dict[str, PromptTemplate]) -> PromptTemplate:
+    if prompt_set is None:
+        return default["analysis"]
+    if prompt_set not in prompts.PROMPT_SETS:
+        raise HTTPException(status_code=400, detail=f"Unknown prompt set: {prompt_set}")
+    return prompts.PROMPT_SETS[prompt_set]["analysis"]
+
+
+async def run(store, set_type: str, client, model: str, prompt: PromptTemplate, batch_size: int = BATCH_SIZE,
+              concurrency: int = CONCURRENCY, evaluate_with: Optional[tuple] = None, evaluate_local: bool = False,
+              **params) -> dict:
+    """Backs the servers' ``/reanalyze``; ``evaluate_with=(api_base, headers)`` also scores the result.
+
+    ``evaluate_local`` scores it against the dev labels in ``tutor/devset.py`` instead of remotely.
+    """
+    transcripts = await offload(load_transcripts, store, set_type)
+    if not transcripts:
+        raise HTTPException(status_code=404, detail=f"No finished transcripts for set: {set_type}")
+    results = await reanalyze(client, model, transcripts, prompt, batch_size, concurrency, **params)
+    report = {"set_type": set_type, "model": model, "prompt": prompt.name, "summary": summarize(results), "results": results}
+    if evaluate_with:
+        report["evaluation"] = await evaluate(*evaluate_with, set_type, results)
+    if evaluate_local:
+        report["local_evaluation"] = devset.score(set_type, predictions(results))
+    return report
+
+
+# --- Provider Batch API files ---
+def batch_requests(model: str, transcripts: List[dict], prompt: PromptTemplate,
+                   batch_size: int = BATCH_SIZE, **params) -> List[dict]:
+    """Batch API input lines; ``custom_id`` lists the transcript ids of each request."""
+    return [
+        {
+            "custom_id": ",".join(t["id"] for t in batch),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {"model": model, "messages": batch_prompt(prompt, batch),
+                     "response_format": {"type": "json_object"}, **params},
+        }
+        for batch in _batches(transcripts, batch_size)
+    ]
+
+
+def parse_batch_output(lines: Iterable[str], transcripts: List[dict]) -> List[dict]:
+    """Turns a Batch API output file back into ``reanalyze()``-shaped results."""
+    answered: Dict[str, dict] = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        rec = json.loads(line)
+        ids = rec["custom_id"].split(",")
+        try:
+            content = rec["response"]["body"]["choices"][0]["message"]["content"]
+            answered.update(_by_id(json.loads(content), [{"id": i} for i in ids]))
+        except (KeyError, IndexError, TypeError, ValueError):
+            error = (rec.get("error") or {}).get("message") or "unparseable batch response"
+            answered.update({i: {"error": error} for i in ids if i not in answered})
+    return [_result(t, answered.get(t["id"])) for t in transcripts]
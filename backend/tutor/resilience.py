@@ -0,0 +1,222 @@
+"""Retries, hedged requests and circuit breakers for upstream calls.
+
+``call()`` wraps one logical request to a named upstream:
+
+- transient failures (429/5xx, transport errors) are retried with jittered
+  exponential backoff, honouring ``Retry-After``; non-idempotent requests are
+  only retried when they provably did not reach the upstream (connect errors)
+  or the upstream refused them (429/503),
+- idempotent requests are hedged: if the first attempt has not answered after
+  ``HEDGE_DELAY`` seconds a duplicate is sent and the first response wins,
+- a per-upstream circuit breaker opens after ``BREAKER_FAILURE_THRESHOLD``
+  consecutive failures and fails fast with a 503 until ``BREAKER_RESET_TIMEOUT``
+  has passed, then lets a single probe through.
+
+``isolate_pair()`` runs one simulated pair with a deadline
+(``SIMULATION_PAIR_TIMEOUT``) and records it as failed in the store instead of
+letting the error abort the whole batch. The run still completes, with
+``failed_pairs``, and resuming it retries those pairs. A pair whose final
+analysis fell back to the default level is analysed once more from its
+transcript and otherwise counted as failed, so a fallback level is never
+stored as its result.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+from fastapi import HTTPException
+
+from tutor.store import offload
+
+logger = logging.getLogger(__name__)
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", "0.25"))
+RETRY_BACKOFF_MAX = float(os.getenv("RETRY_BACKOFF_MAX", "8"))
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "1.0"))  # seconds; 0 disables hedging
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+SIMULATION_PAIR_TIMEOUT = float(os.getenv("SIMULATION_PAIR_TIMEOUT", "900"))  # seconds; 0 disables
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+REFUSED_STATUS = {429, 503}  # not processed, so safe to retry even for non-idempotent requests
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class CircuitOpenError(HTTPException):
+    def __init__(self, upstream: str):
+        super().__init__(status_code=503, detail=f"Circuit open for upstream {upstream}")
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.counters = {"opened": 0, "rejected": 0}
+
+    def check(self):
+        """Raises ``CircuitOpenError`` unless a call may go through now."""
+        if self.state == "closed":
+            return
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return
+        self.counters["rejected"] += 1
+        raise CircuitOpenError(self.name)
+
+    def abandon(self):
+        """A probe was cancelled before it could tell anything; let the next call probe instead."""
+        self._probing = False
+
+    def record(self, ok: bool):
+        self._probing = False
+        if ok:
+            self.state, self.failures = "closed", 0
+            return
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.counters["opened"] += 1
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} failures")
+            self.state, self._opened_at = "open", time.monotonic()
+
+    @contextmanager
+    def track(self):
+        """Checks the breaker, then counts an exception in the block as a failure."""
+        self.check()
+        try:
+            yield
+        except CircuitOpenError:
+            self.abandon()  # another upstream's breaker; says nothing about this one
+            raise
+        except Exception:
+            self.record(False)
+            raise
+        except BaseException:
+            self.abandon()  # cancelled or closed early
+            raise
+        self.record(True)
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, **self.counters}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+stats = {"retries": 0, "hedges": 0, "hedge_wins": 0}
+
+
+def breaker(name: str) -> CircuitBreaker:
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(name)
+    return _breakers[name]
+
+
+def backoff(attempt: int, retry_after: Optional[float] = None) -> float:
+    if retry_after is not None:
+        return min(retry_after, RETRY_BACKOFF_MAX)
+    return min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * (2 ** attempt)) * (0.5 + random.random())
+
+
+def _retry_after(resp: httpx.Response) -> Optional[float]:
+    try:
+        return float(resp.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+async def _hedged(send: Callable[[], Awaitable[httpx.Response]], delay: float) -> httpx.Response:
+    """Sends a duplicate if the first attempt is slower than ``delay``; the first good response wins."""
+    tasks = {asyncio.create_task(send())}
+    hedge = None
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            stats["hedges"] += 1
+            hedge = asyncio.create_task(send())
+            tasks.add(hedge)
+        while True:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                tasks.discard(task)
+                if task.exception() is None and task.result().status_code not in RETRYABLE_STATUS:
+                    if task is hedge:
+                        stats["hedge_wins"] += 1
+                    return task.result()
+                if not tasks:
+                    return task.result()  # re-raises, or returns the retryable response
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def call(upstream: str, method: str, send: Callable[[], Awaitable[httpx.Response]],
+               retries: Optional[int] = None, hedge_delay: Optional[float] = None) -> httpx.Response:
+    """One logical request with retries, hedging and the upstream's circuit breaker.
+
+    Returns the last response even if its status is retryable, so callers keep
+    their own status handling; raises the last transport error otherwise.
+    """
+    cb = breaker(upstream)
+    attempts = 1 + (RETRY_MAX_ATTEMPTS - 1 if retries is None else retries)
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    retryable = RETRYABLE_STATUS if idempotent else REFUSED_STATUS
+    hedge_delay = HEDGE_DELAY if hedge_delay is None else hedge_delay
+    for attempt in range(attempts):
+        cb.check()
+        try:
+            if idempotent and hedge_delay > 0:
+                resp = await _hedged(send, hedge_delay)
+            else:
+                resp = await send()
+        except asyncio.CancelledError:
+            cb.abandon()
+            raise
+        except httpx.TransportError as e:
+            cb.record(False)
+            # A non-idempotent request may have been processed unless it never connected
+            if attempt == attempts - 1 or not (idempotent or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))):
+                raise
+            delay = backoff(attempt)
+            logger.warning(f"{method} {upstream} failed ({e!r}); retry {attempt + 1} in {delay:.2f}s")
+        except Exception:
+            cb.record(False)
+            raise
+        else:
+            cb.record(resp.status_code < 500)
+            if resp.status_code not in retryable or attempt == attempts - 1:
+                return resp
+            delay = backoff(attempt, _retry_after(resp))
+            logger.warning(f"{method} {upstream} returned {resp.status_code}; retry {attempt + 1} in {delay:.2f}s")
+        stats["retries"] += 1
+        await asyncio.sleep(delay)
+
+
+async def isolate_pair(store, set_type: str, pair: dict, simulation: Awaitable) -> bool:
+    """Awaits one pair's simulation under ``SIMULATION_PAIR_TIMEOUT``; on error records it as failed."""
+    try:
+        await asyncio.wait_for(simulation, SIMULATION_PAIR_TIMEOUT or None)
+        return True
+    except Exception as e:
+        if isinstance(e, asyncio.TimeoutError):
+            e = TimeoutError(f"pair exceeded {SIMULATION_PAIR_TIMEOUT:g}s")
+        error = f"{type(e).__name__}: {getattr(e, 'detail', None) or e}"
+        logger.error(f"Pair {pair.get('student_id')}/{pair.get('topic_id')} failed: {error}")
+        await offload(store.fail_pair, set_type, pair, error)
+        return False
+
+
+def snapshot() -> dict:
+    return {**stats, "breakers": {name: cb.stats() for name, cb in _breakers.items()}}
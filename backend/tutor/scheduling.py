@@ -0,0 +1,116 @@
+"""Priority classes and per-tenant fair queuing for the adaptive limiters.
+
+Live users (``/conversations/*``) and background work (``/generate_mse``
+simulations, discovery, ``/reanalyze``, ``shard_runner.py``) share the same
+LLM and Knowunity limiters (``tutor/limits.py``) and the per-host connection
+cap (``tutor/http.py``). When one is full, its waiters are queued by priority
+class:
+
+- ``interactive``: the default, for anything not run inside ``batch()``.
+- ``batch``: code run inside ``batch(tenant)``, including tasks spawned from
+  it. The tenant is the set type.
+
+A freed slot goes to the oldest interactive waiter first. Batch waiters
+share the rest round-robin by tenant, so one large run cannot starve a
+smaller one. Batch can use at most ``limit - SCHEDULER_INTERACTIVE_RESERVE``
+slots of a limiter, which leaves room for a live turn to start right away.
+After ``SCHEDULER_INTERACTIVE_BURST`` interactive grants in a row with batch
+waiting, one batch waiter goes next, so batch still progresses under
+sustained interactive load.
+
+Each queued acquisition records its wait as a ``<limiter>_queue_wait`` stage
+in ``/metrics``, labelled with the set type. The per-class grants and waits
+are under ``limits`` in ``/pipeline_stats``. ``SCHEDULER_ENABLED=0`` turns
+this back into one FIFO queue per limiter.
+"""
+import os
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Tuple
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+SCHEDULER_INTERACTIVE_RESERVE = int(os.getenv("SCHEDULER_INTERACTIVE_RESERVE", "1"))
+SCHEDULER_INTERACTIVE_BURST = int(os.getenv("SCHEDULER_INTERACTIVE_BURST", "10"))
+
+INTERACTIVE, BATCH = "interactive", "batch"
+PRIORITIES = (INTERACTIVE, BATCH)  # highest first
+
+Traffic = Tuple[str, str]  # (priority, tenant)
+
+_traffic: ContextVar[Traffic] = ContextVar("scheduling_traffic", default=(INTERACTIVE, INTERACTIVE))
+
+
+@contextmanager
+def batch(tenant: str):
+    """Queues limiter slots taken inside the block, and in tasks spawned from it, as ``tenant``'s batch work."""
+    token = _traffic.set((BATCH, tenant))
+    try:
+        yield
+    finally:
+        _traffic.reset(token)
+
+
+def current() -> Traffic:
+    return _traffic.get() if SCHEDULER_ENABLED else (INTERACTIVE, INTERACTIVE)
+
+
+def reserve(limit: int) -> int:
+    """Slots of a ``limit``-slot limiter kept for interactive traffic; batch always keeps at least one."""
+    return min(SCHEDULER_INTERACTIVE_RESERVE, limit - 1) if SCHEDULER_ENABLED else 0
+
+
+class FairQueue:
+    """Waiters by priority class, then round-robin over tenants within a class."""
+
+    def __init__(self):
+        self._queues: Dict[str, "OrderedDict[str, deque]"] = {p: OrderedDict() for p in PRIORITIES}
+        self._burst = 0  # interactive grants in a row while batch was waiting
+
+    def __len__(self) -> int:
+        return sum(self.waiting(p) for p in PRIORITIES)
+
+    def waiting(self, priority: str) -> int:
+        return sum(len(q) for q in self._queues[priority].values())
+
+    def depths(self) -> dict:
+        return {p: {tenant: len(q) for tenant, q in tenants.items()} for p, tenants in self._queues.items()}
+
+    def push(self, traffic: Traffic, item):
+        priority, tenant = traffic
+        tenants = self._queues[priority]
+        if tenant not in tenants:
+            tenants[tenant] = deque()
+        tenants[tenant].append(item)
+
+    def remove(self, traffic: Traffic, item):
+        """Drops ``item`` if it is still queued; a no-op once ``pop()`` has handed it out."""
+        priority, tenant = traffic
+        tenants = self._queues[priority]
+        queue = tenants.get(tenant)
+        if queue is None or item not in queue:
+            return
+        queue.remove(item)
+        if not queue:
+            del tenants[tenant]
+
+    def pop(self, allowed: Iterable[str] = PRIORITIES) -> Optional[Tuple[str, object]]:
+        """Next ``(priority, item)`` among the ``allowed`` classes, or None."""
+        candidates = [p for p in PRIORITIES if p in allowed and self._queues[p]]
+        if not candidates:
+            return None
+        priority = candidates[0]
+        if priority == INTERACTIVE and BATCH in candidates and self._burst >= SCHEDULER_INTERACTIVE_BURST:
+            priority = BATCH
+        if priority == INTERACTIVE:
+            self._burst = self._burst + 1 if self._queues[BATCH] else 0
+        else:
+            self._burst = 0
+        tenants = self._queues[priority]
+        tenant, queue = next(iter(tenants.items()))
+        item = queue.popleft()
+        if queue:
+            tenants.move_to_end(tenant)
+        else:
+            del tenants[tenant]
+        return priority, item
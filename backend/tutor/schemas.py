@@ -0,0 +1,43 @@
+"""Pydantic schemas for the structured LLM outputs.
+
+Validation is lenient where the meaning is unambiguous: numeric levels are
+rounded and clamped to 1-5 (``"4"`` and ``4.4`` both become 4) and unknown
+keys are kept, so a server can extend a schema (e.g. ``thinking_process``).
+"""
+from typing import Any, List
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+
+class _Output(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+
+class Analysis(_Output):
+    understanding_level: int = Field(ge=1, le=5)
+    justification: str = ""
+    evidence: List[Any] = []
+
+    @field_validator("understanding_level", mode="before")
+    @classmethod
+    def _round_level(cls, value):
+        if isinstance(value, str):
+            value = value.strip().split("/")[0]  # "4/5"
+        try:
+            return min(5, max(1, round(float(value))))
+        except (TypeError, ValueError):
+            return value  # left for the int validator to reject
+
+
+class Suggestion(_Output):
+    suggested_response: str = Field(min_length=1)
+    strategy_note: str = ""
+
+
+class Combined(_Output):
+    analysis: Analysis
+    suggestion: Suggestion
+
+
+class Summary(_Output):
+    summary: str = Field(min_length=1)
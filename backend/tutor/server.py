@@ -0,0 +1,493 @@
+"""The tutoring / simulation server shared by every backend entry point.
+
+``TutorServer(profile)`` holds one profile's state (catalog, session limit,
+and a store and LLM client created on first use) and the turn and simulation
+logic, so importing an entry point opens no files and connections.
+``create_app`` puts the HTTP API in front of it. The entry points only pick a
+profile (see ``tutor/profiles.py``):
+
+    python phack-fast.py                         # one profile per file, as before
+    SERVER_PROFILE=phack-fast-2 python server.py # any profile
+"""
+import asyncio
+import os
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from pydantic import BaseModel
+
+from tutor import (cache, compaction, convergence, devset, discovery,
+                   estimator, http, llm, metrics, profiles, progress, prompts,
+                   reanalysis, resilience, scheduling, streaming, usage)
+from tutor.catalog import Catalog
+from tutor.conversation import (Conversation, ConversationRegistry,
+                                conversations, simulations)
+from tutor.store import create_store, offload, replay
+
+API_BASE = os.getenv("TUTOR_API_BASE_URL", "https://knowunity-agent-olympics-2026-api.vercel.app")
+TUTOR_API_KEY = os.getenv("TUTOR_API_KEY")
+# Upper bound on open sessions; upstream calls are paced by the adaptive limits in tutor/limits.py
+MAX_CONCURRENT_SESSIONS = int(os.getenv("MAX_CONCURRENT_SESSIONS", "100"))
+
+
+class StartRequest(BaseModel):
+    student_id: str
+    topic_id: str
+
+
+class TutorServer:
+    def __init__(self, profile: profiles.Profile):
+        self.profile = profile
+        self.model = profile.model
+        self.prompts = prompts.get_prompt_set(profile.prompt_set)
+        self.api_base = API_BASE
+        self.headers = {"Content-Type": "application/json", "accept": "application/json"}
+        if TUTOR_API_KEY is not None:  # httpx rejects None header values; requests used to drop them
+            self.headers["X-Api-Key"] = TUTOR_API_KEY
+        self.catalog = Catalog(self.api_base, self.headers)
+        self.semaphore = asyncio.Semaphore(MAX_CONCURRENT_SESSIONS)
+        self._client = None
+        self._store = None
+        self._progress = None
+        self.app = create_app(self)
+
+    @property
+    def client(self):
+        """The profile's LLM client, created on first use."""
+        if self._client is None:
+            self._client = self.profile.create_client()
+        return self._client
+
+    @property
+    def store(self):
+        """Durable simulation results (SIMULATION_STORE: sqlite | jsonl | memory), opened on first use."""
+        if self._store is None:
+            self._store = create_store()
+        return self._store
+
+    @property
+    def progress(self):
+        if self._progress is None:
+            self._progress = progress.Progress(self.store)
+        return self._progress
+
+    def _llm_options(self) -> dict:
+        p = self.profile
+        options = {"analysis_params": p.analysis_params, "suggestion_params": p.suggestion_params,
+                   "analysis_schema": p.analysis_schema}
+        if p.analysis_fallback is not None:
+            options["analysis_fallback"] = lambda e: dict(p.analysis_fallback)
+        if p.suggestion_fallback is not None:
+            options["suggestion_fallback"] = p.suggestion_fallback
+        return options
+
+    # --- Core interaction logic ---
+    async def student_turn(self, conv_id, tutor_msg, topic_name, history=None,
+                           registry: ConversationRegistry = conversations):
+        """Forwards the tutor message to Knowunity and appends the exchange to the server-side transcript."""
+        resp = await http.post(
+            f"{self.api_base}/interact",
+            json={"conversation_id": conv_id, "tutor_message": tutor_msg},
+            headers=self.headers,
+            limit="knowunity_interact"
+        )
+        if resp.status_code != 200:
+            raise HTTPException(status_code=resp.status_code, detail=resp.text)
+
+        student_data = resp.json()
+        conv = registry.get_or_create(conv_id, topic_name, history)
+        conv.add_turn(tutor_msg, student_data.get("student_response", ""))
+        history_text = await compaction.history_text(conv, self.client, self.model)  # TRANSCRIPT_COMPACTION
+        return student_data, conv, history_text
+
+    async def perform_interaction(self, conv_id, tutor_msg, topic_name, history=None, prev_level=None, last_turn=False,
+                                  registry: ConversationRegistry = conversations):
+        """Handles a single interaction turn: the student's reply, then LLM analysis and suggestion."""
+        student_data, conv, history_text = await self.student_turn(conv_id, tutor_msg, topic_name, history, registry)
+        return await self.analyze_turn(student_data, conv, history_text, topic_name, prev_level, last_turn)
+
+    async def analyze_turn(self, student_data, conv, history_text, topic_name, prev_level=None, last_turn=False,
+                           on_delta=None) -> dict:
+        """The LLM half of a turn, shared by the plain and the streaming interact endpoints.
+
+        ``on_delta(event, text)`` receives the justification and suggestion text as it streams.
+        """
+        student_reply = student_data.get("student_response", "")
+        if prev_level is None:
+            prev_level = conv.last_level
+
+        # A confident local estimate stands in for the analysis call on intermediate turns (ESTIMATOR_MODE)
+        decision = estimator.decide(conv, final=last_turn or bool(student_data.get("is_complete")))
+
+        # LLM Analysis + Suggestion (scheduled per LLM_PIPELINE_MODE)
+        analysis, suggestion = await llm.analyze_and_suggest(
+            self.client, self.model,
+            analysis_prompt=self.prompts["analysis"].render(topic_name=topic_name, history_text=history_text),
+            tutoring_prompt=lambda level: self.prompts["tutoring"].render(
+                level=level, topic_name=topic_name, last_response=student_reply),
+            prev_level=prev_level,
+            analysis=decision.analysis,
+            on_delta=on_delta,
+            **self._llm_options()
+        )
+        estimator.record(conv, decision, analysis)
+        conv.last_level = analysis.get("understanding_level")
+
+        return {
+            "student_response": student_reply,
+            "turn_number": student_data.get("turn_number"),
+            "is_complete": student_data.get("is_complete"),
+            "analysis": analysis,
+            "suggestion": suggestion
+        }
+
+    # --- Simulation logic ---
+    async def simulate_single_pair(self, pair: dict, set_type: str) -> bool:
+        """Simulates one pair under the session limit; a failure is recorded, not raised."""
+        async with self.semaphore:
+            ok = await resilience.isolate_pair(self.store, set_type, pair, self.run_pair(pair, set_type))
+        simulations.drop(pair["conversation_id"])  # a resumed pair is rebuilt from its checkpointed turns
+        if not ok:
+            self.progress.pair_failed(set_type, pair)
+        return ok
+
+    async def run_pair(self, pair: dict, set_type: str):
+        topic_name = pair["topic_name"]
+        await offload(self.store.save_pair, set_type, pair)
+
+        # Resume from the last checkpointed turn, if any
+        turns = await offload(self.store.load_turns, set_type, pair)
+        history, next_msg, final_state, finished = replay(turns)
+        current_tutor_msg = next_msg or self.profile.opening.format(topic_name=topic_name)
+        tracker = convergence.Tracker([t["analysis"] for t in turns])  # EARLY_STOP
+
+        max_turns = 0 if finished else pair.get("max_turns", 5)
+        last_state = turns[-1] if turns else None
+        with usage.track() as pair_usage, metrics.timer("pair"):
+            for turn in range(len(history) // 2, max_turns):
+                with metrics.timer("turn"):
+                    result = await self.perform_interaction(
+                        pair["conversation_id"], current_tutor_msg, topic_name, history,
+                        prev_level=final_state.get("understanding_level"),
+                        last_turn=turn == max_turns - 1, registry=simulations
+                    )
+                last_state = {"tutor_message": current_tutor_msg, **result}
+                await offload(self.store.save_turn, set_type, pair, turn, last_state)
+                self.progress.turn(set_type, pair, turn, result)
+
+                history.append({"role": "user", "content": current_tutor_msg})
+                history.append({"role": "assistant", "content": result["student_response"]})
+                current_tutor_msg = result["suggestion"]["suggested_response"]
+                final_state = result["analysis"]
+
+                if result.get("is_complete"):
+                    break
+                replies = [m["content"] for m in history if m["role"] == "assistant"]
+                if tracker.update(final_state, replies, max_turns):
+                    break
+
+            if final_state.get("fallback") and last_state is not None:
+                # The prediction would be the default level: analyse once more, else fail the pair
+                final_state = await self.retry_final_analysis(set_type, pair, history, last_state)
+
+        result = {
+            "student_id": pair["student_id"],
+            "topic_id": pair["topic_id"],
+            "inferred_level": final_state.get("understanding_level", llm.DEFAULT_LEVEL),
+            "justification": final_state.get("justification"),
+            "ensemble": final_state.get("ensemble"),
+            "turns": len(history) // 2,
+            "stopped_early": tracker.stopped_at is not None,
+            "usage": usage.summarize_scope(pair_usage)
+        }
+        tracker.finish(set_type, result)
+        await self.progress.pair_finished(set_type, result, await offload(self.store.finish_pair, set_type, pair, result))
+
+    async def retry_final_analysis(self, set_type: str, pair: dict, history: List[dict], last_state: dict) -> dict:
+        """Re-runs the analysis of a pair's last checkpointed turn, raising if it falls back again.
+
+        The raise makes ``isolate_pair`` record the pair as failed, so a resumed
+        run gets here again instead of submitting the fallback level.
+        """
+        topic_name = pair["topic_name"]
+        conv = Conversation(pair["conversation_id"], topic_name, history)
+        history_text = await compaction.history_text(conv, self.client, self.model)
+        options = self._llm_options()
+        analysis = await llm.analyze(
+            self.client, self.model, self.prompts["analysis"].render(topic_name=topic_name, history_text=history_text),
+            options["analysis_params"], options.get("analysis_fallback", llm.default_analysis_fallback),
+            options["analysis_schema"]
+        )
+        if analysis.get("fallback"):
+            raise RuntimeError(f"Final analysis fell back: {analysis.get('justification')}")
+        await offload(self.store.save_turn, set_type, pair, len(history) // 2 - 1, {**last_state, "analysis": analysis})
+        return analysis
+
+    async def run_simulation(self, set_type: str, pairs):
+        """Runs every pair, one at a time or all at once per the profile's strategy."""
+        await offload(self.store.update_run, set_type, status="in_progress")
+        tasks = []
+        try:
+            if self.profile.strategy == "sequential":
+                outcomes = [await self.simulate_single_pair(pair, set_type) async for pair in discovery.iter_pairs(pairs)]
+            else:
+                async for pair in discovery.iter_pairs(pairs):
+                    tasks.append(asyncio.create_task(self.simulate_single_pair(pair, set_type)))
+                outcomes = await asyncio.gather(*tasks)
+        except Exception as e:
+            # e.g. discovery failed: pairs already started still finish, but the run is not complete
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await offload(self.store.update_run, set_type, status="failed", error=str(e))
+            await self.progress.status(set_type, "failed")
+            raise
+        # A failed pair is recorded and skipped instead of aborting the run
+        await offload(self.store.update_run, set_type, status="completed", failed_pairs=outcomes.count(False))
+        await self.progress.status(set_type, "completed")
+
+    async def submit_simulation(self, set_type: str = "mini_dev", partial: bool = False,
+                                min_coverage: Optional[float] = None, local: bool = False) -> dict:
+        """Scores the run's predictions remotely, or against the local dev labels with ``local``.
+
+        ``partial`` scores the pairs finished so far once ``min_coverage``
+        (default ``SUBMIT_MIN_COVERAGE``) of the run is done, instead of
+        waiting for ``status == "completed"``. A completed run with failed
+        pairs is incomplete too, so it also needs ``partial``.
+        """
+        summary = await offload(self.store.summary, set_type)
+        if not summary:
+            raise HTTPException(status_code=404, detail=f"No simulation found for set: {set_type}")
+        coverage = devset.coverage(summary, len(await offload(self.store.known_pairs, set_type)))
+        if not partial and summary.get("status") != "completed":
+            raise HTTPException(status_code=400, detail=f"Simulation is {summary.get('status')}, not completed.")
+        if not partial and summary.get("failed"):
+            raise HTTPException(status_code=400, detail=f"{summary['failed']} pairs failed; submit with partial=true "
+                                                        f"to score the {summary.get('completed', 0)} finished ones.")
+        min_coverage = devset.SUBMIT_MIN_COVERAGE if min_coverage is None else min_coverage
+        if partial and coverage < min_coverage:
+            raise HTTPException(status_code=400,
+                                detail=f"Only {coverage:.0%} of pairs are finished; {min_coverage:.0%} needed.")
+
+        # A snapshot: pairs finishing from here on are not included
+        predictions = [{"student_id": e["student_id"], "topic_id": e["topic_id"], "predicted_level": e["inferred_level"]}
+                       for e in (await offload(self.store.get, set_type))["data"]]
+        snapshot = {"partial": True, "coverage": round(coverage, 4), "predictions": len(predictions)} if partial else {}
+        if local:
+            local_mse = devset.score(set_type, predictions)
+            if not local_mse["labelled_pairs"]:
+                raise HTTPException(status_code=400, detail=f"No dev labels for set: {set_type}")
+            return {"local_mse": local_mse, **snapshot}
+
+        mse_resp = await http.post(f"{self.api_base}/evaluate/mse", json={"predictions": predictions, "set_type": set_type},
+                                   headers=self.headers)
+        if mse_resp.status_code != 200:
+            return {"error": "MSE Failed", "details": mse_resp.text}
+
+        tut_resp = await http.post(f"{self.api_base}/evaluate/tutoring", json={"set_type": set_type}, headers=self.headers)
+        return {"mse": mse_resp.json(), "tutoring": tut_resp.json() if tut_resp.status_code == 200 else tut_resp.text,
+                **snapshot}
+
+
+def require_transcript(data: dict):
+    """409 before the turn is sent upstream when the server no longer has the conversation and no ``history`` came.
+
+    The client should resend the turn with its full ``history`` (``[]`` for a
+    conversation that has not had a turn yet).
+    """
+    if "history" not in data and conversations.get(data.get("conversation_id")) is None:
+        raise HTTPException(status_code=409, detail={
+            "error": "unknown_conversation",
+            "message": "The server has no transcript for this conversation_id; resend the turn with `history`.",
+        })
+
+
+def create_app(server: TutorServer) -> FastAPI:
+    app = FastAPI(title=server.profile.title, lifespan=http.lifespan)
+    if metrics.SERVER_TIMING:
+        app.middleware("http")(metrics.server_timing)
+    catalog = server.catalog
+
+    @app.get("/students")
+    async def list_students(set_type: str = Query("mini_dev")):
+        return await catalog.students(set_type)
+
+    @app.get("/students/{student_id}/topics")
+    async def get_student_topics(student_id: str):
+        return await catalog.topics(student_id)
+
+    @app.get("/catalog")
+    async def get_catalog(request: Request, set_type: str = Query("mini_dev")):
+        """All students of a set with their topics in one call, served from the local cache."""
+        return await catalog.respond(set_type, request.headers.get("if-none-match"))
+
+    @app.post("/conversations/start")
+    async def start_conversation(req: StartRequest):
+        data = (await http.post(f"{server.api_base}/interact/start", json=req.model_dump(), headers=server.headers)).json()
+        if data.get("conversation_id"):
+            conversations.get_or_create(data["conversation_id"])  # the first turn then needs no history
+        return data
+
+    @app.post("/conversations/interact")
+    async def interact(request: Request):
+        """Bypasses strict Pydantic validation for the history state."""
+        data = await request.json()
+        require_transcript(data)
+        # "Cache-Control: no-cache" forces fresh LLM calls for this turn
+        with cache.bypass(request.headers.get("cache-control") == "no-cache"):
+            return await server.perform_interaction(
+                data.get("conversation_id"), data.get("tutor_message"),
+                data.get("topic_name", "Topic"), data.get("history"),
+                data.get("previous_level")
+            )
+
+    @app.post("/conversations/interact/stream")
+    async def interact_stream(request: Request):
+        """Same turn as /conversations/interact, streamed as NDJSON (or SSE with Accept: text/event-stream).
+
+        Events: student_response, analysis_delta*, suggestion_delta*, analysis, suggestion, done.
+        Deltas are the new text of the justification and the suggested response.
+        """
+        data = await request.json()
+        require_transcript(data)
+        topic_name = data.get("topic_name", "Topic")
+        no_cache = request.headers.get("cache-control") == "no-cache"
+
+        # Knowunity errors still surface as a plain HTTP error, before the stream starts
+        student_data, conv, history_text = await server.student_turn(
+            data.get("conversation_id"), data.get("tutor_message"), topic_name, data.get("history")
+        )
+
+        async def events():
+            yield {"event": "student_response", "data": {
+                "student_response": student_data.get("student_response", ""),
+                "turn_number": student_data.get("turn_number"),
+                "is_complete": student_data.get("is_complete"),
+            }}
+            deltas = asyncio.Queue()
+            with cache.bypass(no_cache):
+                turn = asyncio.create_task(server.analyze_turn(
+                    student_data, conv, history_text, topic_name, data.get("previous_level"),
+                    on_delta=lambda event, text: deltas.put_nowait({"event": event, "data": text})
+                ))
+            turn.add_done_callback(lambda _: deltas.put_nowait(None))
+            try:
+                while (event := await deltas.get()) is not None:
+                    yield event
+                result = turn.result()
+            finally:
+                turn.cancel()  # the client went away
+            yield {"event": "analysis", "data": result["analysis"]}
+            yield {"event": "suggestion", "data": result["suggestion"]}
+            yield {"event": "done", "data": None}
+
+        return streaming.respond(request, events())
+
+    @app.post("/generate_mse")
+    async def generate_mse(set_type: str = Query("mini_dev"), resume: bool = Query(True), use_cache: bool = Query(True)):
+        # 1. Start the simulation first; it consumes pairs as soon as discovery yields them
+        pair_queue = asyncio.Queue()
+        if not resume:
+            await offload(server.store.reset, set_type)
+            server.progress.reset(set_type)
+        await offload(server.store.update_run, set_type, status="in_progress", total_expected=None)
+        with cache.bypass(not use_cache), metrics.labels(set_type), scheduling.batch(set_type):
+            discovery.spawn(server.run_simulation(set_type, pair_queue))
+
+        # 2. Fan out students -> topics -> /interact/start under the shared rate limiter
+        known = await offload(server.store.known_pairs, set_type)
+        with metrics.labels(set_type), scheduling.batch(set_type), metrics.timer("discovery"):
+            summary = await discovery.discover_pairs(
+                server.api_base, server.headers, set_type, pair_queue, known=known, catalog=catalog
+            )
+        await offload(server.store.update_run, set_type, total_expected=summary["pair_count"] + summary["skipped"])
+        return {"message": "Simulation started", "pair_count": summary["pair_count"], "skipped_pairs": summary["skipped"],
+                "failed_pairs": summary["failed"], "set_type": set_type}
+
+    @app.get("/simulation_results")
+    def get_results(set_type: str = Query("mini_dev"), cursor: Optional[int] = Query(None, ge=0),
+                    limit: Optional[int] = Query(None, ge=1, le=1000)):
+        """The whole run, or with ``cursor``/``limit`` one page of results finished after ``cursor``."""
+        if cursor is None and limit is None:
+            return server.store.get(set_type) or {"status": "not_found"}
+        summary = server.store.summary(set_type)
+        if summary is None:
+            return {"status": "not_found"}
+        limit = limit or 100
+        # One extra row tells whether another page follows
+        page, next_cursor = server.store.results_page(set_type, cursor or 0, limit + 1)
+        has_more = len(page) > limit
+        if has_more:
+            page = page[:limit]
+            next_cursor = page[-1][0]
+        return {**summary, "data": [result for _, result in page], "next_cursor": next_cursor, "has_more": has_more}
+
+    @app.get("/simulation_status")
+    def get_status(set_type: str = Query("mini_dev")):
+        sim = server.store.summary(set_type) or {"status": "not_started"}
+        completed = sim.get("completed", 0)
+        total = sim.get("total_expected") or 1
+        return {"status": sim.get("status"), "progress_pct": round((completed / total) * 100, 2), "completed": completed,
+                "total": total}
+
+    @app.get("/simulation_events")
+    async def simulation_events(request: Request, set_type: str = Query("mini_dev"),
+                                cursor: Optional[int] = Query(None, ge=0)):
+        """Pushes per-turn and per-pair events with running aggregates (see tutor/progress.py)."""
+        return streaming.respond(request, server.progress.events(set_type, cursor))
+
+    @app.post("/submit_simulation")
+    async def submit_simulation(set_type: str = Query("mini_dev"), partial: bool = Query(False),
+                                min_coverage: Optional[float] = Query(None, ge=0, le=1), local: bool = Query(False)):
+        return await server.submit_simulation(set_type, partial, min_coverage, local)
+
+    @app.post("/dev_labels")
+    async def save_dev_labels(labels: List[dict], set_type: str = Query("mini_dev")):
+        """Merges ``[{"student_id", "topic_id", "level"}]`` into the local dev labels."""
+        count = devset.save(set_type, labels)
+        server.progress.reset(set_type)  # the running local_mse picks the new labels up
+        return {"set_type": set_type, "labelled_pairs": count}
+
+    @app.post("/evaluate/mse")
+    async def submit_mse(req: dict):
+        return (await http.post(f"{server.api_base}/evaluate/mse", json=req, headers=server.headers)).json()
+
+    @app.post("/evaluate/tutoring")
+    async def evaluate_tutoring(set_type: str = "mini_dev"):
+        return (await http.post(f"{server.api_base}/evaluate/tutoring", json={"set_type": set_type},
+                                headers=server.headers)).json()
+
+    @app.post("/reanalyze")
+    async def reanalyze(set_type: str = Query("mini_dev"), model: str = Query(server.model),
+                        prompt_set: Optional[str] = Query(None),
+                        batch_size: int = Query(reanalysis.BATCH_SIZE, ge=1),
+                        concurrency: int = Query(reanalysis.CONCURRENCY, ge=1), evaluate: bool = Query(False),
+                        evaluate_local: bool = Query(False)):
+        """Re-runs only the analysis over a set's stored transcripts; no Knowunity turns are replayed."""
+        with scheduling.batch(set_type):
+            return await reanalysis.run(
+                server.store, set_type, server.client, model, reanalysis.analysis_prompt(prompt_set, server.prompts),
+                batch_size, concurrency, evaluate_with=(server.api_base, server.headers) if evaluate else None,
+                evaluate_local=evaluate_local, **server.profile.analysis_params
+            )
+
+    @app.get("/metrics")
+    def get_metrics():
+        """Per-stage latency histograms in Prometheus text format."""
+        return metrics.response()
+
+    @app.get("/pipeline_stats")
+    def pipeline_stats():
+        """LLM stage counters (speculation, usage, response cache) and catalog cache counters."""
+        return {**llm.get_stats(), "catalog": catalog.stats(), "profile": server.profile.name,
+                "model": server.model, "strategy": server.profile.strategy, "progress": progress.snapshot()}
+
+    return app
+
+
+def create(profile_name: str) -> TutorServer:
+    return TutorServer(profiles.get(profile_name))
+
+
+def serve(server: TutorServer):
+    import uvicorn
+
+    uvicorn.run(server.app, host="0.0.0.0", port=server.profile.port)
@@ -0,0 +1,331 @@
+"""Durable, resumable storage for simulation runs.
+
+Replaces the process-global ``simulation_storage`` dict. Every finished turn
+and every finished pair is checkpointed, so a restarted (or second) worker can
+skip pairs that are already done and pick half-finished conversations up at
+their last turn instead of paying for the LLM and Knowunity calls again.
+Calling ``/generate_mse`` again resumes a run this way; ``resume=false``
+starts it over.
+
+Backends (``SIMULATION_STORE``):
+
+- ``sqlite`` (default): embedded SQLite database in WAL mode.
+- ``jsonl``: append-only JSON-lines log, replayed into memory on read.
+- ``memory``: no persistence, same behaviour as the old dict.
+
+Finished results carry a cursor that increases with each ``finish_pair``, so
+``results_page`` can return only what finished since a client's last read.
+
+The stores are synchronous. Async code runs every store call, reads included,
+through ``offload()`` on one thread, so a commit, an ``fsync``, a query or a
+JSONL re-read does not stall the event loop that serves the other sessions.
+Calls run in submission order, so a read sees every write awaited before it.
+"""
+import asyncio
+import bisect
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+SIMULATION_STORE = os.getenv("SIMULATION_STORE", "sqlite")
+SIMULATION_STORE_PATH = os.getenv("SIMULATION_STORE_PATH")
+
+PairKey = Tuple[str, str]
+T = TypeVar("T")
+
+# One thread keeps the store calls of a process in submission order
+_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="store")
+
+
+def pair_key(pair: dict) -> PairKey:
+    return (pair["student_id"], pair["topic_id"])
+
+
+async def offload(method: Callable[..., T], *args, **kwargs) -> T:
+    """Runs a store call, e.g. ``offload(store.save_turn, ...)``, on the store thread."""
+    return await asyncio.get_running_loop().run_in_executor(_worker, functools.partial(method, *args, **kwargs))
+
+
+def replay(turns: List[dict]) -> Tuple[List[dict], Optional[str], dict, bool]:
+    """Rebuilds ``(history, next_tutor_msg, final_state, is_complete)`` from checkpointed turns."""
+    history, next_msg, final_state, complete = [], None, {}, False
+    for t in turns:
+        history.append({"role": "user", "content": t["tutor_message"]})
+        history.append({"role": "assistant", "content": t["student_response"]})
+        next_msg = t["suggestion"]["suggested_response"]
+        final_state = t["analysis"]
+        complete = bool(t.get("is_complete"))
+    return history, next_msg, final_state, complete
+
+
+class MemoryStore:
+    """In-process store; also the replay target for the JSONL backend."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._runs: Dict[str, dict] = {}
+        self._pairs: Dict[str, Dict[PairKey, dict]] = {}
+        self._turns: Dict[str, Dict[PairKey, Dict[int, dict]]] = {}
+        self._results: Dict[str, Dict[PairKey, dict]] = {}
+        self._failures: Dict[str, Dict[PairKey, str]] = {}
+        self._cursors: Dict[str, Dict[PairKey, int]] = {}
+        self._result_log: Dict[str, List[Tuple[int, PairKey]]] = {}  # (cursor, key) in finish order
+        self._seq = 0
+
+    # --- Mutations (all funnel through _apply so the JSONL log can replay them) ---
+    def _apply(self, rec: dict):
+        op, set_type = rec["op"], rec["set_type"]
+        if op == "reset":
+            for table in (self._runs, self._pairs, self._turns, self._results, self._failures, self._cursors,
+                          self._result_log):
+                table.pop(set_type, None)
+        elif op == "run":
+            self._runs.setdefault(set_type, {}).update(rec["fields"])
+        elif op == "pair":
+            self._pairs.setdefault(set_type, {})[tuple(rec["key"])] = rec["pair"]
+        elif op == "turn":
+            self._turns.setdefault(set_type, {}).setdefault(tuple(rec["key"]), {})[rec["turn"]] = rec["state"]
+        elif op == "result":
+            key = tuple(rec["key"])
+            self._seq += 1
+            self._results.setdefault(set_type, {})[key] = rec["result"]
+            self._cursors.setdefault(set_type, {})[key] = self._seq
+            self._result_log.setdefault(set_type, []).append((self._seq, key))
+            self._failures.get(set_type, {}).pop(key, None)
+        elif op == "failure":
+            self._failures.setdefault(set_type, {})[tuple(rec["key"])] = rec["error"]
+
+    def _write(self, rec: dict):
+        with self._lock:
+            self._apply(rec)
+
+    def reset(self, set_type: str):
+        self._write({"op": "reset", "set_type": set_type})
+
+    def update_run(self, set_type: str, **fields):
+        self._write({"op": "run", "set_type": set_type, "fields": fields})
+
+    def save_pair(self, set_type: str, pair: dict):
+        self._write({"op": "pair", "set_type": set_type, "key": list(pair_key(pair)), "pair": pair})
+
+    def save_turn(self, set_type: str, pair: dict, turn: int, state: dict):
+        self._write({"op": "turn", "set_type": set_type, "key": list(pair_key(pair)), "turn": turn, "state": state})
+
+    def finish_pair(self, set_type: str, pair: dict, result: dict) -> int:
+        """Stores the pair's result and returns its cursor."""
+        with self._lock:
+            self._write({"op": "result", "set_type": set_type, "key": list(pair_key(pair)), "result": result})
+            return self._cursors[set_type][pair_key(pair)]
+
+    def fail_pair(self, set_type: str, pair: dict, error: str):
+        """Records a pair that gave up; it stays not-done, so a resumed run retries it."""
+        self._write({"op": "failure", "set_type": set_type, "key": list(pair_key(pair)), "error": error})
+
+    # --- Reads ---
+    def _refresh(self):
+        pass
+
+    def get(self, set_type: str) -> Optional[dict]:
+        """Run metadata plus finished results and failed pairs, in the shape of the old storage dict."""
+        with self._lock:
+            self._refresh()
+            if set_type not in self._runs:
+                return None
+            failed = [{"student_id": s, "topic_id": t, "error": e}
+                      for (s, t), e in self._failures.get(set_type, {}).items()]
+            return {**self._runs[set_type], "data": list(self._results.get(set_type, {}).values()), "failed": failed}
+
+    def summary(self, set_type: str) -> Optional[dict]:
+        """Run metadata with result and failure counts, without the results themselves."""
+        with self._lock:
+            self._refresh()
+            if set_type not in self._runs:
+                return None
+            return {**self._runs[set_type], "completed": len(self._results.get(set_type, {})),
+                    "failed": len(self._failures.get(set_type, {}))}
+
+    def results_page(self, set_type: str, cursor: int = 0, limit: int = 100) -> Tuple[List[Tuple[int, dict]], int]:
+        """Up to ``limit`` ``(cursor, result)`` finished after ``cursor``, and the cursor to pass next time."""
+        with self._lock:
+            self._refresh()
+            log, current = self._result_log.get(set_type, []), self._cursors.get(set_type, {})
+            page, next_cursor = [], cursor
+            for seq, key in log[bisect.bisect_right(log, cursor, key=lambda e: e[0]):]:
+                if len(page) >= limit:
+                    break
+                next_cursor = seq
+                if current.get(key) == seq:  # skip entries superseded by a later result for the pair
+                    page.append((seq, self._results[set_type][key]))
+            return page, next_cursor
+
+    def load_turns(self, set_type: str, pair: dict) -> List[dict]:
+        with self._lock:
+            self._refresh()
+            turns = self._turns.get(set_type, {}).get(pair_key(pair), {})
+            return [turns[i] for i in sorted(turns)]
+
+    def known_pairs(self, set_type: str) -> Dict[PairKey, dict]:
+        """Previously started pairs, flagged ``done`` when a result exists."""
+        with self._lock:
+            self._refresh()
+            done = self._results.get(set_type, {})
+            return {k: {**p, "done": k in done} for k, p in self._pairs.get(set_type, {}).items()}
+
+
+class JSONLStore(MemoryStore):
+    """Append-only log; other processes' appends are picked up on the next read."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._offset = 0
+        open(self.path, "a").close()
+
+    def _write(self, rec: dict):
+        line = json.dumps({**rec, "ts": time.time()}) + "\n"
+        with open(self.path, "a", encoding="utf-8") as f:
+            with self._lock:
+                self._refresh()
+                f.write(line)
+                f.flush()
+                self._refresh()
+            os.fsync(f.fileno())  # outside the lock, so reads do not wait for the disk
+
+    def _refresh(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            f.seek(self._offset)
+            for line in iter(f.readline, ""):
+                if not line.endswith("\n"):
+                    break  # partially written line; re-read it next time
+                self._offset += len(line.encode("utf-8"))
+                if line.strip():
+                    self._apply(json.loads(line))
+
+
+class SQLiteStore:
+    """Embedded SQLite in WAL mode, safe to share between uvicorn workers."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS runs (set_type TEXT PRIMARY KEY, fields TEXT NOT NULL);
+    CREATE TABLE IF NOT EXISTS pairs (
+        set_type TEXT, student_id TEXT, topic_id TEXT, pair TEXT NOT NULL,
+        PRIMARY KEY (set_type, student_id, topic_id));
+    CREATE TABLE IF NOT EXISTS turns (
+        set_type TEXT, student_id TEXT, topic_id TEXT, turn INTEGER, state TEXT NOT NULL,
+        PRIMARY KEY (set_type, student_id, topic_id, turn));
+    CREATE TABLE IF NOT EXISTS results (
+        set_type TEXT, student_id TEXT, topic_id TEXT, result TEXT NOT NULL, finished_at REAL,
+        PRIMARY KEY (set_type, student_id, topic_id));
+    CREATE TABLE IF NOT EXISTS failures (
+        set_type TEXT, student_id TEXT, topic_id TEXT, error TEXT NOT NULL, failed_at REAL,
+        PRIMARY KEY (set_type, student_id, topic_id));
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def _exec(self, sql: str, params: tuple = ()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def reset(self, set_type: str):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            for table in ("runs", "pairs", "turns", "results", "failures"):
+                self._conn.execute(f"DELETE FROM {table} WHERE set_type = ?", (set_type,))
+            self._conn.execute("COMMIT")
+
+    def update_run(self, set_type: str, **fields):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute("SELECT fields FROM runs WHERE set_type = ?", (set_type,)).fetchone()
+            merged = {**(json.loads(row[0]) if row else {}), **fields}
+            self._conn.execute("INSERT OR REPLACE INTO runs VALUES (?, ?)", (set_type, json.dumps(merged)))
+            self._conn.execute("COMMIT")
+
+    def save_pair(self, set_type: str, pair: dict):
+        self._exec("INSERT OR REPLACE INTO pairs VALUES (?, ?, ?, ?)", (set_type, *pair_key(pair), json.dumps(pair)))
+
+    def save_turn(self, set_type: str, pair: dict, turn: int, state: dict):
+        self._exec("INSERT OR REPLACE INTO turns VALUES (?, ?, ?, ?, ?)",
+                   (set_type, *pair_key(pair), turn, json.dumps(state)))
+
+    def finish_pair(self, set_type: str, pair: dict, result: dict) -> int:
+        """Stores the pair's result and returns its cursor (the new row's rowid)."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            cursor = self._conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                                        (set_type, *pair_key(pair), json.dumps(result), time.time())).lastrowid
+            self._conn.execute("DELETE FROM failures WHERE set_type = ? AND student_id = ? AND topic_id = ?",
+                               (set_type, *pair_key(pair)))
+            self._conn.execute("COMMIT")
+            return cursor
+
+    def fail_pair(self, set_type: str, pair: dict, error: str):
+        """Records a pair that gave up; it stays not-done, so a resumed run retries it."""
+        self._exec("INSERT OR REPLACE INTO failures VALUES (?, ?, ?, ?, ?)",
+                   (set_type, *pair_key(pair), error, time.time()))
+
+    def get(self, set_type: str) -> Optional[dict]:
+        rows = self._exec("SELECT fields FROM runs WHERE set_type = ?", (set_type,))
+        if not rows:
+            return None
+        data = self._exec("SELECT result FROM results WHERE set_type = ? ORDER BY finished_at", (set_type,))
+        failed = self._exec(
+            "SELECT student_id, topic_id, error FROM failures WHERE set_type = ? ORDER BY failed_at", (set_type,))
+        return {**json.loads(rows[0][0]), "data": [json.loads(r[0]) for r in data],
+                "failed": [{"student_id": s, "topic_id": t, "error": e} for s, t, e in failed]}
+
+    def summary(self, set_type: str) -> Optional[dict]:
+        rows = self._exec(
+            "SELECT fields, (SELECT COUNT(*) FROM results WHERE set_type = ?1), "
+            "(SELECT COUNT(*) FROM failures WHERE set_type = ?1) FROM runs WHERE set_type = ?1", (set_type,))
+        if not rows:
+            return None
+        fields, completed, failed = rows[0]
+        return {**json.loads(fields), "completed": completed, "failed": failed}
+
+    def results_page(self, set_type: str, cursor: int = 0, limit: int = 100) -> Tuple[List[Tuple[int, dict]], int]:
+        # INSERT OR REPLACE gives a re-finished pair a new rowid, so rowid order is finish order
+        rows = self._exec("SELECT rowid, result FROM results WHERE set_type = ? AND rowid > ? ORDER BY rowid LIMIT ?",
+                          (set_type, cursor, limit))
+        return [(r[0], json.loads(r[1])) for r in rows], (rows[-1][0] if rows else cursor)
+
+    def load_turns(self, set_type: str, pair: dict) -> List[dict]:
+        rows = self._exec(
+            "SELECT state FROM turns WHERE set_type = ? AND student_id = ? AND topic_id = ? ORDER BY turn",
+            (set_type, *pair_key(pair)))
+        return [json.loads(r[0]) for r in rows]
+
+    def known_pairs(self, set_type: str) -> Dict[PairKey, dict]:
+        rows = self._exec(
+            "SELECT p.student_id, p.topic_id, p.pair, r.result IS NOT NULL FROM pairs p "
+            "LEFT JOIN results r USING (set_type, student_id, topic_id) WHERE p.set_type = ?", (set_type,))
+        return {(s, t): {**json.loads(p), "done": bool(done)} for s, t, p, done in rows}
+
+
+def _prepare(path: str) -> str:
+    """Creates the store's parent directory, e.g. a fresh data volume."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def create_store(kind: str = SIMULATION_STORE, path: Optional[str] = SIMULATION_STORE_PATH):
+    if kind == "sqlite":
+        return SQLiteStore(_prepare(path or "simulations.db"))
+    if kind == "jsonl":
+        return JSONLStore(_prepare(path or "simulations.jsonl"))
+    if kind == "memory":
+        return MemoryStore()
+    raise ValueError(f"Unknown SIMULATION_STORE: {kind}")
@@ -0,0 +1,37 @@
+"""Event streams over HTTP: Server-Sent Events or newline-delimited JSON.
+
+Endpoints produce ``{"event": name, "data": payload}`` dicts; ``respond``
+picks the wire format from the client's ``Accept`` header. SSE is used for
+``text/event-stream`` (browsers, ``EventSource``), chunked NDJSON otherwise.
+"""
+import json
+from typing import AsyncIterator
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+NDJSON = "application/x-ndjson"
+SSE = "text/event-stream"
+
+# Disable proxy buffering (nginx) so each event is flushed immediately
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+async def _ndjson(events: AsyncIterator[dict]) -> AsyncIterator[str]:
+    async for event in events:
+        yield _dumps(event) + "\n"
+
+
+async def _sse(events: AsyncIterator[dict]) -> AsyncIterator[str]:
+    async for event in events:
+        yield f"event: {event['event']}\ndata: {_dumps(event.get('data'))}\n\n"
+
+
+def respond(request: Request, events: AsyncIterator[dict]) -> StreamingResponse:
+    if SSE in request.headers.get("accept", ""):
+        return StreamingResponse(_sse(events), media_type=SSE, headers=STREAM_HEADERS)
+    return StreamingResponse(_ndjson(events), media_type=NDJSON, headers=STREAM_HEADERS)
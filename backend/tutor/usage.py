@@ -0,0 +1,80 @@
+"""Token accounting for every LLM call.
+
+Totals are kept per ``(stage, model)`` from each response's ``usage`` block,
+including provider-side cached prompt tokens, so the prefix-cache hit ratio
+and cost can be read off ``/pipeline_stats``. ``track()`` additionally
+collects the usage of one simulated pair.
+
+``LLM_PRICING`` optionally maps a model to USD per 1M tokens, e.g.
+``{"gpt-5-nano": {"input": 0.05, "cached_input": 0.005, "output": 0.4}}``.
+"""
+import json
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+LLM_PRICING: Dict[str, dict] = json.loads(os.getenv("LLM_PRICING", "{}"))
+
+_FIELDS = ("calls", "prompt_tokens", "completion_tokens", "cached_tokens")
+
+totals: Dict[str, dict] = {}
+_scope: ContextVar[Optional[dict]] = ContextVar("usage_scope", default=None)
+
+
+def _empty() -> dict:
+    return {f: 0 for f in _FIELDS}
+
+
+def cost(model: str, counts: dict) -> Optional[float]:
+    price = LLM_PRICING.get(model)
+    if not price:
+        return None
+    uncached = counts["prompt_tokens"] - counts["cached_tokens"]
+    return round((uncached * price.get("input", 0)
+                  + counts["cached_tokens"] * price.get("cached_input", price.get("input", 0))
+                  + counts["completion_tokens"] * price.get("output", 0)) / 1e6, 6)
+
+
+def record(stage: str, model: str, usage) -> dict:
+    """Adds one response's ``usage`` to the global totals and the active scope."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    counts = {
+        "calls": 1,
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
+    targets = [totals.setdefault(f"{stage}:{model}", _empty())]
+    scope = _scope.get()
+    if scope is not None:
+        targets.append(scope.setdefault(model, _empty()))
+    for target in targets:
+        for f in _FIELDS:
+            target[f] += counts[f]
+    return counts
+
+
+def _summarize(key: str, counts: dict) -> dict:
+    model = key.split(":", 1)[-1]
+    ratio = counts["cached_tokens"] / counts["prompt_tokens"] if counts["prompt_tokens"] else None
+    return {**counts, "cache_hit_ratio": None if ratio is None else round(ratio, 4), "cost_usd": cost(model, counts)}
+
+
+@contextmanager
+def track():
+    """Collects per-model usage for the enclosed calls (e.g. one simulated pair)."""
+    scope: dict = {}
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+def summarize_scope(scope: dict) -> dict:
+    return {model: _summarize(model, counts) for model, counts in scope.items()}
+
+
+def snapshot() -> dict:
+    return {key: _summarize(key, counts) for key, counts in totals.items()}
@@ -1,5 +1,7 @@
 import gradio as gr
 import requests
+import httpx
+import json
 import random
 
 BACKEND_URL = "http://localhost:8000"
@@ -10,16 +12,16 @@ def random_start():
         set_types = ["mini_dev", "dev", "eval"]
         selected_set = random.choice(set_types)
         
-        s_resp = requests.get(f"{BACKEND_URL}/students", params={"set_type": selected_set}).json()
-        students = s_resp.get("students", [])
+        # One bulk call: students with their topics, served from the backend's catalog cache
+        catalog = requests.get(f"{BACKEND_URL}/catalog", params={"set_type": selected_set}).json()
+        students = catalog.get("students", [])
         if not students: 
             return "❌ Error", "❌ Error", None, "", [], "No students found"
         
         student = random.choice(students)
         student_text = f"{student['name']} (Grade {student.get('grade_level', '?')})"
         
-        t_resp = requests.get(f"{BACKEND_URL}/students/{student['id']}/topics").json()
-        topics = t_resp.get("topics", [])
+        topics = student.get("topics", [])
         if not topics:
             return student_text, "❌ No Topics", None, "", [], "No topics found"
             
@@ -47,13 +49,46 @@ def random_start():
     except Exception as e:
         return "Error", "Error", None, "", [], f"Error: {str(e)}"
 
+async def stream_interaction(payload, history):
+    """Yields the events of /conversations/interact/stream (NDJSON) as they arrive.
+
+    A 409 means the backend lost the transcript, so the turn is resent once with the full history."""
+    async with httpx.AsyncClient(timeout=None) as client:
+        for body in (payload, {**payload, "history": history}):
+            async with client.stream("POST", f"{BACKEND_URL.rstrip('/')}/conversations/interact/stream", json=body) as resp:
+                if resp.status_code == 409 and "history" not in body:
+                    continue
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if line:
+                        yield json.loads(line)
+                return
+
 async def handle_chat(message, history, conv_id, topic_name):
-    if not conv_id: return "", history, "No Session", 3, "", ""
+    if not conv_id:
+        yield "", history, "No Session", 3, "", ""
+        return
     hist_state = history if history is not None else []
-    payload = {"conversation_id": conv_id, "tutor_message": message, "topic_name": str(topic_name or "Topic"), "history": hist_state}
-    resp = requests.post(f"{BACKEND_URL}/conversations/interact", json=payload).json()
-    new_history = list(hist_state) + [{"role": "user", "content": message}, {"role": "assistant", "content": resp.get("student_response", "...")}]
-    return "", new_history, f"Turn {resp.get('turn_number', '?')}/10", resp.get("analysis", {}).get("understanding_level", 3), resp.get("analysis", {}).get("justification", ""), resp.get("suggestion", {}).get("suggested_response", "")
+    # The backend keeps the transcript per conversation_id, so only the new message is sent
+    payload = {"conversation_id": conv_id, "tutor_message": message, "topic_name": str(topic_name or "Topic")}
+    new_history, status, level, analysis_text, suggestion_text = list(hist_state), "...", 3, "", ""
+    # The student reply shows up after one upstream hop; analysis and suggestion stream in after it
+    async for event in stream_interaction(payload, hist_state):
+        kind, data = event["event"], event.get("data")
+        if kind == "student_response":
+            new_history = list(hist_state) + [{"role": "user", "content": message}, {"role": "assistant", "content": data.get("student_response", "...")}]
+            status = f"Turn {data.get('turn_number', '?')}/10"
+        elif kind == "analysis_delta":
+            analysis_text += data  # plain justification text; the final event below replaces it
+        elif kind == "analysis":
+            level, analysis_text = data.get("understanding_level", 3), data.get("justification", "")
+        elif kind == "suggestion_delta":
+            suggestion_text += data
+        elif kind == "suggestion":
+            suggestion_text = data.get("suggested_response", "")
+        else:
+            continue
+        yield "", new_history, status, level, analysis_text, suggestion_text
 
 
 # 1. Define the Favicon HTML
@@ -1,17 +1,28 @@
 import gradio as gr
-import requests
+import httpx
+import asyncio
+import json
 import random
 import os
 import logging
 import dwani
 import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Configuration ---
 BACKEND_URL = "https://school-server.dwani.ai/"
 dwani.api_key = os.getenv("DWANI_API_KEY")
 dwani.api_base = os.getenv("DWANI_API_BASE_URL")
 
+# dwani's ASR/TTS calls block, so they run on a bounded worker pool instead of the event loop;
+# calls beyond AUDIO_WORKERS wait for a free worker while other sessions keep being served
+AUDIO_WORKERS = int(os.getenv("AUDIO_WORKERS", "8"))
+# Events Gradio runs at once per handler (its default of 1 serialises every voice session)
+UI_CONCURRENCY = int(os.getenv("UI_CONCURRENCY", "64"))
+
+audio_pool = ThreadPoolExecutor(max_workers=AUDIO_WORKERS, thread_name_prefix="audio")
+
 # Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,21 +35,31 @@ ASR_LANGUAGES = ["english", "german"]
 
 # --- Helper Functions ---
 
-def random_start():
+_client = None
+
+def backend_client():
+    """One pooled client for every session, created on first use inside Gradio's event loop."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(base_url=BACKEND_URL.rstrip('/'), timeout=None)
+    return _client
+
+async def random_start():
     try:
         set_types = ["mini_dev", "dev", "eval"]
         selected_set = random.choice(set_types)
+        client = backend_client()
         
-        s_resp = requests.get(f"{BACKEND_URL}/students", params={"set_type": selected_set}).json()
-        students = s_resp.get("students", [])
+        # One bulk call: students with their topics, served from the backend's catalog cache
+        catalog = (await client.get("/catalog", params={"set_type": selected_set})).json()
+        students = catalog.get("students", [])
         if not students: 
             return "❌ Error", "❌ Error", None, "", [], "No students found", 0
         
         student = random.choice(students)
         student_text = f"{student['name']} (Grade {student.get('grade_level', '?')})"
         
-        t_resp = requests.get(f"{BACKEND_URL}/students/{student['id']}/topics").json()
-        topics = t_resp.get("topics", [])
+        topics = student.get("topics", [])
         if not topics:
             return student_text, "❌ No Topics", None, "", [], "No topics found", 0
             
@@ -49,7 +70,7 @@ def random_start():
             "topic_id": topic['id'],
             "set_type": selected_set
         }
-        start_resp = requests.post(f"{BACKEND_URL}/conversations/start", json=payload).json()
+        start_resp = (await client.post("/conversations/start", json=payload)).json()
         conv_id = start_resp.get("conversation_id")
         
         status_msg = f"🚀 Ready ({selected_set})"
@@ -91,92 +112,150 @@ def speak_response(text, language):
         logger.error(f"TTS Error: {e}")
         return None
 
+async def transcribe(audio_path, language):
+    return await asyncio.get_running_loop().run_in_executor(audio_pool, transcribe_with_dwani, audio_path, language)
+
+async def speak(text, language):
+    return await asyncio.get_running_loop().run_in_executor(audio_pool, speak_response, text, language)
+
 # --- Interaction Handlers ---
 
 # Shared Logic
-async def process_interaction(message, history, conv_id, topic_name):
-    if not conv_id: return history, "No Session", 3, "", "", "No Session"
-    
-    hist_state = history if history is not None else []
+async def stream_interaction(message, history, conv_id, topic_name):
+    """Yields the events of /conversations/interact/stream (NDJSON) as they arrive."""
+    # The backend keeps the transcript per conversation_id, so only the new message is sent
     payload = {
         "conversation_id": conv_id, 
         "tutor_message": message, 
-        "topic_name": str(topic_name or "Topic"), 
-        "history": hist_state
+        "topic_name": str(topic_name or "Topic")
     }
+    # A 409 means the backend lost the transcript; resend the turn once with the full history
+    for body in (payload, {**payload, "history": history}):
+        async with backend_client().stream("POST", "/conversations/interact/stream", json=body) as resp:
+            if resp.status_code == 409 and "history" not in body:
+                continue
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if line:
+                    yield json.loads(line)
+            return
+
+async def iter_interaction(message, history, conv_id, topic_name):
+    """Yields (history, status, level, justification, suggestion, student_response) as the turn streams in."""
+    if not conv_id:
+        yield history, "No Session", 3, "", "", "No Session"
+        return
+    
+    hist_state = history if history is not None else []
+    new_history, status, level, justif, sugg, student_response = list(hist_state), "...", 3, "", "", ""
     
     try:
-        resp = requests.post(f"{BACKEND_URL}/conversations/interact", json=payload).json()
-        student_response = resp.get("student_response", "...")
-        
-        new_history = list(hist_state) + [
-            {"role": "user", "content": message}, 
-            {"role": "assistant", "content": student_response}
-        ]
-        
-        return (
-            new_history, 
-            f"Turn {resp.get('turn_number', '?')}/10", 
-            resp.get("analysis", {}).get("understanding_level", 3), 
-            resp.get("analysis", {}).get("justification", ""), 
-            resp.get("suggestion", {}).get("suggested_response", ""),
-            student_response
-        )
+        async for event in stream_interaction(message, hist_state, conv_id, topic_name):
+            kind, data = event["event"], event.get("data")
+            if kind == "student_response":
+                student_response = data.get("student_response", "...")
+                new_history = list(hist_state) + [
+                    {"role": "user", "content": message}, 
+                    {"role": "assistant", "content": student_response}
+                ]
+                status = f"Turn {data.get('turn_number', '?')}/10"
+            elif kind == "analysis_delta":
+                justif += data  # plain justification text; the final event below replaces it
+            elif kind == "analysis":
+                level, justif = data.get("understanding_level", 3), data.get("justification", "")
+            elif kind == "suggestion_delta":
+                sugg += data
+            elif kind == "suggestion":
+                sugg = data.get("suggested_response", "")
+            else:
+                continue
+            yield new_history, status, level, justif, sugg, student_response
     except Exception as e:
-        return hist_state, f"Error: {str(e)}", 0, "", "", ""
+        yield hist_state, f"Error: {str(e)}", 0, "", "", ""
+
+async def process_interaction(message, history, conv_id, topic_name):
+    """Runs a whole turn and returns its final state."""
+    result = (history, "No Session", 3, "", "", "No Session")
+    async for result in iter_interaction(message, history, conv_id, topic_name):
+        pass
+    return result
+
+async def iter_voice_turn(message, language, history, conv_id, topic_name):
+    """Yields (state, audio_path) like iter_interaction, with the spoken reply in the last item.
+
+    TTS starts as soon as the student reply arrives, so it overlaps the analysis and suggestion.
+    """
+    tts, state = None, (history, "No Session", 3, "", "", "No Session")
+    try:
+        async for state in iter_interaction(message, history, conv_id, topic_name):
+            if tts is None and state[5]:
+                tts = asyncio.create_task(speak(state[5], language))
+            yield state, None
+        yield state, (await tts if tts else None)
+    finally:
+        if tts and not tts.done():
+            tts.cancel()  # the session went away; a running synthesis still finishes on its worker
 
 
-# 1. Text Handler
+# 1. Text Handler (streams the student reply first, then analysis and suggestion)
 async def handle_text_chat(message, history, conv_id, topic_name):
-    new_hist, status, level, justif, sugg, _ = await process_interaction(message, history, conv_id, topic_name)
-    return "", new_hist, status, level, justif, sugg
+    async for new_hist, status, level, justif, sugg, _ in iter_interaction(message, history, conv_id, topic_name):
+        yield "", new_hist, status, level, justif, sugg
 
-# 2. Voice Handler (Single Turn)
+# 2. Voice Handler (Single Turn; the chat updates while the reply is synthesised)
 async def handle_voice_chat(audio_path, language, history, conv_id, topic_name):
-    if not audio_path: return None, history, "❌ No Audio", 0, "", "", None
+    if not audio_path:
+        yield None, history, "❌ No Audio", 0, "", "", None
+        return
     
     # Transcribe
-    transcribed_text = transcribe_with_dwani(audio_path, language)
-    if not transcribed_text: return None, history, "❌ Transcription Failed", 0, "", "", None
-
-    # Interact
-    new_hist, status, level, justif, sugg, raw_response = await process_interaction(transcribed_text, history, conv_id, topic_name)
-    
-    # TTS
-    audio_response_path = speak_response(raw_response, language)
+    transcribed_text = await transcribe(audio_path, language)
+    if not transcribed_text:
+        yield None, history, "❌ Transcription Failed", 0, "", "", None
+        return
+
+    # Interact + TTS (the audio comes with the last update)
+    state, audio_response_path = None, None
+    async for state, audio_response_path in iter_voice_turn(transcribed_text, language, history, conv_id, topic_name):
+        if audio_response_path is None:
+            yield None, *state[:5], gr.skip()
     
-    return None, new_hist, status, level, justif, sugg, audio_response_path
+    yield None, *state[:5], audio_response_path
 
 # 3. Real-time Loop Handler
 async def handle_rt_turn(audio_path, language, history, conv_id, topic_name, turn_count):
     """
     Handles one turn of the Real-time loop.
-    Increments turn count and returns everything needed for the UI update.
+    Shows the student reply as soon as it arrives, then returns the spoken reply and the incremented turn count.
     """
     if not conv_id: 
-        return history, None, turn_count, "❌ No Session"
+        yield history, None, turn_count, "❌ No Session"
+        return
     
     if turn_count >= 5:
-        return history, None, 5, "🏁 Max turns (5) reached."
+        yield history, None, 5, "🏁 Max turns (5) reached."
+        return
         
     if not audio_path:
-        return history, None, turn_count, "⚠️ No audio captured"
+        yield history, None, turn_count, "⚠️ No audio captured"
+        return
 
     # A. Transcribe
-    user_text = transcribe_with_dwani(audio_path, language)
+    user_text = await transcribe(audio_path, language)
     if not user_text:
-        return history, None, turn_count, "⚠️ Silence detected"
+        yield history, None, turn_count, "⚠️ Silence detected"
+        return
         
-    # B. Interact
-    new_hist, status, level, justif, sugg, raw_response = await process_interaction(user_text, history, conv_id, topic_name)
-    
-    # C. TTS
-    ai_audio_path = speak_response(raw_response, language)
+    # B. Interact, C. TTS (overlapping)
+    new_hist, ai_audio_path = history, None
+    async for (new_hist, status, *_), ai_audio_path in iter_voice_turn(user_text, language, history, conv_id, topic_name):
+        if ai_audio_path is None:
+            yield new_hist, gr.skip(), turn_count, status
     
     # D. Increment Turn
     new_turn_count = turn_count + 1
     
-    return new_hist, ai_audio_path, new_turn_count, f"Turn {new_turn_count}/5"
+    yield new_hist, ai_audio_path, new_turn_count, f"Turn {new_turn_count}/5"
 
 
 # --- UI Setup ---
@@ -342,6 +421,7 @@ with gr.Blocks(title="AI Tutor - Realtime", head=favicon_html + js_loop_logic) a
 
 
 if __name__ == "__main__":
+    demo.queue(default_concurrency_limit=UI_CONCURRENCY)
     demo.launch(
         server_name="0.0.0.0", 
         server_port=8080, 